@@ -2,10 +2,12 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
+import os
 import uuid
 from pathlib import Path
-from typing import List
+from typing import AsyncIterator, List, Literal, Optional
 
 import aiofiles
 from fastapi import (
@@ -15,14 +17,19 @@ from fastapi import (
     File,
     Form,
     HTTPException,
+    Query,
+    Request,
+    Response,
     UploadFile,
 )
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 
 from dotenv import load_dotenv
 
 from backend.models.gemini_client import GeminiClient
+from backend.models.ocr_pool import get_default_ocr_pool
+from backend.models.reference_registry import watch_enabled as reference_watch_enabled
 from backend.models.risk_assessor import RiskAssessor
 from backend.pipeline import AnalysisPipeline
 from backend.schemas.project_schema import (
@@ -33,13 +40,26 @@ from backend.schemas.project_schema import (
     build_created_response,
     build_project_summaries,
     build_report_response,
+    build_status_delta,
     build_status_response,
 )
+from backend.utils.annotated_frames import (
+    AnnotatedFrameCache,
+    frame_cache_key,
+    render_annotated_frame,
+)
+from backend.utils.media_jobs import (
+    ClientDisconnected,
+    MediaJobTimeout,
+    cancel_on_disconnect,
+    get_media_executor,
+)
 from backend.utils.media_utils import detect_media_type, guess_mime_type
 from backend.store import (
     PipelineAlreadyRunningError,
+    InvalidCursorError,
     ProjectNotFoundError,
-    ProjectStore,
+    create_project_store,
 )
 from backend.routers import auth, admin, bulk_upload
 from backend.routers.auth import get_current_user, TokenData
@@ -54,6 +74,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include routers
@@ -68,11 +89,19 @@ REFERENCE_ROOT = BASE_DIR.parent / "reference"
 SOCIAL_CASE_PATH = REFERENCE_ROOT / "炎上" / "viral list" / "炎上事例.xlsx"
 SOCIAL_TAG_PATH = REFERENCE_ROOT / "炎上" / "tag_list" / "タグリスト.xlsx"
 LEGAL_REFERENCE_PATH = REFERENCE_ROOT / "law" / "JAL　法律リスト.xlsx"
+MAX_PROJECT_PAGE_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# 他ワーカーでの更新は通知が届かないため、この間隔でも再確認する
+STREAM_POLL_SECONDS = 2.0
+STREAM_KEEPALIVE_SECONDS = 15.0
+# 注釈付きフレームはタイムコードごとに内容が変わらないため、ブラウザにもキャッシュさせる
+FRAME_CACHE_CONTROL = "private, max-age=86400"
+INTERRUPTED_PIPELINE_REASON = "分析を担当していたサーバーが停止したため中断されました"
 
 load_dotenv(BASE_DIR / ".env", override=True)
 load_dotenv(BASE_DIR.parent / ".env", override=True)
 
-store = ProjectStore()
+store = create_project_store()
 gemini_client = GeminiClient()
 risk_assessor = RiskAssessor(
     gemini_client,
@@ -91,17 +120,28 @@ analysis_pipeline = AnalysisPipeline(
 @app.on_event("startup")
 async def load_existing_projects():
     """起動時に既存のプロジェクトをストアに読み込む."""
+    # 止まったワーカーが分析中のまま残した案件は再開できないため失敗扱いにする
+    # (他のワーカーが実行中の案件は担当期限が切れていないため対象外)
+    interrupted = await store.fail_interrupted_pipelines(INTERRUPTED_PIPELINE_REASON)
+    if interrupted:
+        print(f"Marked {len(interrupted)} interrupted projects as failed.")
+
     print("Loading existing projects from uploads directory...")
 
     if not UPLOAD_DIR.exists():
         print("No uploads directory found.")
         return
 
+    # 永続ストアに登録済みの案件は読み直さず、未登録のディレクトリだけを取り込む
+    known_dirs = await store.workspace_dirs()
     loaded_count = 0
     for project_dir in UPLOAD_DIR.iterdir():
         if not project_dir.is_dir():
             continue
 
+        if project_dir in known_dirs:
+            continue
+
         # プロジェクトIDはディレクトリ名
         project_id = project_dir.name
 
@@ -162,6 +202,104 @@ async def load_existing_projects():
     print(f"Loaded {loaded_count} existing projects.")
 
 
+_lease_heartbeat_task: Optional[asyncio.Task] = None
+
+
+@app.on_event("startup")
+async def start_pipeline_lease_heartbeat():
+    """実行中の分析の担当期限を定期的に延ばし、止まったワーカーの案件を失敗扱いにする."""
+    global _lease_heartbeat_task  # pylint: disable=global-statement
+    _lease_heartbeat_task = asyncio.create_task(_renew_pipeline_leases())
+
+
+async def _renew_pipeline_leases() -> None:
+    interval = store.lease_seconds / 3
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await store.renew_pipeline_leases()
+            interrupted = await store.fail_interrupted_pipelines(INTERRUPTED_PIPELINE_REASON)
+            if interrupted:
+                print(f"Marked {len(interrupted)} interrupted projects as failed.")
+        except Exception as e:  # pylint: disable=broad-except
+            print(f"Pipeline lease heartbeat failed: {e}")
+
+
+@app.on_event("shutdown")
+async def stop_pipeline_lease_heartbeat():
+    """終了時に担当期限の延長を止める."""
+    if _lease_heartbeat_task is not None:
+        _lease_heartbeat_task.cancel()
+
+
+@app.on_event("startup")
+async def open_gemini_client():
+    """Gemini API 用の接続プールを起動時に用意する."""
+    await gemini_client.open()
+
+
+@app.on_event("shutdown")
+async def close_gemini_client():
+    """終了時に Gemini API 用の接続プールを閉じる."""
+    await gemini_client.aclose()
+
+
+@app.on_event("startup")
+async def watch_reference_data():
+    """参照 Excel の更新を監視し、再起動せずに新しい版へ切り替える."""
+    if reference_watch_enabled():
+        risk_assessor.reference_registry.start()
+
+
+@app.on_event("shutdown")
+async def stop_reference_watch():
+    """終了時に参照データの監視を止める."""
+    risk_assessor.reference_registry.stop()
+
+
+_ocr_warm_up_task: Optional[asyncio.Task] = None
+
+
+@app.on_event("startup")
+async def warm_up_ocr_pool():
+    """OCR_PREWARM=true なら EasyOCR のモデルをバックグラウンドで読み込んでおく."""
+    global _ocr_warm_up_task  # pylint: disable=global-statement
+    if os.getenv("OCR_PREWARM", "false").lower() not in {"1", "true", "yes"}:
+        return
+    _ocr_warm_up_task = asyncio.create_task(get_default_ocr_pool().warm_up())
+    _ocr_warm_up_task.add_done_callback(_log_ocr_warm_up_result)
+
+
+def _log_ocr_warm_up_result(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        print(f"EasyOCR warm-up failed: {task.exception()}")
+
+
+_media_warm_up_task: Optional[asyncio.Task] = None
+
+
+@app.on_event("startup")
+async def warm_up_media_executor():
+    """MEDIA_PREWARM=true ならフレーム抽出用のワーカープロセスを先に起動しておく."""
+    global _media_warm_up_task  # pylint: disable=global-statement
+    if os.getenv("MEDIA_PREWARM", "false").lower() not in {"1", "true", "yes"}:
+        return
+    _media_warm_up_task = asyncio.create_task(get_media_executor().warm_up("cv2"))
+    _media_warm_up_task.add_done_callback(_log_media_warm_up_result)
+
+
+def _log_media_warm_up_result(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Media worker warm-up failed: {task.exception()}")
+
+
+@app.on_event("shutdown")
+async def shutdown_ocr_pool():
+    """終了時に OCR 用のスレッドとメディア処理用のプロセスを止める."""
+    get_default_ocr_pool().shutdown()
+    get_media_executor().shutdown()
+
+
 def _sanitize_component(value: str, default: str) -> str:
     """ファイル名の安全なコンポーネントを生成する（日本語保持）."""
 
@@ -228,11 +366,35 @@ async def create_project(
 
 
 @app.get("/projects", response_model=List[ProjectSummary])
-async def list_projects() -> List[ProjectSummary]:
-    """分析済みプロジェクトの一覧を取得."""
+async def list_projects(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PROJECT_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    company: Optional[str] = None,
+    sort: Literal["updated", "created"] = "updated",
+    order: Literal["asc", "desc"] = "desc",
+) -> List[ProjectSummary]:
+    """分析済みプロジェクトの一覧を取得.
+
+    limit を指定するとページ単位で返し、続きがある場合は X-Next-Cursor ヘッダーに
+    次ページのカーソルを設定する。
+    """
 
-    projects = await store.list_projects()
-    return build_project_summaries(projects)
+    try:
+        page = await store.list_project_summaries(
+            limit=limit,
+            cursor=cursor,
+            status=status,
+            company_name=company,
+            sort=sort,
+            descending=order == "desc",
+        )
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=400, detail="cursor が不正です。") from exc
+    if page.next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+    return build_project_summaries(page.items)
 
 
 @app.get("/projects/{project_id}/media")
@@ -256,14 +418,8 @@ async def get_project_media(project_id: str) -> FileResponse:
 
 
 @app.get("/projects/{project_id}/frame")
-async def get_video_frame(project_id: str, timecode: str) -> FileResponse:
+async def get_video_frame(project_id: str, timecode: str, request: Request) -> Response:
     """指定されたタイムコードの最も鮮明なフレーム画像を返却（テロップ検出＆アノテーション付き）."""
-    import subprocess
-    import tempfile
-    import cv2
-    import numpy as np
-    import easyocr
-
     try:
         project = await store.get_project(project_id)
     except ProjectNotFoundError as exc:
@@ -291,170 +447,47 @@ async def get_video_frame(project_id: str, timecode: str) -> FileResponse:
     except Exception:
         raise HTTPException(status_code=400, detail="タイムコードの形式が不正です。（例: 01:30 or 00:01:30）")
 
-    # 前後0.5秒間（0.1秒間隔）でフレームを抽出
-    temp_frames = []
-    temp_dir = Path(tempfile.mkdtemp())
-
-    try:
-        # 指定時刻の前後0.5秒、0.1秒間隔で11フレーム抽出
-        time_offsets = [total_seconds + (i * 0.1) for i in range(-5, 6)]  # -0.5秒 ~ +0.5秒
-
-        for idx, t in enumerate(time_offsets):
-            if t < 0:  # 負の時刻はスキップ
-                continue
-
-            frame_path = temp_dir / f"frame_{idx:02d}.jpg"
-            cmd = [
-                "ffmpeg",
-                "-ss", str(t),
-                "-i", str(video_path),
-                "-vframes", "1",
-                "-q:v", "2",  # 高品質
-                "-y",
-                str(frame_path)
-            ]
-
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-
-            if result.returncode == 0 and frame_path.exists():
-                temp_frames.append(frame_path)
-
-        if not temp_frames:
-            raise HTTPException(status_code=500, detail="フレーム抽出に失敗しました。")
-
-        # EasyOCRの初期化（日本語と英語）
-        print("Initializing EasyOCR reader...")
-        reader = easyocr.Reader(['ja', 'en'], gpu=False)
-
-        # ステップ1: テロップを含むフレームを検出
-        frames_with_text = []
-
-        for frame_path in temp_frames:
-            try:
-                img = cv2.imread(str(frame_path))
-                if img is None:
-                    continue
-
-                # OCRでテキスト検出
-                results = reader.readtext(str(frame_path))
-
-                if results:  # テキストが検出された場合
-                    # 鮮明度も計算
-                    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                    laplacian = cv2.Laplacian(gray, cv2.CV_64F)
-                    sharpness = laplacian.var()
-
-                    frames_with_text.append({
-                        'path': frame_path,
-                        'sharpness': sharpness,
-                        'text_results': results,
-                        'text_count': len(results)
-                    })
-                    print(f"Frame {frame_path.name}: {len(results)} text regions, sharpness: {sharpness:.2f}")
+    # パイプラインで事前生成した (または以前に生成した) 画像があればそれを返す
+    cache = AnnotatedFrameCache(project.workspace_dir)
+    cache_key = frame_cache_key(total_seconds)
+    cached = await asyncio.to_thread(cache.get, cache_key)
+    if cached is None:
+        try:
+            # クライアントが切断したら OCR・デコード待ちを打ち切る
+            image = await cancel_on_disconnect(
+                request.is_disconnected, render_annotated_frame(video_path, total_seconds)
+            )
+        except ClientDisconnected:
+            print(f"Client disconnected while extracting frame at {timecode}")
+            return Response(status_code=499)
+        except MediaJobTimeout:
+            raise HTTPException(status_code=500, detail="フレーム抽出がタイムアウトしました。")
+        except Exception as e:
+            import traceback
+            print(f"Error in frame extraction: {e}")
+            print(traceback.format_exc())
+            raise HTTPException(status_code=500, detail=f"フレーム抽出中にエラーが発生しました: {str(e)}")
+        cached = await asyncio.to_thread(cache.put, cache_key, image, timecode=timecode)
+
+    frame_path, etag = cached
+    headers = {"ETag": etag, "Cache-Control": FRAME_CACHE_CONTROL}
+    if_none_match = _parse_if_none_match(request.headers.get("if-none-match"))
+    if etag in if_none_match or "*" in if_none_match:
+        return Response(status_code=304, headers=headers)
+
+    filename = f"frame_{timecode.replace(':', '-')}_annotated.jpg"
+    return FileResponse(
+        frame_path,
+        media_type="image/jpeg",
+        filename=filename,
+        headers=headers,
+    )
 
-            except Exception as e:
-                print(f"Error processing frame {frame_path}: {e}")
-                continue
-
-        # ステップ2: テロップ付きフレームの中から最も鮮明なものを選択
-        # テロップが検出されなかった場合は全フレームから選択
-        if frames_with_text:
-            best_frame_info = max(frames_with_text, key=lambda x: x['sharpness'])
-            print(f"Selected frame with text: {best_frame_info['text_count']} regions, sharpness: {best_frame_info['sharpness']:.2f}")
-        else:
-            # テロップなしの場合は鮮明度のみで選択
-            print("No text detected, selecting by sharpness only")
-            best_sharpness = -1
-            best_frame_path = None
-
-            for frame_path in temp_frames:
-                try:
-                    img = cv2.imread(str(frame_path))
-                    if img is None:
-                        continue
-
-                    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                    laplacian = cv2.Laplacian(gray, cv2.CV_64F)
-                    sharpness = laplacian.var()
-
-                    if sharpness > best_sharpness:
-                        best_sharpness = sharpness
-                        best_frame_path = frame_path
-
-                except Exception as e:
-                    print(f"Error processing frame {frame_path}: {e}")
-                    continue
-
-            if best_frame_path is None:
-                raise HTTPException(status_code=500, detail="鮮明なフレームが見つかりませんでした。")
-
-            best_frame_info = {
-                'path': best_frame_path,
-                'sharpness': best_sharpness,
-                'text_results': [],
-                'text_count': 0
-            }
-
-        # ステップ3: 選択されたフレームにテロップ領域をアノテーション
-        best_frame = cv2.imread(str(best_frame_info['path']))
-
-        for detection in best_frame_info['text_results']:
-            bbox, text, confidence = detection
-
-            # バウンディングボックスの座標を取得
-            # bboxは[[x1,y1], [x2,y2], [x3,y3], [x4,y4]]の形式
-            points = np.array(bbox, dtype=np.int32)
-
-            # テロップ領域を赤い枠線でハイライト
-            cv2.polylines(best_frame, [points], True, (0, 0, 255), 3)
-
-            # テキストラベルを追加（背景付き）
-            label = f"{text[:20]}" if len(text) > 20 else text
-            label_pos = (int(bbox[0][0]), max(int(bbox[0][1]) - 10, 20))
-
-            # ラベル背景
-            (label_w, label_h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
-            cv2.rectangle(best_frame,
-                         (label_pos[0], label_pos[1] - label_h - 5),
-                         (label_pos[0] + label_w, label_pos[1] + 5),
-                         (0, 0, 255), -1)
-
-            # ラベルテキスト（白色）
-            cv2.putText(best_frame, label, label_pos,
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-
-            print(f"Annotated text: {text} (confidence: {confidence:.2f})")
-
-        # ステップ4: アノテーション付き画像を保存
-        with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as tmp_file:
-            output_path = Path(tmp_file.name)
-
-        cv2.imwrite(str(output_path), best_frame)
-
-        print(f"Final output: {best_frame_info['text_count']} text regions annotated, sharpness: {best_frame_info['sharpness']:.2f}")
-
-        return FileResponse(
-            output_path,
-            media_type="image/jpeg",
-            filename=f"frame_{timecode.replace(':', '-')}_annotated.jpg",
-            background=BackgroundTasks()  # 自動削除
-        )
 
-    except subprocess.TimeoutExpired:
-        raise HTTPException(status_code=500, detail="フレーム抽出がタイムアウトしました。")
-    except Exception as e:
-        import traceback
-        print(f"Error in frame extraction: {e}")
-        print(traceback.format_exc())
-        raise HTTPException(status_code=500, detail=f"フレーム抽出中にエラーが発生しました: {str(e)}")
-    finally:
-        # 一時ファイルをクリーンアップ
-        try:
-            import shutil as shutil_module
-            if temp_dir.exists():
-                shutil_module.rmtree(temp_dir)
-        except Exception as cleanup_error:
-            print(f"Cleanup error: {cleanup_error}")
+def _parse_if_none_match(value: Optional[str]) -> set[str]:
+    if not value:
+        return set()
+    return {tag.strip().removeprefix("W/") for tag in value.split(",")}
 
 
 @app.get("/projects/{project_id}/annotations")
@@ -556,6 +589,68 @@ async def get_analysis_status(project_id: str) -> ProjectStatusResponse:
     return build_status_response(project)
 
 
+def _sse_event(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+async def _stream_project_events(request: Request, project_id: str) -> AsyncIterator[str]:
+    """スナップショットを 1 回送り、以降はストアの変更通知ごとに差分を送る."""
+
+    changed = store.subscribe(project_id)
+    try:
+        try:
+            previous = await store.get_project(project_id)
+        except ProjectNotFoundError:
+            yield _sse_event("deleted", json.dumps({"id": project_id}))
+            return
+        yield _sse_event("snapshot", build_status_response(previous).model_dump_json())
+
+        loop = asyncio.get_running_loop()
+        last_sent = loop.time()
+        while previous.status not in {"completed", "failed"}:
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=STREAM_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            changed.clear()
+            if await request.is_disconnected():
+                return
+
+            try:
+                current = await store.get_project(project_id)
+            except ProjectNotFoundError:
+                yield _sse_event("deleted", json.dumps({"id": project_id}))
+                return
+            delta = build_status_delta(previous, current)
+            previous = current
+            if delta is not None:
+                yield _sse_event("delta", delta.model_dump_json(exclude_unset=True))
+                last_sent = loop.time()
+            elif loop.time() - last_sent >= STREAM_KEEPALIVE_SECONDS:
+                yield ": keepalive\n\n"
+                last_sent = loop.time()
+
+        yield _sse_event("end", json.dumps({"status": previous.status}))
+    finally:
+        store.unsubscribe(project_id, changed)
+
+
+@app.get("/projects/{project_id}/events")
+async def stream_analysis_events(project_id: str, request: Request) -> StreamingResponse:
+    """分析の進行状況を Server-Sent Events で配信する."""
+
+    try:
+        await store.get_project(project_id)
+    except ProjectNotFoundError as exc:
+        raise HTTPException(status_code=404, detail="プロジェクトが存在しません。") from exc
+
+    return StreamingResponse(
+        _stream_project_events(request, project_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/projects/{project_id}/report", response_model=ProjectReportResponse)
 async def get_final_report(project_id: str) -> ProjectReportResponse:
     """最終レポートを取得する."""
@@ -3,12 +3,23 @@
 
 import asyncio
 import json
-import subprocess
 import sys
 from pathlib import Path
 
 import aiofiles
 
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from backend.utils.media_jobs import MediaJobError, MediaJobTimeout  # noqa: E402
+from backend.utils.tag_frames import (  # noqa: E402
+    build_frames_info,
+    collect_tag_timecodes,
+    extract_tag_frames,
+    tag_frame_filename,
+)
+
 
 async def extract_frames_for_project(project_dir: Path):
     """プロジェクトディレクトリからタグフレームを抽出する."""
@@ -39,101 +50,29 @@ async def extract_frames_for_project(project_dir: Path):
         print(f"  タグが見つかりません")
         return
 
-    # タグフレームディレクトリを作成
     frames_dir = project_dir / "tag_frames"
-    frames_dir.mkdir(exist_ok=True)
-
-    # タイムコードを収集
-    timecodes_to_extract = []
-
-    for tag in tags:
-        tag_name = tag.get("name", "unknown")
-
-        # メインタグのタイムコード
-        if tag.get("detected_timecode"):
-            timecodes_to_extract.append({
-                "timecode": tag["detected_timecode"],
-                "tag": tag_name,
-                "sub_tag": None
-            })
-
-        # サブタグのタイムコード
-        for sub_tag in tag.get("related_sub_tags", []):
-            if sub_tag.get("detected_timecode"):
-                timecodes_to_extract.append({
-                    "timecode": sub_tag["detected_timecode"],
-                    "tag": tag_name,
-                    "sub_tag": sub_tag.get("name")
-                })
-
-    # 重複を削除
-    seen = set()
-    unique_timecodes = []
-    for item in timecodes_to_extract:
-        tc = item["timecode"]
-        if tc not in seen:
-            seen.add(tc)
-            unique_timecodes.append(item)
+    unique_timecodes = collect_tag_timecodes(risk_data)
 
     print(f"  抽出するフレーム数: {len(unique_timecodes)}")
 
-    # フレームを抽出
-    extracted_count = 0
-    for item in unique_timecodes:
-        timecode = item["timecode"]
-        tag = item["tag"]
-        sub_tag = item["sub_tag"]
-
-        # タイムコードをファイル名に使える形式に変換
-        tc_safe = timecode.replace(":", "-")
-
-        # ファイル名を生成
-        if sub_tag:
-            filename = f"{tag}_{sub_tag}_{tc_safe}.jpg"
-        else:
-            filename = f"{tag}_{tc_safe}.jpg"
-
-        # 安全なファイル名に変換
-        filename = filename.replace(" ", "_").replace("/", "_")
-        output_path = frames_dir / filename
-
-        try:
-            # ffmpegでフレームを抽出
-            subprocess.run(
-                [
-                    "ffmpeg",
-                    "-ss", timecode,
-                    "-i", str(video_path),
-                    "-vframes", "1",
-                    "-q:v", "2",
-                    "-y",
-                    str(output_path)
-                ],
-                check=True,
-                capture_output=True,
-                timeout=10
-            )
-            print(f"    ✓ {timecode} -> {filename}")
-            extracted_count += 1
-        except subprocess.CalledProcessError as e:
-            print(f"    ✗ {timecode} エラー: {e.stderr.decode()}")
-        except subprocess.TimeoutExpired:
-            print(f"    ✗ {timecode} タイムアウト")
-        except Exception as e:
-            print(f"    ✗ {timecode} エラー: {e}")
+    # すべてのタイムコードを 1 回のデコードでまとめて抽出
+    try:
+        extracted, failed = await extract_tag_frames(video_path, frames_dir, unique_timecodes)
+    except MediaJobTimeout:
+        print("    ✗ タイムアウト")
+        extracted, failed = [], unique_timecodes
+    except MediaJobError as e:
+        print(f"    ✗ エラー: {e}")
+        extracted, failed = [], unique_timecodes
+    else:
+        for item in extracted:
+            print(f"    ✓ {item['timecode']} -> {tag_frame_filename(item)}")
+        for item in failed:
+            print(f"    ✗ {item['timecode']} 抽出できませんでした")
+    extracted_count = len(extracted)
 
     # フレーム情報をJSONに保存
-    frames_info = {
-        "frames": [
-            {
-                "timecode": item["timecode"],
-                "tag": item["tag"],
-                "sub_tag": item["sub_tag"],
-                "filename": f"{item['tag']}_{item['sub_tag'] or ''}{('_' if item['sub_tag'] else '')}{item['timecode'].replace(':', '-')}.jpg".replace(" ", "_").replace("/", "_")
-            }
-            for item in unique_timecodes
-        ]
-    }
+    frames_info = build_frames_info(unique_timecodes)
 
     frames_info_path = project_dir / "tag_frames_info.json"
     async with aiofiles.open(frames_info_path, "w", encoding="utf-8") as f:
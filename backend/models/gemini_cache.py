@@ -0,0 +1,176 @@
+"""Gemini 解析結果のディスクキャッシュ (メディア内容 + モデル + 指示文で引く)."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[1] / "cache" / "gemini"
+DEFAULT_CACHE_MAX_MB = 512
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def sha256_file(path: Path) -> str:
+    """ファイル内容の SHA-256 を返す (チャンク単位で読み込む)."""
+
+    digest = hashlib.sha256()
+    with path.open("rb") as file_obj:
+        while chunk := file_obj.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_cache_key(
+    media_digest: str,
+    model: str,
+    instruction: str,
+    settings: Optional[Dict[str, Any]] = None,
+) -> str:
+    """メディアの SHA-256・モデル名・指示文のハッシュからキャッシュキーを作る.
+
+    settings には結果の形や区切り方を左右する設定 (分割の条件・ショット一覧など) を渡す。
+    """
+
+    instruction_digest = hashlib.sha256(instruction.encode("utf-8")).hexdigest()
+    material = f"{media_digest}:{model}:{instruction_digest}"
+    if settings:
+        material += ":" + json.dumps(settings, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class GeminiResultCache:
+    """run_step の結果を JSON ファイルとして保存する容量上限付き LRU キャッシュ.
+
+    最終アクセス時刻はファイルの mtime で表し、上限を超えたら古いものから削除する。
+    """
+
+    def __init__(self, cache_dir: Path, *, max_bytes: int) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # key -> (size, last_access)
+        self._entries: Dict[str, tuple[int, float]] = {}
+        self._total_bytes = 0
+        self._load_index()
+
+    @classmethod
+    def from_env(cls) -> Optional["GeminiResultCache"]:
+        """環境変数から設定を読み込む。GEMINI_CACHE_MAX_MB=0 の場合は無効 (None)."""
+
+        max_mb = float(os.getenv("GEMINI_CACHE_MAX_MB", DEFAULT_CACHE_MAX_MB))
+        if max_mb <= 0:
+            return None
+        cache_dir = Path(os.getenv("GEMINI_CACHE_DIR", str(DEFAULT_CACHE_DIR)))
+        return cls(cache_dir, max_bytes=int(max_mb * 1024 * 1024))
+
+    def _path_for(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _load_index(self) -> None:
+        if not self.cache_dir.exists():
+            return
+        for entry_path in self.cache_dir.glob("*/*.json"):
+            try:
+                stat = entry_path.stat()
+            except OSError:
+                continue
+            self._entries[entry_path.stem] = (stat.st_size, stat.st_mtime)
+            self._total_bytes += stat.st_size
+
+    def stats(self) -> dict:
+        """ヒット数・ミス数と現在の使用量を返す."""
+
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    async def get(self, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(self._get_sync, key)
+
+    async def put(self, key: str, value: Any) -> None:
+        await asyncio.to_thread(self._put_sync, key, value)
+
+    def _get_sync(self, key: str) -> Optional[Any]:
+        path = self._path_for(key)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            try:
+                value = json.loads(path.read_text(encoding="utf-8"))["value"]
+                accessed = time.time()
+                os.utime(path, (accessed, accessed))
+            except (OSError, ValueError, KeyError):
+                self._discard(key)
+            else:
+                with self._lock:
+                    if key in self._entries:
+                        self._entries[key] = (entry[0], accessed)
+                    self.hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _put_sync(self, key: str, value: Any) -> None:
+        data = json.dumps({"value": value}, ensure_ascii=False).encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+        path = self._path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        temp_path.write_bytes(data)
+        os.replace(temp_path, path)
+        accessed = time.time()
+        os.utime(path, (accessed, accessed))
+        with self._lock:
+            previous_size, _ = self._entries.get(key, (0, 0.0))
+            self._entries[key] = (len(data), accessed)
+            self._total_bytes += len(data) - previous_size
+            victims = self._select_victims()
+        for victim in victims:
+            self._remove_file(victim)
+
+    def _select_victims(self) -> list[str]:
+        """上限を超えた分を最終アクセスの古い順に索引から外し、そのキーを返す."""
+
+        victims: list[str] = []
+        if self._total_bytes <= self.max_bytes:
+            return victims
+        for key, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            del self._entries[key]
+            self._total_bytes -= size
+            victims.append(key)
+        return victims
+
+    def _discard(self, key: str) -> None:
+        with self._lock:
+            size, _ = self._entries.pop(key, (0, 0.0))
+            self._total_bytes -= size
+        self._remove_file(key)
+
+    def _remove_file(self, key: str) -> None:
+        try:
+            self._path_for(key).unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as exc:
+            logger.warning("Failed to evict Gemini cache entry %s: %s", key, exc)
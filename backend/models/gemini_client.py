@@ -3,37 +3,401 @@
 from __future__ import annotations
 
 import asyncio
-import base64
+import copy
+import hashlib
 import json
+import logging
 import mimetypes
 import os
+import shutil
+import tempfile
+import time
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
 import httpx
 
+from backend.models.gemini_cache import GeminiResultCache, build_cache_key, sha256_file
+from backend.models.gemini_context_cache import (
+    CachedPrefix,
+    ContextCacheError,
+    PromptPrefix,
+    create_cached_content,
+    delete_cached_content,
+)
+from backend.models.gemini_files import (
+    MediaHandle,
+    MediaUploadError,
+    delete_media,
+    upload_media,
+)
+from backend.models.rate_limit import GeminiRequestScheduler, get_default_scheduler
+from backend.utils.audio_chunks import (
+    DEFAULT_CHUNK_SECONDS,
+    DEFAULT_OVERLAP_SECONDS,
+    SILENCE_MIN_SECONDS,
+    SILENCE_NOISE_DB,
+    detect_silences,
+    plan_chunks,
+    split_audio,
+    stitch_transcripts,
+)
+from backend.utils.media_jobs import MediaJobError
+from backend.utils.shot_detection import Shot, ShotIndex
+
+logger = logging.getLogger(__name__)
+
 DEFAULT_MODEL = "gemini-2.0-flash-exp"
-GEMINI_ENDPOINT_TEMPLATE = (
-    "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+GEMINI_API_ROOT = "https://generativelanguage.googleapis.com"
+
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 10
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+# これより長い音声は無音区間で分割し、チャンクごとに並列で文字起こしする
+DEFAULT_LONG_MEDIA_SECONDS = 300.0
+DEFAULT_TRANSCRIPTION_CONCURRENCY = 4
+# 映像解析で 1 リクエストに載せるショット代表フレームの枚数
+DEFAULT_KEYFRAME_BATCH_SIZE = 16
+# プロンプト先頭部分のキャッシュ (cachedContents) の有効期間と、期限前に作り直す余裕
+DEFAULT_CONTEXT_CACHE_TTL_SECONDS = 3600.0
+CONTEXT_CACHE_RENEW_MARGIN_SECONDS = 60.0
+# キャッシュを作れなかった場合 (未対応モデル・トークン数不足など) に再試行を控える時間
+CONTEXT_CACHE_RETRY_SECONDS = 600.0
+
+OCR_INSTRUCTION = (
+    "以下の動画または画像から画面内に表示されるテキストを漏れなく抽出してください。"
+    "タイトルや大きなテロップはもちろん、画面隅に表示される小さな注釈・脚注・免責事項・括弧内の補足・注釈番号(※)なども省略せずに含めてください。"
+    "改行を使って1行ずつ箇条書きで出力し、テキストが短くてもそのまま記載してください。"
+)
+TRANSCRIPTION_INSTRUCTION = (
+    "音声または動画の中の会話やナレーションを正確に文字起こししてください。"
+    "聞き取れない部分は推測せずに [inaudible] と明記してください。"
+)
+CHUNKED_TRANSCRIPTION_INSTRUCTION = (
+    TRANSCRIPTION_INSTRUCTION
+    + "発話ごとに改行し、各行の先頭にこの音声の先頭からの経過時間を [mm:ss] 形式で付けてください。"
+)
+VIDEO_SEGMENT_INSTRUCTION = (
+    "アップロードされた映像の主要なカットやシーンを分析し、"
+    "同じ表現手法・演出パターンでまとめたグループを作成してください。"
+    "JSON 形式で以下の構造に従って返答してください:\n"
+    "{"
+    '"summary": "<全体要約>",'
+    '"segments": ['
+    '{"label": "<表現パターン名>", "description": "<その表現の説明>", '
+    '"shots": [{"timecode": "<開始〜終了>", "description": "<具体的な内容>"}]}'
+    "]"
+    "}\n"
+    "timecode が正確でない場合はおおよその秒数表記でも構いません。"
+)
+SHOT_KEYFRAME_INSTRUCTION = (
+    "以下は映像をショット (カット) ごとに分割し、各ショットの代表フレームを並べたものです。"
+    "各画像の直前に付けたショット番号と区間を手がかりに、"
+    "同じ表現手法・演出パターンのショットをまとめたグループを作成してください。"
+    "JSON 形式で以下の構造に従って返答してください:\n"
+    "{"
+    '"summary": "<全体要約>",'
+    '"segments": ['
+    '{"label": "<表現パターン名>", "description": "<その表現の説明>", '
+    '"shots": [{"shot": <ショット番号>, "description": "<具体的な内容>"}]}'
+    "]"
+    "}\n"
+    "shot には必ず画像に付けたショット番号を整数で記載してください。"
+)
+IMAGE_ANALYSIS_INSTRUCTION = (
+    "提供された画像の構図・被写体・背景要素を分析し、"
+    "社会的感度や法務リスクにつながり得る表現を特定してください。"
+    "JSON 形式で以下の構造に従って返答してください:\n"
+    "{"
+    '"summary": "<全体要約>",'
+    '"segments": ['
+    '{"label": "<注目領域>", "description": "<特徴説明>", '
+    '"shots": [{"timecode": "静止画", "description": "<詳細>"}]}'
+    "]"
+    "}\n"
+    "timecode には静止画である旨を必ず明記してください。"
 )
 
 
 class GeminiAPIError(RuntimeError):
     """Gemini API 呼び出し時のエラー."""
 
+    def __init__(self, message: str, *, status_code: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() not in {"0", "false", "no"}
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401  pylint: disable=import-outside-toplevel,unused-import
+    except ImportError:
+        return False
+    return True
+
+
+def _response_text(payload_json: dict) -> Optional[str]:
+    """generateContent の応答から最初の候補のテキストを取り出す."""
+
+    for candidate in payload_json.get("candidates") or []:
+        content = candidate.get("content") or {}
+        parts = content.get("parts") or []
+        texts = [part.get("text", "") for part in parts if part.get("text")]
+        if texts:
+            return "\n".join(texts).strip()
+    return None
+
+
+def _response_json(payload_json: dict) -> Optional[dict]:
+    """generateContent の応答から JSON として解釈できる最初のテキストを取り出す."""
+
+    for candidate in payload_json.get("candidates") or []:
+        content = candidate.get("content") or {}
+        for part in content.get("parts") or []:
+            text = part.get("text")
+            if not text:
+                continue
+            try:
+                return json.loads(text.strip())
+            except json.JSONDecodeError:
+                continue
+    return None
+
+
+def _as_int(value: object) -> int:
+    try:
+        return int(value)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return 0
+
+
+class _SharedConnection:
+    """同じ接続プールを使う GeminiClient 間で共有する HTTP クライアントと登録済みメディア."""
+
+    def __init__(
+        self,
+        *,
+        timeout: float,
+        transport: Optional[httpx.AsyncBaseTransport],
+        limits: httpx.Limits,
+        http2: bool,
+    ) -> None:
+        self.timeout = timeout
+        self.transport = transport
+        self.limits = limits
+        self.http2 = http2
+        self.media_handles: Dict[tuple, MediaHandle] = {}
+        self.media_locks: Dict[tuple, asyncio.Lock] = {}
+        self.media_digests: Dict[tuple, str] = {}
+        # 長尺音声の長さと無音区間 (ffmpeg で全体をデコードするため同じファイルは 1 度だけ調べる)
+        self.silence_probes: Dict[tuple, Tuple[Optional[float], List[Tuple[float, float]]]] = {}
+        self.probe_locks: Dict[tuple, asyncio.Lock] = {}
+        # キャッシュキーごとに実行中の run_step (同じキーの同時実行は 1 回の呼び出しにまとめる)
+        self.result_flights: Dict[str, asyncio.Future] = {}
+        # (モデル, 先頭部分のダイジェスト) ごとの作成済みキャッシュと、作成に失敗した時刻の期限
+        self.context_caches: Dict[tuple, CachedPrefix] = {}
+        self.context_cache_locks: Dict[tuple, asyncio.Lock] = {}
+        self.context_cache_failures: Dict[tuple, float] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def get(self) -> httpx.AsyncClient:
+        """現在のイベントループに紐づく AsyncClient を返す (未作成なら作成する)."""
+
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            # 別ループで作られたクライアントは再利用できないため作り直す
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                transport=self.transport,
+                limits=self.limits,
+                http2=self.http2,
+            )
+            self._loop = loop
+        return self._client
+
+    async def aclose(self) -> None:
+        client, self._client, self._loop = self._client, None, None
+        if client is not None and not client.is_closed:
+            await client.aclose()
+
 
 class GeminiClient:
-    """Gemini API を利用して字幕テキストを抽出する."""
+    """Gemini API を利用して字幕テキストを抽出する.
+
+    HTTP 接続は長寿命の AsyncClient をプールとして保持し、呼び出し間で
+    TCP/TLS セッションを使い回す。with_model で作ったクライアントも同じプールを共有する。
+    """
 
     def __init__(
         self,
         api_key: Optional[str] = None,
         model: Optional[str] = None,
         timeout: float = 120.0,
+        *,
+        api_root: Optional[str] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        use_files_api: Optional[bool] = None,
+        limits: Optional[httpx.Limits] = None,
+        http2: Optional[bool] = None,
+        result_cache: Optional[GeminiResultCache] = None,
+        request_scheduler: Optional[GeminiRequestScheduler] = None,
     ) -> None:
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
         self.model = model or os.getenv("GEMINI_OCR_MODEL", DEFAULT_MODEL)
         self.timeout = timeout
+        self.api_root = (api_root or os.getenv("GEMINI_API_ROOT", GEMINI_API_ROOT)).rstrip("/")
+        if use_files_api is None:
+            use_files_api = _env_flag("GEMINI_USE_FILES_API", True)
+        self.use_files_api = use_files_api
+        if limits is None:
+            limits = httpx.Limits(
+                max_connections=int(os.getenv("GEMINI_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS)),
+                max_keepalive_connections=int(
+                    os.getenv("GEMINI_MAX_KEEPALIVE_CONNECTIONS", DEFAULT_MAX_KEEPALIVE_CONNECTIONS)
+                ),
+                keepalive_expiry=float(
+                    os.getenv("GEMINI_KEEPALIVE_EXPIRY", DEFAULT_KEEPALIVE_EXPIRY)
+                ),
+            )
+        if http2 is None:
+            http2 = _env_flag("GEMINI_HTTP2", True)
+        if http2 and not _http2_available():
+            logger.warning("h2 is not installed; Gemini client falls back to HTTP/1.1.")
+            http2 = False
+        # run_step の結果キャッシュ (GEMINI_CACHE_MAX_MB=0 で無効)
+        self.result_cache = result_cache or GeminiResultCache.from_env()
+        # レート制限とリトライはプロセス内の全クライアントで共有する
+        self.request_scheduler = request_scheduler or get_default_scheduler()
+        # 長尺音声のチャンク分割 (GEMINI_LONG_MEDIA_SECONDS=0 で常に 1 リクエストで送る)
+        self.long_media_seconds = float(
+            os.getenv("GEMINI_LONG_MEDIA_SECONDS", DEFAULT_LONG_MEDIA_SECONDS)
+        )
+        self.transcription_chunk_seconds = float(
+            os.getenv("GEMINI_TRANSCRIPTION_CHUNK_SECONDS", DEFAULT_CHUNK_SECONDS)
+        )
+        self.transcription_chunk_overlap = float(
+            os.getenv("GEMINI_TRANSCRIPTION_CHUNK_OVERLAP", DEFAULT_OVERLAP_SECONDS)
+        )
+        self.transcription_concurrency = max(
+            1,
+            int(os.getenv("GEMINI_TRANSCRIPTION_CONCURRENCY", DEFAULT_TRANSCRIPTION_CONCURRENCY)),
+        )
+        self.keyframe_batch_size = max(
+            1, int(os.getenv("GEMINI_KEYFRAME_BATCH_SIZE", DEFAULT_KEYFRAME_BATCH_SIZE))
+        )
+        # 全案件で共通のプロンプト先頭部分は cachedContents に 1 度だけ登録して参照する
+        self.context_cache_enabled = _env_flag("GEMINI_CONTEXT_CACHE", True)
+        self.context_cache_ttl = float(
+            os.getenv("GEMINI_CONTEXT_CACHE_TTL", DEFAULT_CONTEXT_CACHE_TTL_SECONDS)
+        )
+        self._shared = _SharedConnection(
+            timeout=timeout, transport=transport, limits=limits, http2=http2
+        )
+
+    def with_model(self, model: str) -> "GeminiClient":
+        """接続プールと登録済みメディアを共有したまま、利用モデルだけを変えたクライアントを返す."""
+
+        if model == self.model:
+            return self
+        client = copy.copy(self)
+        client.model = model
+        return client
+
+    async def open(self) -> None:
+        """接続プールを事前に作成する (FastAPI の startup フックから呼び出す)."""
+
+        self._shared.get()
+
+    async def aclose(self) -> None:
+        """作成したキャッシュを削除して接続プールを閉じる (FastAPI の shutdown フックから呼び出す)."""
+
+        caches = list(self._shared.context_caches.values())
+        self._shared.context_caches.clear()
+        if caches and self.api_key:
+            client = self._http_client()
+            for cached in caches:
+                try:
+                    await delete_cached_content(
+                        client, api_root=self.api_root, api_key=self.api_key, name=cached.name
+                    )
+                except ContextCacheError as exc:
+                    # 削除できなくても TTL で消える
+                    logger.warning("Failed to delete Gemini context cache %s: %s", cached.name, exc)
+        await self._shared.aclose()
+
+    def _endpoint(self) -> str:
+        return f"{self.api_root}/v1beta/models/{self.model}:generateContent"
+
+    def _http_client(self) -> httpx.AsyncClient:
+        return self._shared.get()
+
+    async def register_media(self, media_path: Path) -> MediaHandle:
+        """メディアを 1 度だけ登録し、以降の呼び出しで参照するハンドルを返す.
+
+        Files API が利用できない場合 (API キー未設定・無効化・アップロード失敗) は
+        呼び出しごとにインラインで埋め込むハンドルを返す。
+        """
+
+        key = self._media_key(media_path)
+        lock = self._shared.media_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            cached = self._shared.media_handles.get(key)
+            if cached is not None:
+                return cached
+            if self.result_cache is not None and self.api_key:
+                # 並列に走る各ステップが同じファイルを重複してハッシュしないよう先に計算する
+                await self._media_digest(media_path)
+
+            mime_type, _ = mimetypes.guess_type(media_path.name)
+            content_type = mime_type or "application/octet-stream"
+            handle = MediaHandle(path=media_path, mime_type=content_type, size=key[1])
+            if self.api_key and self.use_files_api:
+                try:
+                    client = self._http_client()
+                    handle = await upload_media(
+                        client,
+                        scheduler=self.request_scheduler,
+                        api_root=self.api_root,
+                        api_key=self.api_key,
+                        path=media_path,
+                        mime_type=content_type,
+                    )
+                    logger.info("Registered %s with Gemini Files API as %s", media_path.name, handle.file_name)
+                except MediaUploadError as exc:
+                    logger.warning(
+                        "Files API unavailable for %s, falling back to inline media: %s",
+                        media_path.name,
+                        exc,
+                    )
+            self._shared.media_handles[key] = handle
+            return handle
+
+    async def release_media(self, handle: MediaHandle) -> None:
+        """register_media で登録したメディアを破棄する."""
+
+        for key, cached in list(self._shared.media_handles.items()):
+            if cached == handle:
+                self._shared.media_handles.pop(key, None)
+                self._shared.media_locks.pop(key, None)
+                self._shared.media_digests.pop(key, None)
+                self._shared.silence_probes.pop(key, None)
+                self._shared.probe_locks.pop(key, None)
+        if not handle.is_remote or not self.api_key:
+            return
+        try:
+            client = self._http_client()
+            await delete_media(
+                client, api_root=self.api_root, api_key=self.api_key, handle=handle
+            )
+        except MediaUploadError as exc:
+            logger.warning("Failed to delete Gemini file %s: %s", handle.file_name, exc)
 
     async def run_step(
         self,
@@ -41,21 +405,117 @@ class GeminiClient:
         media_path: Path,
         *,
         media_type: str = "video",
+        media_handle: Optional[MediaHandle] = None,
+        shot_index: Optional[ShotIndex] = None,
+        run: int = 0,
     ) -> object:
-        """共通インターフェースで個別ステップを実行する."""
+        """共通インターフェースで個別ステップを実行する.
+
+        映像解析では shot_index を渡すと、ショットごとの代表フレームを送って解析する。
+        run は同じ素材を複数回解析して比べる場合の実行番号で、番号ごとに別の結果として
+        キャッシュする (同じ番号の再解析だけがキャッシュに当たる)。
+        """
 
         normalized = name.lower()
+        options: dict = {}
+        settings: Optional[Dict[str, object]] = None
         if normalized in {"transcription", "transcribe", "audio"}:
-            return await self.transcribe_audio(media_path)
-        if normalized in {"ocr", "subtitle", "text"}:
-            return await self.extract_ocr(media_path)
-        if normalized in {"visual", "video", "image"}:
+            instruction, runner = TRANSCRIPTION_INSTRUCTION, self.transcribe_audio
+            settings = self._transcription_settings()
+        elif normalized in {"ocr", "subtitle", "text"}:
+            instruction, runner = OCR_INSTRUCTION, self.extract_ocr
+        elif normalized in {"visual", "video", "image"}:
             if media_type == "image":
-                return await self.analyze_image(media_path)
-            return await self.analyze_video_segments(media_path)
-        raise ValueError(f"Unsupported analysis step: {name}")
+                instruction, runner = IMAGE_ANALYSIS_INSTRUCTION, self.analyze_image
+            else:
+                instruction, runner = VIDEO_SEGMENT_INSTRUCTION, self.analyze_video_segments
+                if shot_index is not None:
+                    options["shot_index"] = shot_index
+                    keyframes = shot_index.has_keyframes()
+                    if keyframes:
+                        instruction = SHOT_KEYFRAME_INSTRUCTION
+                    settings = self._shot_settings(shot_index, keyframes=keyframes)
+        else:
+            raise ValueError(f"Unsupported analysis step: {name}")
+
+        # API キー未設定時のスタブ応答はキャッシュしない
+        if self.result_cache is None or not self.api_key:
+            return await runner(media_path, media_handle=media_handle, **options)
+
+        if run:
+            settings = {**(settings or {}), "run": run}
+        media_digest = await self._media_digest(media_path)
+        cache_key = build_cache_key(media_digest, self.model, instruction, settings)
+
+        flight = self._shared.result_flights.get(cache_key)
+        if flight is not None:
+            # 同じ内容の解析が実行中なら、その結果を待って使う (失敗した場合は自分で実行する)
+            shared = await asyncio.shield(flight)
+            if shared is not None:
+                return copy.deepcopy(shared)
+            return await runner(media_path, media_handle=media_handle, **options)
 
-    async def extract_ocr(self, video_path: Path) -> str:
+        flight = asyncio.get_running_loop().create_future()
+        self._shared.result_flights[cache_key] = flight
+        result: object = None
+        try:
+            cached = await self.result_cache.get(cache_key)
+            if cached is not None:
+                logger.info("Gemini cache hit for %s (%s, %s)", media_path.name, normalized, self.model)
+                result = cached
+            else:
+                result = await runner(media_path, media_handle=media_handle, **options)
+                await self.result_cache.put(cache_key, result)
+            return result
+        finally:
+            self._shared.result_flights.pop(cache_key, None)
+            flight.set_result(result)
+
+    def _transcription_settings(self) -> Dict[str, object]:
+        """文字起こし結果を左右する設定 (長尺の分割の有無とその条件)."""
+
+        if self.long_media_seconds <= 0:
+            return {"chunked": False}
+        return {
+            "chunked": True,
+            "long_media_seconds": self.long_media_seconds,
+            "chunk_seconds": self.transcription_chunk_seconds,
+            "chunk_overlap": self.transcription_chunk_overlap,
+            "silence": [SILENCE_NOISE_DB, SILENCE_MIN_SECONDS],
+            "chunk_instruction": hashlib.sha256(
+                CHUNKED_TRANSCRIPTION_INSTRUCTION.encode("utf-8")
+            ).hexdigest(),
+        }
+
+    def _shot_settings(self, shot_index: ShotIndex, *, keyframes: bool) -> Dict[str, object]:
+        """映像解析の結果を左右するショットの区切り (と代表フレームの送り方)."""
+
+        shots = [[round(shot.start, 3), round(shot.end, 3)] for shot in shot_index.shots]
+        settings: Dict[str, object] = {
+            "shots": hashlib.sha256(json.dumps(shots).encode("utf-8")).hexdigest(),
+        }
+        if keyframes:
+            settings["keyframe_batch_size"] = self.keyframe_batch_size
+        return settings
+
+    async def _media_digest(self, media_path: Path) -> str:
+        """メディア内容の SHA-256 を返す (同じファイルは 1 度だけ計算する)."""
+
+        key = self._media_key(media_path)
+        digest = self._shared.media_digests.get(key)
+        if digest is None:
+            digest = await asyncio.to_thread(sha256_file, media_path)
+            self._shared.media_digests[key] = digest
+        return digest
+
+    @staticmethod
+    def _media_key(media_path: Path) -> tuple:
+        stat = media_path.stat()
+        return (str(media_path.resolve()), stat.st_size, stat.st_mtime_ns)
+
+    async def extract_ocr(
+        self, video_path: Path, *, media_handle: Optional[MediaHandle] = None
+    ) -> str:
         """動画を解析して字幕・注釈を抽出する."""
 
         if not self.api_key:
@@ -67,26 +527,20 @@ class GeminiClient:
         try:
             payload_json = await self._invoke_gemini(
                 video_path,
-                instruction=(
-                    "以下の動画または画像から画面内に表示されるテキストを漏れなく抽出してください。"
-                    "タイトルや大きなテロップはもちろん、画面隅に表示される小さな注釈・脚注・免責事項・括弧内の補足・注釈番号(※)なども省略せずに含めてください。"
-                    "改行を使って1行ずつ箇条書きで出力し、テキストが短くてもそのまま記載してください。"
-                ),
+                media_handle=media_handle,
+                instruction=OCR_INSTRUCTION,
             )
         except GeminiAPIError as exc:
             raise RuntimeError(f"Gemini OCR failed: {exc}") from exc
 
-        candidates = payload_json.get("candidates") or []
-        for candidate in candidates:
-            content = candidate.get("content") or {}
-            parts = content.get("parts") or []
-            texts = [part.get("text", "") for part in parts if part.get("text")]
-            if texts:
-                return "\n".join(texts).strip()
-
-        raise RuntimeError("Gemini API から有効な OCR テキストが取得できませんでした。")
+        text = _response_text(payload_json)
+        if text is None:
+            raise RuntimeError("Gemini API から有効な OCR テキストが取得できませんでした。")
+        return text
 
-    async def transcribe_audio(self, video_path: Path) -> str:
+    async def transcribe_audio(
+        self, video_path: Path, *, media_handle: Optional[MediaHandle] = None
+    ) -> str:
         """音声をテキスト化する."""
 
         if not self.api_key:
@@ -95,72 +549,197 @@ class GeminiClient:
                 "Set GEMINI_API_KEY to enable transcription."
             )
 
+        if self.long_media_seconds > 0:
+            chunked = await self._transcribe_in_chunks(video_path)
+            if chunked is not None:
+                return chunked
+
         try:
             payload_json = await self._invoke_gemini(
                 video_path,
-                instruction=(
-                    "音声または動画の中の会話やナレーションを正確に文字起こししてください。"
-                    "聞き取れない部分は推測せずに [inaudible] と明記してください。"
-                ),
+                media_handle=media_handle,
+                instruction=TRANSCRIPTION_INSTRUCTION,
             )
         except GeminiAPIError as exc:
             raise RuntimeError(f"Gemini transcription failed: {exc}") from exc
 
-        candidates = payload_json.get("candidates") or []
-        for candidate in candidates:
-            content = candidate.get("content") or {}
-            parts = content.get("parts") or []
-            texts = [part.get("text", "") for part in parts if part.get("text")]
-            if texts:
-                return "\n".join(texts).strip()
+        text = _response_text(payload_json)
+        if text is None:
+            raise RuntimeError("Gemini API から文字起こし結果を取得できませんでした。")
+        return text
+
+    async def _probe_silences(
+        self, media_path: Path
+    ) -> Tuple[Optional[float], List[Tuple[float, float]]]:
+        """音声の長さと無音区間を返す (同じファイルは 1 度だけ ffmpeg で調べる)."""
+
+        key = self._media_key(media_path)
+        lock = self._shared.probe_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            probe = self._shared.silence_probes.get(key)
+            if probe is None:
+                probe = await detect_silences(media_path)
+                self._shared.silence_probes[key] = probe
+        return probe
+
+    async def _transcribe_in_chunks(self, media_path: Path) -> Optional[str]:
+        """長尺の音声を無音区間で分割して並列に文字起こしし、絶対タイムコード付きで返す.
+
+        長さが閾値以下、または ffmpeg で長さを測れない場合は None を返す (1 リクエストで送る)。
+        """
+
+        try:
+            duration, silences = await self._probe_silences(media_path)
+        except (MediaJobError, OSError) as exc:
+            logger.info("Could not probe %s for chunked transcription: %s", media_path.name, exc)
+            return None
+        if duration is None or duration <= self.long_media_seconds:
+            return None
+
+        chunks = plan_chunks(
+            duration,
+            silences,
+            chunk_seconds=self.transcription_chunk_seconds,
+            overlap=self.transcription_chunk_overlap,
+        )
+        if len(chunks) < 2:
+            return None
+
+        work_dir = Path(tempfile.mkdtemp(prefix="transcription-chunks-"))
+        try:
+            try:
+                chunk_paths = await split_audio(media_path, chunks, work_dir)
+            except (MediaJobError, OSError) as exc:
+                logger.warning("Failed to split %s into chunks: %s", media_path.name, exc)
+                return None
+            logger.info(
+                "Transcribing %s in %d chunks (%.0fs, concurrency %d)",
+                media_path.name,
+                len(chunks),
+                duration,
+                self.transcription_concurrency,
+            )
+
+            semaphore = asyncio.Semaphore(self.transcription_concurrency)
+
+            async def transcribe_chunk(chunk_path: Path) -> str:
+                async with semaphore:
+                    try:
+                        payload_json = await self._invoke_gemini(
+                            chunk_path, instruction=CHUNKED_TRANSCRIPTION_INSTRUCTION
+                        )
+                    except GeminiAPIError as exc:
+                        raise RuntimeError(f"Gemini transcription failed: {exc}") from exc
+                # 無音だけのチャンクはテキストが返らないことがある
+                return _response_text(payload_json) or ""
+
+            transcripts: List[str] = list(
+                await asyncio.gather(*(transcribe_chunk(path) for path in chunk_paths))
+            )
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        stitched = stitch_transcripts(chunks, transcripts, overlap=self.transcription_chunk_overlap)
+        if not stitched:
+            raise RuntimeError("Gemini API から文字起こし結果を取得できませんでした。")
+        return stitched
 
-        raise RuntimeError("Gemini API から文字起こし結果を取得できませんでした。")
+    async def analyze_video_segments(
+        self,
+        video_path: Path,
+        *,
+        media_handle: Optional[MediaHandle] = None,
+        shot_index: Optional[ShotIndex] = None,
+    ) -> dict:
+        """映像シーンを分析し、表現パターンごとにグルーピングした結果を返す.
 
-    async def analyze_video_segments(self, video_path: Path) -> dict:
-        """映像シーンを分析し、表現パターンごとにグルーピングした結果を返す."""
+        shot_index に代表フレームがあればショット単位で解析し、タイムコードはショット区間を使う。
+        動画ごと送った場合も、返ってきたタイムコードを近いショット境界に合わせる。
+        """
 
         if not self.api_key:
             return self._stub_video_segments(video_path)
 
-        instruction = (
-            "アップロードされた映像の主要なカットやシーンを分析し、"
-            "同じ表現手法・演出パターンでまとめたグループを作成してください。"
-            "JSON 形式で以下の構造に従って返答してください:\n"
-            "{"
-            '"summary": "<全体要約>",'
-            '"segments": ['
-            '{"label": "<表現パターン名>", "description": "<その表現の説明>", '
-            '"shots": [{"timecode": "<開始〜終了>", "description": "<具体的な内容>"}]}'
-            "]"
-            "}\n"
-            "timecode が正確でない場合はおおよその秒数表記でも構いません。"
-        )
+        if shot_index is not None and shot_index.has_keyframes():
+            return await self._analyze_shot_keyframes(shot_index)
+
         try:
             payload_json = await self._invoke_gemini(
                 video_path,
-                instruction=instruction,
+                media_handle=media_handle,
+                instruction=VIDEO_SEGMENT_INSTRUCTION,
                 response_mime_type="application/json",
             )
         except GeminiAPIError as exc:
             raise RuntimeError(f"Gemini video analysis failed: {exc}") from exc
 
-        candidates = payload_json.get("candidates") or []
-        for candidate in candidates:
-            content = candidate.get("content") or {}
-            parts = content.get("parts") or []
-            for part in parts:
-                text = part.get("text")
-                if not text:
-                    continue
-                text = text.strip()
-                try:
-                    return json.loads(text)
-                except json.JSONDecodeError:
-                    continue
+        result = _response_json(payload_json)
+        if result is None:
+            raise RuntimeError("Gemini API から映像解析結果を JSON 形式で取得できませんでした。")
+        if shot_index is not None and shot_index.shots:
+            for segment in result.get("segments") or []:
+                for shot in segment.get("shots") or []:
+                    if isinstance(shot.get("timecode"), str):
+                        shot["timecode"] = shot_index.snap_timecode(shot["timecode"])
+        return result
 
-        raise RuntimeError("Gemini API から映像解析結果を JSON 形式で取得できませんでした。")
+    async def _analyze_shot_keyframes(self, shot_index: ShotIndex) -> dict:
+        """ショットの代表フレームをバッチに分けて並列に送り、結果をまとめる."""
 
-    async def analyze_image(self, image_path: Path) -> dict:
+        shots = shot_index.shots
+        batches = [
+            shots[start:start + self.keyframe_batch_size]
+            for start in range(0, len(shots), self.keyframe_batch_size)
+        ]
+
+        async def analyze_batch(batch: List[Shot]) -> dict:
+            parts: List[dict] = [{"text": SHOT_KEYFRAME_INSTRUCTION}]
+            for shot in batch:
+                keyframe = MediaHandle(
+                    path=shot_index.directory / shot.keyframe, mime_type="image/jpeg", size=0
+                )
+                parts.append({"text": f"ショット {shot.index} ({shot.timecode})"})
+                parts.append(await keyframe.to_part())
+            payload = {
+                "contents": [{"parts": parts}],
+                "generation_config": {"response_mime_type": "application/json"},
+            }
+            try:
+                payload_json = await self._post_generate(payload)
+            except GeminiAPIError as exc:
+                raise RuntimeError(f"Gemini video analysis failed: {exc}") from exc
+            result = _response_json(payload_json)
+            if result is None:
+                raise RuntimeError("Gemini API から映像解析結果を JSON 形式で取得できませんでした。")
+            return result
+
+        results = await asyncio.gather(*(analyze_batch(batch) for batch in batches))
+        logger.info("Analyzed %d shots in %d keyframe batches", len(shots), len(batches))
+
+        # バッチをまたいで同じ表現パターン名のグループは 1 つにまとめる
+        segments: Dict[str, dict] = {}
+        for result in results:
+            for segment in result.get("segments") or []:
+                label = segment.get("label") or "未分類の表現"
+                merged = segments.setdefault(
+                    label, {"label": label, "description": segment.get("description", ""), "shots": []}
+                )
+                for item in segment.get("shots") or []:
+                    shot = shot_index.shot(_as_int(item.get("shot")))
+                    if shot is None:
+                        continue
+                    merged["shots"].append(
+                        {"timecode": shot.timecode, "description": item.get("description", "")}
+                    )
+        summaries = [result.get("summary") for result in results if result.get("summary")]
+        return {
+            "summary": "\n".join(summaries),
+            "segments": [segment for segment in segments.values() if segment["shots"]],
+        }
+
+    async def analyze_image(
+        self, image_path: Path, *, media_handle: Optional[MediaHandle] = None
+    ) -> dict:
         """静止画コンテンツの構図とリスク要素を分析する."""
 
         if not self.api_key:
@@ -181,24 +760,11 @@ class GeminiClient:
                 "risk_flags": ["analysis-unavailable"],
             }
 
-        instruction = (
-            "提供された画像の構図・被写体・背景要素を分析し、"
-            "社会的感度や法務リスクにつながり得る表現を特定してください。"
-            "JSON 形式で以下の構造に従って返答してください:\n"
-            "{"
-            '"summary": "<全体要約>",' 
-            '"segments": ['
-            '{"label": "<注目領域>", "description": "<特徴説明>", '
-            '"shots": [{"timecode": "静止画", "description": "<詳細>"}]}'
-            "]"
-            "}\n"
-            "timecode には静止画である旨を必ず明記してください。"
-        )
-
         try:
             payload_json = await self._invoke_gemini(
                 image_path,
-                instruction=instruction,
+                media_handle=media_handle,
+                instruction=IMAGE_ANALYSIS_INSTRUCTION,
                 response_mime_type="application/json",
             )
         except GeminiAPIError as exc:
@@ -233,23 +799,7 @@ class GeminiClient:
             ]
         }
 
-        endpoint = GEMINI_ENDPOINT_TEMPLATE.format(model=self.model)
-        params = {"key": self.api_key}
-
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            try:
-                response = await client.post(endpoint, params=params, json=payload)
-                response.raise_for_status()
-            except httpx.HTTPStatusError as exc:
-                try:
-                    error_detail = exc.response.json()
-                except ValueError:
-                    error_detail = exc.response.text
-                raise GeminiAPIError(
-                    f"{exc.response.status_code} {error_detail}"
-                ) from exc
-
-        payload_json = response.json()
+        payload_json = await self._post_generate(payload)
         candidates = payload_json.get("candidates") or []
         for candidate in candidates:
             content = candidate.get("content") or {}
@@ -261,8 +811,69 @@ class GeminiClient:
 
         raise RuntimeError("Gemini API からテキスト応答を取得できませんでした。")
 
-    async def generate_structured_judgement(self, instruction: str, content: str) -> dict:
-        """テキストのみを対象に JSON 形式の回答を生成する."""
+    async def cache_prompt_prefix(self, prefix: PromptPrefix) -> Optional[str]:
+        """prefix を現在のモデル用のキャッシュに登録し、そのキャッシュ名を返す.
+
+        登録済みで期限内ならそれを使い回す。キャッシュを使えない場合は None を返す。
+        """
+
+        if not (self.api_key and self.context_cache_enabled):
+            return None
+        key = (self.model, prefix.digest)
+        if self._shared.context_cache_failures.get(key, 0.0) > time.monotonic():
+            return None
+        lock = self._shared.context_cache_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            cached = self._shared.context_caches.get(key)
+            if cached is not None and cached.expires_at - CONTEXT_CACHE_RENEW_MARGIN_SECONDS > now:
+                return cached.name
+            try:
+                cached = await create_cached_content(
+                    self._http_client(),
+                    scheduler=self.request_scheduler,
+                    api_root=self.api_root,
+                    api_key=self.api_key,
+                    model=self.model,
+                    prefix=prefix,
+                    ttl_seconds=self.context_cache_ttl,
+                )
+            except ContextCacheError as exc:
+                logger.warning(
+                    "Context cache unavailable for %s on %s, inlining the prompt prefix: %s",
+                    prefix.label,
+                    self.model,
+                    exc,
+                )
+                self._shared.context_cache_failures[key] = now + CONTEXT_CACHE_RETRY_SECONDS
+                return None
+            # 期限切れのもの (参照データの旧版など) は一覧から外す
+            for stale_key, stale in list(self._shared.context_caches.items()):
+                if stale.expires_at <= now:
+                    self._shared.context_caches.pop(stale_key, None)
+            self._shared.context_caches[key] = cached
+            logger.info("Cached prompt prefix %s for %s as %s", prefix.label, self.model, cached.name)
+            return cached.name
+
+    def _forget_prompt_prefix(self, prefix: PromptPrefix, name: str) -> None:
+        key = (self.model, prefix.digest)
+        cached = self._shared.context_caches.get(key)
+        if cached is not None and cached.name == name:
+            self._shared.context_caches.pop(key, None)
+
+    async def generate_structured_judgement(
+        self,
+        instruction: str,
+        content: str,
+        *,
+        prefix: Optional[PromptPrefix] = None,
+        prefix_content: Optional[str] = None,
+    ) -> dict:
+        """テキストのみを対象に JSON 形式の回答を生成する.
+
+        prefix を渡すと、指示文と参照データをキャッシュから参照し、prefix_content
+        (省略時は content) だけを送る。キャッシュを使えない場合は instruction と content を送る。
+        """
 
         if not self.api_key:
             return {
@@ -280,35 +891,46 @@ class GeminiClient:
                 "tags": [],
             }
 
-        payload = {
-            "contents": [
+        generation_config = {"response_mime_type": "application/json"}
+        payload_json: Optional[dict] = None
+        cache_name = await self.cache_prompt_prefix(prefix) if prefix is not None else None
+        if cache_name:
+            cached_text = prefix_content if prefix_content is not None else content
+            try:
+                payload_json = await self._post_generate(
+                    {
+                        "cached_content": cache_name,
+                        "contents": [
+                            {
+                                "role": "user",
+                                "parts": [{"text": cached_text}],
+                            }
+                        ],
+                        "generation_config": generation_config,
+                    }
+                )
+            except GeminiAPIError as exc:
+                if exc.status_code not in {400, 403, 404}:
+                    raise
+                # キャッシュが期限切れ・削除済みの場合は、この呼び出しはインラインで送る
+                logger.warning("Context cache %s rejected, inlining the prompt prefix: %s", cache_name, exc)
+                self._forget_prompt_prefix(prefix, cache_name)
+
+        if payload_json is None:
+            payload_json = await self._post_generate(
                 {
-                    "parts": [
-                        {"text": instruction},
-                        {"text": content},
-                    ]
+                    "contents": [
+                        {
+                            "parts": [
+                                {"text": instruction},
+                                {"text": content},
+                            ]
+                        }
+                    ],
+                    "generation_config": generation_config,
                 }
-            ],
-            "generation_config": {"response_mime_type": "application/json"},
-        }
-
-        endpoint = GEMINI_ENDPOINT_TEMPLATE.format(model=self.model)
-        params = {"key": self.api_key}
+            )
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            try:
-                response = await client.post(endpoint, params=params, json=payload)
-                response.raise_for_status()
-            except httpx.HTTPStatusError as exc:
-                try:
-                    error_detail = exc.response.json()
-                except ValueError:
-                    error_detail = exc.response.text
-                raise GeminiAPIError(
-                    f"{exc.response.status_code} {error_detail}"
-                ) from exc
-
-        payload_json = response.json()
         candidates = payload_json.get("candidates") or []
         for candidate in candidates:
             content = candidate.get("content") or {}
@@ -329,27 +951,30 @@ class GeminiClient:
         video_path: Path,
         instruction: str,
         response_mime_type: Optional[str] = None,
+        *,
+        media_handle: Optional[MediaHandle] = None,
     ) -> dict:
-        """Gemini API を呼び出しレスポンス JSON を返す共通ヘルパー."""
+        """Gemini API を呼び出しレスポンス JSON を返す共通ヘルパー.
 
-        file_bytes = await asyncio.to_thread(video_path.read_bytes)
-        mime_type, _ = mimetypes.guess_type(video_path.name)
-        content_type = mime_type or "application/octet-stream"
-        encoded_media = base64.b64encode(file_bytes).decode("utf-8")
+        media_handle が Files API 登録済みであれば URI で参照し、
+        未指定またはインライン用ハンドルの場合はファイルを base64 で埋め込む。
+        """
+
+        if media_handle is None:
+            mime_type, _ = mimetypes.guess_type(video_path.name)
+            media_handle = MediaHandle(
+                path=video_path,
+                mime_type=mime_type or "application/octet-stream",
+                size=0,
+            )
+        media_part = await media_handle.to_part()
 
-        endpoint = GEMINI_ENDPOINT_TEMPLATE.format(model=self.model)
-        params = {"key": self.api_key}
         payload = {
             "contents": [
                 {
                     "parts": [
                         {"text": instruction},
-                        {
-                            "inline_data": {
-                                "mime_type": content_type,
-                                "data": encoded_media,
-                            }
-                        },
+                        media_part,
                     ]
                 }
             ]
@@ -357,19 +982,34 @@ class GeminiClient:
         if response_mime_type:
             payload["generation_config"] = {"response_mime_type": response_mime_type}
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
+        return await self._post_generate(payload)
+
+    async def _post_generate(self, payload: dict) -> dict:
+        """generateContent を呼び出す.
+
+        プロセス共有のスケジューラでレート制御し、429/5xx はバックオフしてリトライする。
+        """
+
+        endpoint = self._endpoint()
+        params = {"key": self.api_key}
+        client = self._http_client()
+        try:
+            response = await self.request_scheduler.send(
+                lambda: client.post(endpoint, params=params, json=payload)
+            )
+            response.raise_for_status()
+        except httpx.HTTPStatusError as exc:
             try:
-                response = await client.post(endpoint, params=params, json=payload)
-                response.raise_for_status()
-            except httpx.HTTPStatusError as exc:
-                try:
-                    error_detail = exc.response.json()
-                except ValueError:
-                    error_detail = exc.response.text
-                raise GeminiAPIError(
-                    f"{exc.response.status_code} {error_detail}"
-                ) from exc
-            return response.json()
+                error_detail = exc.response.json()
+            except ValueError:
+                error_detail = exc.response.text
+            raise GeminiAPIError(
+                f"{exc.response.status_code} {error_detail}",
+                status_code=exc.response.status_code,
+            ) from exc
+        except httpx.TransportError as exc:
+            raise GeminiAPIError(f"connection failed: {exc}") from exc
+        return response.json()
 
     def _stub_video_segments(self, video_path: Path) -> dict:
         """Gemini 連携が無い場合のダミー映像解析."""
@@ -0,0 +1,99 @@
+"""Gemini の context caching (cachedContents) によるプロンプト先頭部分の共有."""
+
+from __future__ import annotations
+
+import hashlib
+import time
+from dataclasses import dataclass
+
+import httpx
+
+from backend.models.rate_limit import GeminiRequestScheduler
+
+
+class ContextCacheError(RuntimeError):
+    """cachedContents の作成や削除に失敗した場合のエラー."""
+
+
+@dataclass(frozen=True)
+class PromptPrefix:
+    """呼び出し間で変わらないプロンプトの先頭部分 (指示文と参照データ).
+
+    label は API 上の表示名で、参照データの版などを入れておくと追跡しやすい。
+    """
+
+    instruction: str
+    text: str
+    label: str = "prompt-prefix"
+
+    @property
+    def digest(self) -> str:
+        return hashlib.sha256(
+            f"{self.instruction}\0{self.text}".encode("utf-8")
+        ).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class CachedPrefix:
+    """作成済みのキャッシュ. expires_at は time.monotonic() 基準の期限."""
+
+    name: str
+    expires_at: float
+
+
+async def create_cached_content(
+    client: httpx.AsyncClient,
+    *,
+    scheduler: GeminiRequestScheduler,
+    api_root: str,
+    api_key: str,
+    model: str,
+    prefix: PromptPrefix,
+    ttl_seconds: float,
+) -> CachedPrefix:
+    """prefix を指示文 (system_instruction) と先頭の内容としてキャッシュに登録する."""
+
+    started = time.monotonic()
+    try:
+        response = await scheduler.send(
+            lambda: client.post(
+                f"{api_root}/v1beta/cachedContents",
+                params={"key": api_key},
+                json={
+                    "model": f"models/{model}",
+                    "display_name": prefix.label,
+                    "system_instruction": {"parts": [{"text": prefix.instruction}]},
+                    "contents": [{"role": "user", "parts": [{"text": prefix.text}]}],
+                    "ttl": f"{int(ttl_seconds)}s",
+                },
+            )
+        )
+        response.raise_for_status()
+    except httpx.HTTPStatusError as exc:
+        # モデルが未対応・トークン数が最小値未満などは 400 で返る
+        raise ContextCacheError(
+            f"cachedContents create failed: {exc.response.status_code} {exc.response.text}"
+        ) from exc
+    except httpx.HTTPError as exc:
+        raise ContextCacheError(f"cachedContents create failed: {exc}") from exc
+
+    name = response.json().get("name")
+    if not name:
+        raise ContextCacheError("cachedContents のレスポンスにキャッシュ名が含まれていません。")
+    return CachedPrefix(name=name, expires_at=started + ttl_seconds)
+
+
+async def delete_cached_content(
+    client: httpx.AsyncClient,
+    *,
+    api_root: str,
+    api_key: str,
+    name: str,
+) -> None:
+    """作成したキャッシュを削除する."""
+
+    try:
+        response = await client.delete(f"{api_root}/v1beta/{name}", params={"key": api_key})
+        response.raise_for_status()
+    except httpx.HTTPError as exc:
+        raise ContextCacheError(f"cachedContents delete failed: {exc}") from exc
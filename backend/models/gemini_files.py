@@ -0,0 +1,182 @@
+"""Gemini Files API を利用したメディアハンドル管理."""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+import aiofiles
+import httpx
+
+from backend.models.rate_limit import GeminiRequestScheduler
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+FILE_ACTIVE_POLL_INTERVAL = 2.0
+FILE_ACTIVE_TIMEOUT = 300.0
+
+
+class MediaUploadError(RuntimeError):
+    """Files API へのアップロードや状態確認に失敗した場合のエラー."""
+
+
+@dataclass(frozen=True)
+class MediaHandle:
+    """Gemini へ渡すメディアの参照.
+
+    file_uri がある場合は Files API に登録済みのファイルを参照し、
+    無い場合は呼び出しのたびにインラインで埋め込む。
+    """
+
+    path: Path
+    mime_type: str
+    size: int
+    file_uri: Optional[str] = None
+    file_name: Optional[str] = None
+
+    @property
+    def is_remote(self) -> bool:
+        return self.file_uri is not None
+
+    async def to_part(self) -> dict:
+        """generateContent の parts に渡す要素を返す."""
+
+        if self.file_uri:
+            return {"file_data": {"mime_type": self.mime_type, "file_uri": self.file_uri}}
+        file_bytes = await asyncio.to_thread(self.path.read_bytes)
+        return {
+            "inline_data": {
+                "mime_type": self.mime_type,
+                "data": base64.b64encode(file_bytes).decode("utf-8"),
+            }
+        }
+
+
+async def _iter_file_chunks(path: Path) -> AsyncIterator[bytes]:
+    async with aiofiles.open(path, "rb") as file_obj:
+        while chunk := await file_obj.read(UPLOAD_CHUNK_SIZE):
+            yield chunk
+
+
+async def upload_media(
+    client: httpx.AsyncClient,
+    *,
+    scheduler: GeminiRequestScheduler,
+    api_root: str,
+    api_key: str,
+    path: Path,
+    mime_type: str,
+) -> MediaHandle:
+    """Files API の resumable アップロードでファイルを登録し、利用可能になるまで待つ.
+
+    本体はチャンク単位でストリーミング送信するため、ファイル全体をメモリに載せない。
+    各リクエストは generateContent と同じ scheduler でレート制御・リトライする。
+    """
+
+    size = path.stat().st_size
+    params = {"key": api_key}
+    try:
+        start = await scheduler.send(
+            lambda: client.post(
+                f"{api_root}/upload/v1beta/files",
+                params=params,
+                headers={
+                    "X-Goog-Upload-Protocol": "resumable",
+                    "X-Goog-Upload-Command": "start",
+                    "X-Goog-Upload-Header-Content-Length": str(size),
+                    "X-Goog-Upload-Header-Content-Type": mime_type,
+                },
+                json={"file": {"display_name": path.name}},
+            )
+        )
+        start.raise_for_status()
+        upload_url = start.headers.get("x-goog-upload-url")
+        if not upload_url:
+            raise MediaUploadError("Files API がアップロード URL を返しませんでした。")
+
+        # 再送時も先頭から読み直せるよう、本体のイテレータは送信のたびに作る
+        finalize = await scheduler.send(
+            lambda: client.post(
+                upload_url,
+                headers={
+                    "Content-Length": str(size),
+                    "X-Goog-Upload-Offset": "0",
+                    "X-Goog-Upload-Command": "upload, finalize",
+                },
+                content=_iter_file_chunks(path),
+            )
+        )
+        finalize.raise_for_status()
+    except httpx.HTTPError as exc:
+        raise MediaUploadError(f"Files API upload failed: {exc}") from exc
+
+    file_info = finalize.json().get("file") or {}
+    file_name = file_info.get("name")
+    file_uri = file_info.get("uri")
+    if not file_name or not file_uri:
+        raise MediaUploadError("Files API のレスポンスにファイル情報が含まれていません。")
+
+    if file_info.get("state") == "PROCESSING":
+        await _wait_until_active(
+            client, scheduler=scheduler, api_root=api_root, api_key=api_key, file_name=file_name
+        )
+
+    return MediaHandle(
+        path=path,
+        mime_type=file_info.get("mimeType") or mime_type,
+        size=size,
+        file_uri=file_uri,
+        file_name=file_name,
+    )
+
+
+async def _wait_until_active(
+    client: httpx.AsyncClient,
+    *,
+    scheduler: GeminiRequestScheduler,
+    api_root: str,
+    api_key: str,
+    file_name: str,
+) -> None:
+    """動画ファイルのサーバー側処理 (PROCESSING) が終わるまでポーリングする."""
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + FILE_ACTIVE_TIMEOUT
+    while True:
+        try:
+            response = await scheduler.send(
+                lambda: client.get(f"{api_root}/v1beta/{file_name}", params={"key": api_key})
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as exc:
+            raise MediaUploadError(f"Files API status check failed: {exc}") from exc
+        state = response.json().get("state")
+        if state == "ACTIVE":
+            return
+        if state == "FAILED":
+            raise MediaUploadError(f"Files API がファイル処理に失敗しました: {file_name}")
+        if loop.time() >= deadline:
+            raise MediaUploadError(f"Files API のファイル処理がタイムアウトしました: {file_name}")
+        await asyncio.sleep(FILE_ACTIVE_POLL_INTERVAL)
+
+
+async def delete_media(
+    client: httpx.AsyncClient,
+    *,
+    api_root: str,
+    api_key: str,
+    handle: MediaHandle,
+) -> None:
+    """Files API に登録したファイルを削除する."""
+
+    if not handle.file_name:
+        return
+    try:
+        response = await client.delete(
+            f"{api_root}/v1beta/{handle.file_name}", params={"key": api_key}
+        )
+        response.raise_for_status()
+    except httpx.HTTPError as exc:
+        raise MediaUploadError(f"Files API delete failed: {exc}") from exc
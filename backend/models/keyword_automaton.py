@@ -0,0 +1,143 @@
+"""タグリストのキーワードを Aho–Corasick オートマトンにまとめ、本文を 1 回の走査で照合する."""
+
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Generic, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# (タグの位置, サブタグの位置 or None)
+TagKey = Tuple[int, Optional[int]]
+
+
+def fold_case(text: str) -> str:
+    """大文字小文字を無視して照合するため小文字にそろえる (文字数は変えない)."""
+
+    # "İ" のように小文字化で 2 文字になる文字はそのまま残し、照合位置を元の文字列と対応させる
+    return "".join(lowered if len(lowered := char.lower()) == 1 else char for char in text)
+
+
+def extract_definition_keywords(definition: Optional[str]) -> List[str]:
+    """タグ定義の "/"・"|"・","・空白区切りをキーワードの一覧にする."""
+
+    if not definition:
+        return []
+    return [
+        token.strip()
+        for token in definition.replace("/", " ").replace("|", " ").replace(",", " ").split()
+        if token.strip()
+    ]
+
+
+@dataclass(frozen=True)
+class KeywordHit(Generic[T]):
+    start: int
+    end: int
+    keyword: str
+    value: T
+
+
+class KeywordAutomaton(Generic[T]):
+    """複数キーワードの同時検索 (Aho–Corasick). 照合は本文の長さに比例する 1 回の走査で済む.
+
+    add で登録したキーワードは初回の検索時 (または build 時) に失敗リンクを張って固定する。
+    """
+
+    def __init__(self) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[List[Tuple[str, T]]] = [[]]
+        self._built = True
+
+    def __len__(self) -> int:
+        return sum(len(outputs) for outputs in self._outputs)
+
+    def add(self, keyword: str, value: T) -> None:
+        pattern = fold_case(keyword)
+        if not pattern:
+            return
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            state = next_state
+        self._outputs[state].append((keyword, value))
+        self._built = False
+
+    def build(self) -> None:
+        """幅優先で失敗リンクを張り、失敗先の出力を各状態にまとめる."""
+
+        queue = deque()
+        for state in self._goto[0].values():
+            self._fail[state] = 0
+            queue.append(state)
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+        self._built = True
+
+    def iter_matches(self, text: str) -> Iterator[KeywordHit[T]]:
+        """text 中のすべての出現を (開始位置, 終了位置, キーワード, 値) で返す (終了位置の昇順)."""
+
+        if not self._built:
+            self.build()
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        state = 0
+        for position, char in enumerate(fold_case(text)):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for keyword, value in outputs[state]:
+                end = position + 1
+                yield KeywordHit(start=end - len(keyword), end=end, keyword=keyword, value=value)
+
+
+@dataclass(frozen=True)
+class TagKeywordHit:
+    """タグ (またはサブタグ) ごとに採用したキーワードと、その最初の出現位置."""
+
+    keyword: str
+    start: int
+    end: int
+
+
+class TagKeywordIndex:
+    """タグリスト全体のキーワードを 1 つのオートマトンにまとめた索引."""
+
+    def __init__(self, structure: Sequence[Dict[str, object]]) -> None:
+        self.automaton: KeywordAutomaton[Tuple[TagKey, int]] = KeywordAutomaton()
+        for tag_position, tag in enumerate(structure):
+            self._add_definition((tag_position, None), tag.get("definition"))
+            for sub_position, sub in enumerate(tag.get("sub_tags") or []):
+                self._add_definition((tag_position, sub_position), sub.get("definition"))
+        self.automaton.build()
+
+    def _add_definition(self, key: TagKey, definition: object) -> None:
+        keywords = extract_definition_keywords(str(definition) if definition else None)
+        for order, keyword in enumerate(keywords):
+            self.automaton.add(keyword, (key, order))
+
+    def scan(self, text: str) -> Dict[TagKey, TagKeywordHit]:
+        """text を 1 回走査し、タグごとに定義順で最も先に書かれたキーワードのヒットを返す."""
+
+        best: Dict[TagKey, Tuple[int, TagKeywordHit]] = {}
+        for hit in self.automaton.iter_matches(text):
+            key, order = hit.value
+            current = best.get(key)
+            if current is None or order < current[0]:
+                best[key] = (order, TagKeywordHit(keyword=hit.keyword, start=hit.start, end=hit.end))
+        return {key: hit for key, (_, hit) in best.items()}
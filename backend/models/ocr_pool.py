@@ -0,0 +1,138 @@
+"""EasyOCR の Reader をプロセス内で使い回すプール."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OCR_LANGUAGES = ("ja", "en")
+DEFAULT_OCR_POOL_SIZE = 1
+
+
+def _create_easyocr_reader(languages: Sequence[str], gpu: bool) -> Any:
+    import easyocr  # 重いので実際に Reader を作るときだけ読み込む
+
+    return easyocr.Reader(list(languages), gpu=gpu)
+
+
+class OCRReaderPool:
+    """EasyOCR Reader を最大 size 個まで保持し、専用スレッドで readtext を実行する.
+
+    Reader のモデル読み込みには数秒かかるため、初回利用時 (または warm_up) に作成して
+    以降のリクエストで使い回す。1 つの Reader は同時に 1 スレッドからしか使わない。
+    """
+
+    def __init__(
+        self,
+        *,
+        languages: Sequence[str] = DEFAULT_OCR_LANGUAGES,
+        size: int = DEFAULT_OCR_POOL_SIZE,
+        gpu: bool = False,
+        reader_factory: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        self.languages = tuple(languages)
+        self.size = max(1, size)
+        self.gpu = gpu
+        self._reader_factory = reader_factory or (
+            lambda: _create_easyocr_reader(self.languages, self.gpu)
+        )
+        self._idle: "queue.Queue[Any]" = queue.Queue()
+        self._created = 0
+        self._create_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "OCRReaderPool":
+        languages = os.getenv("OCR_LANGUAGES")
+        return cls(
+            languages=(
+                tuple(lang.strip() for lang in languages.split(",") if lang.strip())
+                if languages
+                else DEFAULT_OCR_LANGUAGES
+            ),
+            size=int(os.getenv("OCR_READER_POOL_SIZE", DEFAULT_OCR_POOL_SIZE)),
+            gpu=os.getenv("OCR_USE_GPU", "false").lower() in {"1", "true", "yes"},
+        )
+
+    @property
+    def created(self) -> int:
+        """これまでに作成した Reader の数."""
+
+        return self._created
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.size, thread_name_prefix="ocr-reader"
+                )
+            return self._executor
+
+    def _checkout(self) -> Any:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._create_lock:
+            if self._created < self.size:
+                logger.info("Loading EasyOCR reader (%s)", ",".join(self.languages))
+                reader = self._reader_factory()
+                self._created += 1
+                return reader
+        return self._idle.get()
+
+    def _readtext_sync(self, image: Any, kwargs: dict) -> List[Any]:
+        reader = self._checkout()
+        try:
+            return reader.readtext(image, **kwargs)
+        finally:
+            self._idle.put(reader)
+
+    def _warm_up_sync(self) -> None:
+        readers = []
+        with self._create_lock:
+            while self._created < self.size:
+                readers.append(self._reader_factory())
+                self._created += 1
+        for reader in readers:
+            self._idle.put(reader)
+
+    async def warm_up(self) -> None:
+        """Reader を size 個まで前もって読み込んでおく."""
+
+        await asyncio.get_running_loop().run_in_executor(self._get_executor(), self._warm_up_sync)
+
+    async def readtext(self, image: Any, **kwargs: Any) -> List[Any]:
+        """プール内の Reader で readtext を実行する (イベントループはブロックしない)."""
+
+        return await asyncio.get_running_loop().run_in_executor(
+            self._get_executor(), self._readtext_sync, image, kwargs
+        )
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_default_pool: Optional[OCRReaderPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_ocr_pool() -> OCRReaderPool:
+    """プロセス内で共有する OCR プールを返す."""
+
+    global _default_pool  # pylint: disable=global-statement
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = OCRReaderPool.from_env()
+        return _default_pool
@@ -0,0 +1,246 @@
+"""リスク評価のプロンプトに載せる参照データを、コンテンツに関係する部分だけに絞る.
+
+タグ体系・炎上事例・法務リストを毎回すべて送る代わりに、キーワード照合と n-gram 索引で
+コンテンツに関係するタグ・サブタグ・事例・法令の行を選び、トークン数の上限内で組み立てる。
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from backend.models.keyword_automaton import TagKeywordIndex
+from backend.models.similarity_index import NgramIndex
+
+DEFAULT_TOKEN_BUDGET = 4000
+MAX_CONTEXT_TAGS = 6
+MAX_CONTEXT_CASES = 5
+MAX_CONTEXT_LEGAL_ROWS = 8
+# 参照文のうちコンテンツに現れる n-gram の割合 (長い参照文ほど小さくなるため低めにとる)
+CONTEXT_MIN_SCORE = 0.02
+# 事例は発火の経緯と付与タグだけを送る (事例名は回答で引用させないため含めない)
+CASE_CONTEXT_COLUMNS = ("発火要因", "タグ１", "細分化タグ", "全体像")
+
+ContextIndexes = Tuple[NgramIndex, List[Dict[str, object]], NgramIndex, List[Dict[str, object]]]
+
+
+def estimate_tokens(text: str) -> int:
+    """トークン数の概算 (ASCII はおよそ 4 文字で 1、日本語などは 1 文字で 1 とみなす)."""
+
+    ascii_chars = sum(1 for char in text if char.isascii())
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def context_filter_enabled() -> bool:
+    return os.getenv("RISK_CONTEXT_FILTER", "true").lower() not in {"0", "false", "no"}
+
+
+def _cell(value: object) -> str:
+    return str(value if value is not None else "").strip()
+
+
+def _filled_cells(row: Dict[str, object]) -> List[str]:
+    return [text for text in (_cell(value) for value in row.values()) if text]
+
+
+def build_context_indexes(
+    case_rows: Sequence[Dict[str, object]], legal_rows: Sequence[Dict[str, object]]
+) -> ContextIndexes:
+    """炎上事例と法務リストの各行の n-gram 索引を作る (見出しだけの行は除く)."""
+
+    case_records = [
+        row for row in case_rows if any(_cell(row.get(column)) for column in CASE_CONTEXT_COLUMNS)
+    ]
+    legal_records = [row for row in legal_rows if len(_filled_cells(row)) > 1]
+    return (
+        NgramIndex(
+            [
+                " ".join(_cell(row.get(column)) for column in CASE_CONTEXT_COLUMNS)
+                for row in case_records
+            ]
+        ),
+        case_records,
+        NgramIndex([" ".join(_filled_cells(row)) for row in legal_records]),
+        legal_records,
+    )
+
+
+def _csv_line(values: Sequence[object]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow(values)
+    return buffer.getvalue()
+
+
+@dataclass
+class ReferenceContext:
+    """プロンプトに載せる参照データと、選んだ件数 (区分ごとに 選択数/全体数).
+
+    text は static_text (どのコンテンツでも共通の部分) と relevant_text (コンテンツに
+    関係する部分) をつないだもの。
+    """
+
+    text: str
+    tokens: int
+    selected: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+    static_text: str = ""
+    relevant_text: str = ""
+
+
+class ReferenceContextBuilder:
+    """コンテンツごとに関係する参照データだけを選んでプロンプト用のテキストにする."""
+
+    def __init__(
+        self,
+        *,
+        tag_structure: List[Dict[str, object]],
+        tag_summary: str,
+        tag_keyword_index: TagKeywordIndex,
+        tag_index: NgramIndex,
+        tag_records: List[Dict[str, object]],
+        context_indexes: ContextIndexes,
+        legal_rows: Sequence[Dict[str, object]],
+        token_budget: Optional[int] = None,
+    ) -> None:
+        self.tag_structure = tag_structure
+        self.tag_summary = tag_summary
+        self.tag_keyword_index = tag_keyword_index
+        self.tag_index = tag_index
+        self.tag_records = tag_records
+        self.case_index, self.case_records, self.legal_index, self.legal_records = context_indexes
+        self.legal_columns: List[str] = list(legal_rows[0].keys()) if legal_rows else []
+        # 法令名だけの見出し行は、法務リストの全体像として常に載せる
+        self.legal_headings = [
+            cells[0] for cells in (_filled_cells(row) for row in legal_rows) if len(cells) == 1
+        ]
+        # タグ体系の概要と法令名の一覧はコンテンツによらず常に載せる
+        static_sections = [f"## Tag Taxonomy Summary\n{self.tag_summary}"]
+        if self.legal_headings:
+            static_sections.append(
+                "## Legal Reference Index\n" + "\n".join(f"- {name}" for name in self.legal_headings)
+            )
+        self.static_text = "\n\n".join(static_sections)
+        if token_budget is None:
+            token_budget = int(os.getenv("RISK_CONTEXT_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET))
+        self.token_budget = token_budget
+        self._tag_positions: Dict[str, int] = {}
+        self._sub_positions: Dict[Tuple[str, str], Tuple[int, int]] = {}
+        for tag_position, tag in enumerate(tag_structure):
+            name = _cell(tag.get("name"))
+            self._tag_positions.setdefault(name, tag_position)
+            for sub_position, sub in enumerate(tag.get("sub_tags") or []):
+                self._sub_positions.setdefault(
+                    (name, _cell(sub.get("name"))), (tag_position, sub_position)
+                )
+
+    def _select_tags(self, content: str) -> List[Tuple[int, Set[int]]]:
+        """関係するタグを (タグの位置, 該当したサブタグの位置) で関連の強い順に返す."""
+
+        scores: Dict[int, float] = {}
+        subs: Dict[int, Set[int]] = {}
+
+        def register(tag_position: int, sub_position: Optional[int], score: float) -> None:
+            scores[tag_position] = max(scores.get(tag_position, 0.0), score)
+            if sub_position is not None:
+                subs.setdefault(tag_position, set()).add(sub_position)
+
+        # 定義のキーワードが本文に現れたタグは、類似度よりも優先する
+        for tag_position, sub_position in self.tag_keyword_index.scan(content):
+            register(tag_position, sub_position, 1.0)
+        for doc_id, score in self.tag_index.search(
+            content, min_score=CONTEXT_MIN_SCORE, limit=MAX_CONTEXT_TAGS * 2
+        ):
+            entry = self.tag_records[doc_id]
+            name = _cell(entry.get("name"))
+            if entry.get("type") == "subtag":
+                position = self._sub_positions.get((_cell(entry.get("parent")), name))
+                if position is not None:
+                    register(position[0], position[1], score)
+            elif name in self._tag_positions:
+                register(self._tag_positions[name], None, score)
+
+        ranked = sorted(scores, key=lambda position: (-scores[position], position))
+        return [(position, subs.get(position, set())) for position in ranked[:MAX_CONTEXT_TAGS]]
+
+    def _tag_payload(self, tag_position: int, sub_positions: Set[int]) -> Dict[str, object]:
+        tag = self.tag_structure[tag_position]
+        sub_tags = list(tag.get("sub_tags") or [])
+        payload = {key: value for key, value in tag.items() if key != "sub_tags"}
+        if not sub_positions:
+            # どのサブタグか絞れないときはすべて載せる
+            payload["sub_tags"] = sub_tags
+            return payload
+        payload["sub_tags"] = [sub for index, sub in enumerate(sub_tags) if index in sub_positions]
+        others = [
+            sub.get("name") for index, sub in enumerate(sub_tags) if index not in sub_positions
+        ]
+        if others:
+            payload["other_sub_tags"] = others
+        return payload
+
+    def build(self, content: str) -> ReferenceContext:
+        """content に関係する参照データを token_budget の範囲で組み立てる."""
+
+        used = estimate_tokens(self.static_text)
+
+        def fill(header: str, items: Sequence[str]) -> Tuple[Optional[str], int]:
+            """上限に収まる項目だけで区分を作る (見出しも 1 件目を載せるときに数える)."""
+
+            nonlocal used
+            accepted: List[str] = []
+            for item in items:
+                cost = estimate_tokens(item) + (0 if accepted else estimate_tokens(header))
+                if used + cost > self.token_budget:
+                    continue
+                used += cost
+                accepted.append(item)
+            if not accepted:
+                return None, 0
+            return header + "".join(accepted), len(accepted)
+
+        # タグ → 法令 → 事例の順に、関連の強いものから上限に収まるだけ載せる
+        tags_section, tag_count = fill(
+            "## Relevant Tags (JSONL)\n",
+            [
+                json.dumps(self._tag_payload(position, subs), ensure_ascii=False) + "\n"
+                for position, subs in self._select_tags(content)
+            ],
+        )
+        legal_section, legal_count = fill(
+            "## Relevant Legal References\n" + _csv_line(self.legal_columns),
+            [
+                _csv_line([self.legal_records[doc_id].get(column, "") for column in self.legal_columns])
+                for doc_id, _ in self.legal_index.search(
+                    content, min_score=CONTEXT_MIN_SCORE, limit=MAX_CONTEXT_LEGAL_ROWS
+                )
+            ],
+        )
+        cases_section, case_count = fill(
+            "## Relevant Social Sensitivity Cases\n" + _csv_line(CASE_CONTEXT_COLUMNS),
+            [
+                _csv_line([self.case_records[doc_id].get(column, "") for column in CASE_CONTEXT_COLUMNS])
+                for doc_id, _ in self.case_index.search(
+                    content, min_score=CONTEXT_MIN_SCORE, limit=MAX_CONTEXT_CASES
+                )
+            ],
+        )
+        relevant_text = "\n\n".join(
+            section.rstrip("\n")
+            for section in (tags_section, legal_section, cases_section)
+            if section
+        )
+        text = "\n\n".join(part for part in (self.static_text, relevant_text) if part)
+        return ReferenceContext(
+            text=text,
+            tokens=estimate_tokens(text),
+            selected={
+                "tags": (tag_count, len(self.tag_structure)),
+                "legal": (legal_count, len(self.legal_records)),
+                "cases": (case_count, len(self.case_records)),
+            },
+            static_text=self.static_text,
+            relevant_text=relevant_text,
+        )
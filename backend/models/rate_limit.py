@@ -0,0 +1,182 @@
+"""Gemini API 呼び出しのレート制御とリトライ."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REQUESTS_PER_MINUTE = 300.0
+DEFAULT_BURST = 20
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_RETRY_BASE_DELAY = 1.0
+DEFAULT_RETRY_MAX_DELAY = 60.0
+# 最初の送信からこの秒数を過ぎたら、リトライ回数が残っていても打ち切る
+DEFAULT_RETRY_DEADLINE = 180.0
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+# 再送するのは接続できなかった場合だけ (読み取りタイムアウトなどは Gemini 側で処理が
+# 進んでいる可能性があり、再送すると 1 呼び出しの待ち時間がタイムアウト × 回数まで膨らむ)
+RETRYABLE_TRANSPORT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+
+class TokenBucket:
+    """トークンバケット方式のレートリミッタ.
+
+    トークンを前借りして待ち時間を予約するため、待機中の呼び出しは到着順に発行される。
+    状態は threading.Lock で守り、イベントループに依存しない。
+    """
+
+    def __init__(self, rate_per_second: float, capacity: int) -> None:
+        self.rate = max(rate_per_second, 1e-6)
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            return max(wait, self._paused_until - now)
+
+    async def acquire(self) -> None:
+        """トークンを 1 つ取得する (不足していれば補充されるまで待つ)."""
+
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """429 を受けた場合などに、全呼び出し元の新規発行を一定時間止める."""
+
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After ヘッダー (秒数または HTTP 日付) を秒数に変換する."""
+
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class GeminiRequestScheduler:
+    """レート制限の共有と、一時的なエラーに対する指数バックオフ付きリトライを行う."""
+
+    def __init__(
+        self,
+        bucket: TokenBucket,
+        *,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        base_delay: float = DEFAULT_RETRY_BASE_DELAY,
+        max_delay: float = DEFAULT_RETRY_MAX_DELAY,
+        deadline: float = DEFAULT_RETRY_DEADLINE,
+    ) -> None:
+        self.bucket = bucket
+        self.max_retries = max(0, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    @classmethod
+    def from_env(cls) -> "GeminiRequestScheduler":
+        requests_per_minute = float(
+            os.getenv("GEMINI_REQUESTS_PER_MINUTE", DEFAULT_REQUESTS_PER_MINUTE)
+        )
+        bucket = TokenBucket(
+            requests_per_minute / 60.0,
+            int(os.getenv("GEMINI_RATE_LIMIT_BURST", DEFAULT_BURST)),
+        )
+        return cls(
+            bucket,
+            max_retries=int(os.getenv("GEMINI_MAX_RETRIES", DEFAULT_MAX_RETRIES)),
+            base_delay=float(os.getenv("GEMINI_RETRY_BASE_DELAY", DEFAULT_RETRY_BASE_DELAY)),
+            max_delay=float(os.getenv("GEMINI_RETRY_MAX_DELAY", DEFAULT_RETRY_MAX_DELAY)),
+            deadline=float(os.getenv("GEMINI_RETRY_DEADLINE", DEFAULT_RETRY_DEADLINE)),
+        )
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """attempt 回目 (0 始まり) の失敗後に待つ秒数 (full jitter)."""
+
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2**attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def _can_retry(self, attempt: int, delay: float, deadline: float) -> bool:
+        return attempt < self.max_retries and time.monotonic() + delay < deadline
+
+    async def send(self, request: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        """request を実行し、429/5xx や接続エラーならリトライする.
+
+        リトライし尽くした場合や deadline 秒を過ぎる場合は最後のレスポンスを返す
+        (通信エラーはそのまま送出する)。
+        """
+
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            await self.bucket.acquire()
+            try:
+                response = await request()
+            except RETRYABLE_TRANSPORT_ERRORS as exc:
+                delay = self.backoff_delay(attempt)
+                if not self._can_retry(attempt, delay, deadline):
+                    raise
+                logger.warning("Gemini request failed (%s); retrying in %.1fs", exc, delay)
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    return response
+                retry_after = parse_retry_after(response.headers.get("retry-after"))
+                delay = self.backoff_delay(attempt, retry_after)
+                if not self._can_retry(attempt, delay, deadline):
+                    return response
+                if response.status_code == 429:
+                    # クォータ超過はプロセス全体で共有しているため、他の呼び出しも一緒に待たせる
+                    self.bucket.pause(delay)
+                logger.warning(
+                    "Gemini returned %s; retrying in %.1fs (attempt %d/%d)",
+                    response.status_code,
+                    delay,
+                    attempt + 1,
+                    self.max_retries,
+                )
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+_default_scheduler: Optional[GeminiRequestScheduler] = None
+_default_scheduler_lock = threading.Lock()
+
+
+def get_default_scheduler() -> GeminiRequestScheduler:
+    """プロセス内の全 GeminiClient で共有するスケジューラを返す."""
+
+    global _default_scheduler  # pylint: disable=global-statement
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = GeminiRequestScheduler.from_env()
+        return _default_scheduler
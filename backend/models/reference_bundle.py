@@ -0,0 +1,169 @@
+"""参照 Excel (炎上事例・タグリスト・法務リスト) をコンパイルした成果物のキャッシュ.
+
+Excel の読み込みと照合用索引の構築は起動のたびに行うと重いため、結果を 1 ファイルに
+まとめて保存し、元ファイルの mtime・サイズ (変わっていれば内容のハッシュ) が同じ間は
+それを読み込むだけで済ませる。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import pickle
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from backend.models.gemini_cache import sha256_file
+from backend.models.keyword_automaton import TagKeywordIndex
+from backend.models.similarity_index import NgramIndex
+
+logger = logging.getLogger(__name__)
+
+# 中身の構造を変えたら上げる (古い成果物は作り直される)
+BUNDLE_FORMAT_VERSION = 2
+BUNDLE_FILENAME_TEMPLATE = "reference_bundle-{key}.pkl"
+DEFAULT_BUNDLE_DIR = Path(__file__).resolve().parents[1] / "cache" / "reference"
+
+ScreeningIndexes = Tuple[NgramIndex, List[Dict[str, object]], NgramIndex, List[Dict[str, object]]]
+
+
+@dataclass
+class ReferenceBundle:
+    """RiskAssessor が参照するデータと、そこから作った照合用索引一式."""
+
+    social_case_digest: str
+    social_tag_digest: str
+    legal_digest: str
+    tag_structure: List[Dict[str, object]]
+    tag_risk_map: Dict[str, int]
+    case_reference_rows: List[Dict[str, object]]
+    tag_definition_entries: List[Dict[str, object]]
+    tag_keyword_index: TagKeywordIndex
+    screening_indexes: ScreeningIndexes
+    # プロンプトに載せる事例・法令の行を選ぶための索引 (prompt_context.build_context_indexes)
+    legal_reference_rows: List[Dict[str, object]] = field(default_factory=list)
+    context_indexes: Optional[ScreeningIndexes] = None
+    sources: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+
+def source_signature(path: Path, *, with_hash: bool = True) -> Dict[str, Any]:
+    """参照ファイルの同一性を判定するための情報 (存在しなければ exists=False)."""
+
+    try:
+        stat = path.stat()
+    except OSError:
+        return {"path": str(path), "exists": False}
+    signature: Dict[str, Any] = {
+        "path": str(path),
+        "exists": True,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+    if with_hash:
+        signature["sha256"] = sha256_file(path)
+    return signature
+
+
+def bundle_enabled() -> bool:
+    return os.getenv("REFERENCE_BUNDLE", "true").lower() not in {"0", "false", "no"}
+
+
+def _bundle_dir() -> Path:
+    return Path(os.getenv("REFERENCE_BUNDLE_DIR") or DEFAULT_BUNDLE_DIR)
+
+
+def _read_bundle(path: Path) -> Optional[ReferenceBundle]:
+    try:
+        with path.open("rb") as file_obj:
+            # アプリ自身が書き出したローカルのキャッシュファイルだけを読む
+            payload = pickle.load(file_obj)
+    except (OSError, pickle.PickleError, EOFError, AttributeError, ImportError, TypeError):
+        return None
+    if not isinstance(payload, dict) or payload.get("version") != BUNDLE_FORMAT_VERSION:
+        return None
+    bundle = payload.get("bundle")
+    return bundle if isinstance(bundle, ReferenceBundle) else None
+
+
+def _write_bundle(path: Path, bundle: ReferenceBundle) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    with temp_path.open("wb") as file_obj:
+        pickle.dump(
+            {"version": BUNDLE_FORMAT_VERSION, "bundle": bundle},
+            file_obj,
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+    os.replace(temp_path, path)
+
+
+def _sources_unchanged(
+    stored: Dict[str, Dict[str, Any]], sources: Dict[str, Path]
+) -> Optional[bool]:
+    """True: mtime・サイズが一致、None: 内容ハッシュは一致 (mtime だけ変化)、False: 変更あり."""
+
+    if set(stored) != set(sources):
+        return False
+    touched = False
+    for name, path in sources.items():
+        previous = stored[name]
+        current = source_signature(path, with_hash=False)
+        if previous.get("path") != current["path"] or previous.get("exists") != current["exists"]:
+            return False
+        if not current["exists"]:
+            continue
+        if previous.get("size") != current["size"]:
+            return False
+        if previous.get("mtime_ns") != current["mtime_ns"]:
+            # コピーやチェックアウトで mtime だけ変わった場合は内容で判定する
+            if previous.get("sha256") != sha256_file(path):
+                return False
+            touched = True
+    return None if touched else True
+
+
+def load_reference_bundle(
+    sources: Dict[str, Path],
+    build: Callable[[], ReferenceBundle],
+    *,
+    cache_dir: Optional[Path] = None,
+) -> ReferenceBundle:
+    """保存済みの成果物が sources と一致すればそれを返し、そうでなければ build で作り直して保存する."""
+
+    if not bundle_enabled():
+        # 保存はしないが、変更の検知と版の識別に使うため参照ファイルの署名は付けておく
+        bundle = build()
+        bundle.sources = {name: source_signature(source) for name, source in sources.items()}
+        return bundle
+
+    # 参照ファイルの組み合わせごとに別の成果物にする
+    key = hashlib.sha256(
+        "\n".join(f"{name}={source}" for name, source in sorted(sources.items())).encode("utf-8")
+    ).hexdigest()[:16]
+    path = Path(cache_dir or _bundle_dir()) / BUNDLE_FILENAME_TEMPLATE.format(key=key)
+    cached = _read_bundle(path)
+    if cached is not None:
+        state = _sources_unchanged(cached.sources, sources)
+        if state is True:
+            return cached
+        if state is None:
+            cached.sources = {name: source_signature(source) for name, source in sources.items()}
+            _save_quietly(path, cached)
+            return cached
+
+    bundle = build()
+    bundle.sources = {name: source_signature(source) for name, source in sources.items()}
+    _save_quietly(path, bundle)
+    logger.info("Compiled reference bundle from %d source files -> %s", len(sources), path)
+    return bundle
+
+
+def _save_quietly(path: Path, bundle: ReferenceBundle) -> None:
+    try:
+        _write_bundle(path, bundle)
+    except OSError as exc:
+        # 読み取り専用の環境などでは保存できなくても動作は続ける
+        logger.warning("Could not save reference bundle to %s: %s", path, exc)
@@ -0,0 +1,151 @@
+"""参照データのバージョン管理と、再起動なしでの差し替え (ホットリロード)."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from backend.models.reference_bundle import ReferenceBundle, source_signature
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WATCH_INTERVAL_SECONDS = 30.0
+
+
+@dataclass(frozen=True)
+class ReferenceVersion:
+    """ある時点の参照データ. version は参照ファイルの内容から決まる識別子."""
+
+    version: str
+    bundle: ReferenceBundle
+    loaded_at: str
+
+
+def bundle_version(bundle: ReferenceBundle) -> str:
+    """参照ファイルの内容ハッシュからバージョン識別子 (12 桁) を作る."""
+
+    material = {
+        name: signature.get("sha256") if signature.get("exists") else None
+        for name, signature in sorted(bundle.sources.items())
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+def watch_enabled() -> bool:
+    return os.getenv("REFERENCE_WATCH", "true").lower() not in {"0", "false", "no"}
+
+
+class ReferenceRegistry:
+    """参照ファイルを監視し、変更があれば裏で作り直して新しいバージョンに切り替える.
+
+    切り替えは current の参照を差し替えるだけなので、取得済みのバージョンを使っている
+    処理には影響しない。
+    """
+
+    def __init__(
+        self,
+        sources: Dict[str, Path],
+        load: Callable[[], ReferenceBundle],
+        *,
+        watch_interval: Optional[float] = None,
+    ) -> None:
+        self.sources = dict(sources)
+        self._load = load
+        if watch_interval is None:
+            watch_interval = float(
+                os.getenv("REFERENCE_WATCH_INTERVAL", DEFAULT_WATCH_INTERVAL_SECONDS)
+            )
+        self.watch_interval = watch_interval
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[ReferenceVersion], None]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._current = self._make_version(load())
+
+    @staticmethod
+    def _make_version(bundle: ReferenceBundle) -> ReferenceVersion:
+        return ReferenceVersion(
+            version=bundle_version(bundle),
+            bundle=bundle,
+            loaded_at=datetime.now(UTC).isoformat(),
+        )
+
+    @property
+    def current(self) -> ReferenceVersion:
+        return self._current
+
+    def add_listener(self, listener: Callable[[ReferenceVersion], None]) -> None:
+        """新しいバージョンに切り替わったときに呼ぶ関数を登録する."""
+
+        self._listeners.append(listener)
+
+    def _sources_changed(self) -> bool:
+        stored = self._current.bundle.sources
+        for name, path in self.sources.items():
+            previous = stored.get(name) or {}
+            current = source_signature(path, with_hash=False)
+            if previous.get("exists") != current["exists"]:
+                return True
+            if current["exists"] and (
+                previous.get("size") != current["size"]
+                or previous.get("mtime_ns") != current["mtime_ns"]
+            ):
+                return True
+        return False
+
+    def reload(self, *, force: bool = False) -> bool:
+        """参照ファイルが変わっていれば作り直し、バージョンが変わったら True を返す."""
+
+        with self._lock:
+            if not force and not self._sources_changed():
+                return False
+            bundle = self._load()
+            candidate = self._make_version(bundle)
+            if candidate.version == self._current.version:
+                # mtime だけ変わった場合などは同じ内容なので、署名だけ更新して使い続ける
+                self._current = ReferenceVersion(
+                    version=self._current.version, bundle=bundle, loaded_at=self._current.loaded_at
+                )
+                return False
+            previous, self._current = self._current, candidate
+        logger.info(
+            "Reference data reloaded: %s -> %s", previous.version, candidate.version
+        )
+        for listener in list(self._listeners):
+            try:
+                listener(candidate)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Reference reload listener failed")
+        return True
+
+    def start(self) -> None:
+        """バックグラウンドのスレッドで参照ファイルの監視を始める."""
+
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._watch, name="reference-registry", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=5)
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.watch_interval):
+            try:
+                self.reload()
+            except Exception:  # pylint: disable=broad-except
+                # 編集途中の Excel を読んで失敗した場合などは、今のバージョンのまま次の周期で再試行する
+                logger.exception("Failed to reload reference data")
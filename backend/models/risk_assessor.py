@@ -2,24 +2,45 @@
 
 from __future__ import annotations
 
+import asyncio
+import copy
 import json
 import logging
 import statistics
 from collections import Counter, defaultdict
-from difflib import SequenceMatcher
 from pathlib import Path
 from textwrap import dedent
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import pandas as pd
 
 from backend.models.gemini_client import GeminiClient
+from backend.models.gemini_context_cache import PromptPrefix
+from backend.models.keyword_automaton import TagKeywordHit, TagKeywordIndex
+from backend.models.prompt_context import (
+    ReferenceContextBuilder,
+    build_context_indexes,
+    context_filter_enabled,
+    estimate_tokens,
+)
+from backend.models.reference_bundle import ReferenceBundle, load_reference_bundle
+from backend.models.reference_registry import ReferenceRegistry, ReferenceVersion
+from backend.models.similarity_index import NgramIndex, normalize_text
+from backend.utils.audio_chunks import format_timecode, parse_timed_lines
 from backend.utils.logging_utils import setup_logger
 
 logger = logging.getLogger(__name__)
 screen_logger = setup_logger("risk_screening")
 
 GRADE_SCORE_MAP = {"A": 1, "B": 2, "C": 3, "D": 4, "E": 5}
+# 炎上事例・タグ定義の照合で補強用タグとして採用する照合スコアの下限
+CASE_MATCH_MIN_SCORE = 0.55
+TAG_DEFINITION_MIN_SCORE = 0.55
+# n-gram 索引の類似度は参照文のうちコンテンツに現れる割合なので、短い参照文ほど偶然に満たされやすい。
+# この文字数未満の参照文 (「発言」「広告」などの区分名) は照合せず、
+# SCREENING_FULL_WEIGHT_CHARS 文字に満たない参照文は長さに比例して割り引く
+SCREENING_MIN_REFERENCE_CHARS = 6
+SCREENING_FULL_WEIGHT_CHARS = 16
 
 
 def _grade_to_score(grade: Optional[str]) -> int:
@@ -57,15 +78,131 @@ class RiskAssessor:
         self.gemini_client = gemini_client
         self.social_case_path = social_case_path
         self.tag_list_path = tag_list_path
-        self.social_case_digest = self._load_excel_digest(social_case_path, "炎上事例")
-        self.social_tag_digest = self._load_excel_digest(social_tag_path, "タグリスト")
-        self.legal_digest = self._load_excel_digest(legal_reference_path, "法務リスト")
-        self.tag_structure = self._load_tag_structure(tag_list_path)
+        # Excel の読み込みと索引の構築結果はコンパイル済みの成果物として保存し、
+        # 参照ファイルが変わっていなければそれを読み込むだけで済ませる
+        sources = {
+            "social_case": social_case_path,
+            "social_tag": social_tag_path,
+            "legal_reference": legal_reference_path,
+            "tag_list": tag_list_path,
+        }
+        # 参照ファイルの更新は登録簿が検知して裏で作り直す (実行中の分析は開始時の版を使い続ける)
+        self.reference_registry = ReferenceRegistry(
+            sources,
+            lambda: load_reference_bundle(
+                sources,
+                lambda: self._compile_reference_bundle(
+                    social_case_path=social_case_path,
+                    social_tag_path=social_tag_path,
+                    legal_reference_path=legal_reference_path,
+                    tag_list_path=tag_list_path,
+                ),
+            ),
+        )
+        self._apply_reference_version(self.reference_registry.current)
+        # 新しい版への切り替えは監視スレッドで 1 度だけ反映し、分析ごとには作り直さない
+        self.reference_registry.add_listener(self._apply_reference_version)
+
+    def for_current_reference(self) -> "RiskAssessor":
+        """最新の参照データを反映した評価器を返す.
+
+        分析の開始時に 1 度呼び、その分析の間は返された評価器を使い続ける。
+        返すのはその時点の状態の浅い複製なので、後で版が切り替わっても影響を受けない。
+        """
+
+        registry: Optional[ReferenceRegistry] = getattr(self, "reference_registry", None)
+        if registry is None:
+            return self
+        pinned = copy.copy(self)
+        current = registry.current
+        if current.version != pinned.reference_version:
+            # 切り替えの通知より先に分析が始まった場合は、複製の側にだけ反映する
+            pinned._apply_reference_version(current)  # pylint: disable=protected-access
+        return pinned
+
+    def _compile_reference_bundle(
+        self,
+        *,
+        social_case_path: Path,
+        social_tag_path: Path,
+        legal_reference_path: Path,
+        tag_list_path: Path,
+    ) -> ReferenceBundle:
+        """参照 Excel を読み込み、評価と照合に使うデータと索引をまとめて作る."""
+
+        # 同じブックは 1 度だけ読む (炎上事例・タグリストはダイジェストと本体の両方で使う)
+        frames: Dict[Path, Optional[pd.DataFrame]] = {}
+
+        def read(path: Path) -> Optional[pd.DataFrame]:
+            if path not in frames:
+                frames[path] = pd.read_excel(path) if path.exists() else None
+            return frames[path]
+
+        tag_structure = self._load_tag_structure(tag_list_path, frame=read(tag_list_path))
+        case_reference_rows = self._load_case_reference_rows(
+            social_case_path, frame=read(social_case_path)
+        )
+        tag_definition_entries = self._build_tag_definition_entries(tag_structure)
+        legal_reference_rows = self._load_legal_reference_rows(
+            legal_reference_path, frame=read(legal_reference_path)
+        )
+        return ReferenceBundle(
+            social_case_digest=self._load_excel_digest(
+                social_case_path, "炎上事例", frame=read(social_case_path)
+            ),
+            social_tag_digest=self._load_excel_digest(
+                social_tag_path, "タグリスト", frame=read(social_tag_path)
+            ),
+            legal_digest=self._load_excel_digest(
+                legal_reference_path, "法務リスト", frame=read(legal_reference_path)
+            ),
+            tag_structure=tag_structure,
+            tag_risk_map=self._build_tag_risk_map(tag_structure),
+            case_reference_rows=case_reference_rows,
+            tag_definition_entries=tag_definition_entries,
+            # タグ・サブタグ定義のキーワードは 1 度だけオートマトンへまとめる
+            tag_keyword_index=TagKeywordIndex(tag_structure),
+            screening_indexes=self._build_screening_indexes(
+                case_reference_rows, tag_definition_entries
+            ),
+            legal_reference_rows=legal_reference_rows,
+            context_indexes=build_context_indexes(case_reference_rows, legal_reference_rows),
+        )
+
+    def _apply_reference_version(self, version: ReferenceVersion) -> None:
+        # 組み立て終えた状態をまとめて差し替え、複製が途中の状態を拾わないようにする
+        staged = copy.copy(self)
+        staged._apply_reference_bundle(version.bundle)  # pylint: disable=protected-access
+        staged.reference_version = version.version
+        self.__dict__.update(staged.__dict__)
+
+    def _apply_reference_bundle(self, bundle: ReferenceBundle) -> None:
+        self.social_case_digest = bundle.social_case_digest
+        self.social_tag_digest = bundle.social_tag_digest
+        self.legal_digest = bundle.legal_digest
+        self.tag_structure = bundle.tag_structure
         self.tag_structure_json = json.dumps(self.tag_structure, ensure_ascii=False)
         self.tag_structure_summary = self._build_tag_summary(self.tag_structure)
-        self.tag_risk_map = self._build_tag_risk_map(self.tag_structure)
-        self.case_reference_rows = self._load_case_reference_rows(social_case_path)
-        self.tag_definition_entries = self._build_tag_definition_entries(self.tag_structure)
+        self.tag_risk_map = bundle.tag_risk_map
+        self.case_reference_rows = bundle.case_reference_rows
+        self.tag_definition_entries = bundle.tag_definition_entries
+        self.tag_keyword_index = bundle.tag_keyword_index
+        self._screening_cache = (
+            bundle.case_reference_rows,
+            bundle.tag_definition_entries,
+            bundle.screening_indexes,
+        )
+        _, _, tag_index, tag_records = bundle.screening_indexes
+        self.reference_context_builder = ReferenceContextBuilder(
+            tag_structure=self.tag_structure,
+            tag_summary=self.tag_structure_summary,
+            tag_keyword_index=self.tag_keyword_index,
+            tag_index=tag_index,
+            tag_records=tag_records,
+            context_indexes=bundle.context_indexes
+            or build_context_indexes(bundle.case_reference_rows, bundle.legal_reference_rows),
+            legal_rows=bundle.legal_reference_rows,
+        )
 
     async def assess(
         self,
@@ -177,26 +314,40 @@ class RiskAssessor:
 
             ## Video Segments
             {video_segments_text}
-
-            ## Tag Taxonomy (JSON)
-            {self.tag_structure_json}
-
-            ## Tag Taxonomy Summary
-            {self.tag_structure_summary}
-
-            ## Social Sensitivity Cases Digest
-            {self.social_case_digest}
-
-            ## Social Tag List Digest
-            {self.social_tag_digest}
-
-            ## Legal Reference Digest
-            {self.legal_digest}
             """
         )
+        full_reference_block = self._full_reference_block()
+        # static_reference はどの案件でも同じ部分、relevant_reference は案件ごとに選ぶ部分
+        static_reference, relevant_reference = full_reference_block, ""
+        builder: Optional[ReferenceContextBuilder] = getattr(self, "reference_context_builder", None)
+        if builder is not None and context_filter_enabled():
+            # 参照データはコンテンツに関係するタグ・事例・法令だけに絞ってトークン数を抑える
+            context = builder.build(content_blocks)
+            static_reference, relevant_reference = context.static_text, context.relevant_text
+            logger.info(
+                "Risk prompt size: full=%d tokens compact=%d tokens (tags=%d/%d legal=%d/%d cases=%d/%d)",
+                estimate_tokens(instruction + content_blocks + full_reference_block),
+                estimate_tokens(instruction + content_blocks + context.text),
+                *context.selected["tags"],
+                *context.selected["legal"],
+                *context.selected["cases"],
+            )
+
+        # 指示文と共通部分の参照データは参照データの版ごとにキャッシュして参照し、
+        # 案件ごとに選んだ参照データは本文と一緒に送る (キャッシュを使えない場合も載せる内容は同じ)
+        prefix = PromptPrefix(
+            instruction=instruction,
+            text=static_reference,
+            label=f"risk-reference-{getattr(self, 'reference_version', None) or 'default'}",
+        )
+        def join(*parts: str) -> str:
+            return "\n\n".join(part for part in parts if part) + "\n"
 
         response = await self.gemini_client.generate_structured_judgement(
-            instruction, content_blocks
+            instruction,
+            join(content_blocks.rstrip(), static_reference, relevant_reference),
+            prefix=prefix,
+            prefix_content=join(content_blocks.rstrip(), relevant_reference),
         )
 
         def _normalize_findings(payload: object) -> List[dict]:
@@ -280,6 +431,28 @@ class RiskAssessor:
             )
         return response
 
+    def _full_reference_block(self) -> str:
+        """絞り込みを行わない場合に載せる参照データ一式."""
+
+        return dedent(
+            f"""
+            ## Tag Taxonomy (JSON)
+            {self.tag_structure_json}
+
+            ## Tag Taxonomy Summary
+            {self.tag_structure_summary}
+
+            ## Social Sensitivity Cases Digest
+            {self.social_case_digest}
+
+            ## Social Tag List Digest
+            {self.social_tag_digest}
+
+            ## Legal Reference Digest
+            {self.legal_digest}
+            """
+        ).strip()
+
     async def assess_with_enrichment(
         self,
         *,
@@ -291,17 +464,23 @@ class RiskAssessor:
         """複数回の Gemini 実行とタグリスト照合による統合結果を返す."""
 
         passes = max(1, passes)
-        base_results: List[Dict[str, object]] = []
-        for attempt in range(passes):
-            try:
-                result = await self.assess(
+        outcomes = await asyncio.gather(
+            *(
+                self.assess(
                     transcript=transcript,
                     ocr_text=ocr_text,
                     video_summary=video_summary
                 )
-                base_results.append(result)
-            except Exception as exc:  # pragma: no cover
-                logger.warning("Gemini assess pass %d failed: %s", attempt + 1, exc)
+                for _ in range(passes)
+            ),
+            return_exceptions=True,
+        )
+        base_results: List[Dict[str, object]] = []
+        for attempt, outcome in enumerate(outcomes):
+            if isinstance(outcome, BaseException):  # pragma: no cover
+                logger.warning("Gemini assess pass %d failed: %s", attempt + 1, outcome)
+                continue
+            base_results.append(outcome)
         if not base_results:
             return await self.assess(
                 transcript=transcript,
@@ -309,72 +488,96 @@ class RiskAssessor:
                 video_summary=video_summary
             )
 
+        keyword_matches = self.build_keyword_matches(transcript, ocr_text)
+        return self.enrich(base_results, keyword_matches)
+
+    def build_keyword_matches(self, transcript: str, ocr_text: str) -> List[Dict[str, object]]:
+        """キーワード走査と炎上事例照合による補強用タグを返す.
+
+        Gemini の判定結果に依存しないため、同じコンテンツに対する複数回の評価で使い回せる。
+        """
+
         keyword_matches = self._scan_tag_matches(transcript, ocr_text)
         keyword_matches.extend(self._screen_with_cases(transcript, ocr_text))
-        aggregated = self._aggregate_risk_results(base_results, keyword_matches)
-        return aggregated
+        return keyword_matches
 
-    def _scan_tag_matches(self, transcript: str, ocr_text: str) -> List[Dict[str, object]]:
-        combined = f"{transcript}\n{ocr_text}".lower()
-        matches: List[Dict[str, object]] = []
+    def enrich(
+        self,
+        base_results: List[Dict[str, object]],
+        keyword_matches: List[Dict[str, object]],
+    ) -> Dict[str, object]:
+        """複数回の Gemini 判定結果と補強用タグを 1 件の評価に統合する."""
 
-        def extract_keywords(definition: Optional[str]) -> List[str]:
-            if not definition:
-                return []
-            tokens = [
-                token.strip()
-                for token in definition.replace("/", " ").replace("|", " ").replace(",", " ").split()
-                if token.strip()
-            ]
-            return tokens
-
-        def find_keyword(keywords: List[str]) -> Optional[str]:
-            for kw in keywords:
-                if kw and kw.lower() in combined:
-                    return kw
-            return None
+        return self._aggregate_risk_results(base_results, keyword_matches)
 
-        for tag in self.tag_structure:
+    def _scan_tag_matches(self, transcript: str, ocr_text: str) -> List[Dict[str, object]]:
+        combined = f"{transcript}\n{ocr_text}"
+        matches: List[Dict[str, object]] = []
+        # 本文は 1 回だけ走査し、タグ・サブタグごとに採用するキーワードと出現位置を得る
+        hits = self.tag_keyword_index.scan(combined)
+
+        def locate(hit: TagKeywordHit) -> Dict[str, object]:
+            if hit.start < len(transcript):
+                return {"source": "transcript", "start": hit.start, "end": hit.end}
+            offset = len(transcript) + 1
+            return {"source": "ocr", "start": hit.start - offset, "end": hit.end - offset}
+
+        def timecode_of(hit: TagKeywordHit) -> str:
+            # 文字起こしの行頭に [mm:ss] があれば、その行の時刻を検出位置とする
+            if hit.start >= len(transcript):
+                return "N/A"
+            line_start = transcript.rfind("\n", 0, hit.start) + 1
+            line_end = transcript.find("\n", hit.start)
+            line = transcript[line_start:line_end if line_end != -1 else len(transcript)]
+            timed = parse_timed_lines(line)
+            if timed and timed[0].seconds is not None:
+                return format_timecode(timed[0].seconds)
+            return "N/A"
+
+        for tag_position, tag in enumerate(self.tag_structure):
             tag_name = str(tag.get("name", ""))
             definition = tag.get("definition") or ""
-            keywords = extract_keywords(definition)
-            keyword_hit = find_keyword(keywords)
+            tag_hit = hits.get((tag_position, None))
+            keyword_hit = tag_hit.keyword if tag_hit else None
             sub_tags = tag.get("sub_tags") or []
             related_matches: List[Dict[str, object]] = []
 
-            for sub in sub_tags:
+            for sub_position, sub in enumerate(sub_tags):
                 sub_name = str(sub.get("name", ""))
-                sub_keywords = extract_keywords(sub.get("definition"))
-                sub_hit = find_keyword(sub_keywords)
+                sub_hit = hits.get((tag_position, sub_position))
                 if sub_name and sub_hit:
                     grade = self._risk_grade(float(sub.get("risk") or tag.get("risk") or 3))
                     related_matches.append(
                         {
                             "name": sub_name,
                             "grade": grade,
-                            "reason": f"キーワード『{sub_hit}』が検出されました。",
-                            "detected_text": sub_hit,
-                            "detected_timecode": "N/A"
+                            "reason": f"キーワード『{sub_hit.keyword}』が検出されました。",
+                            "detected_text": sub_hit.keyword,
+                            "detected_timecode": timecode_of(sub_hit),
+                            "detected_position": locate(sub_hit),
                         }
                     )
 
             if tag_name and (keyword_hit or related_matches):
                 base_risk = float(tag.get("risk") or 3)
                 grade = self._risk_grade(base_risk)
-                matches.append(
-                    {
-                        "name": tag_name,
-                        "grade": grade,
-                        "reason": (
-                            f"キーワード『{keyword_hit or '（サブタグ検出）'}』が検出されたため。"
-                            if keyword_hit or related_matches
-                            else definition
-                        ),
-                        "detected_text": keyword_hit or (related_matches[0]["detected_text"] if related_matches else ""),
-                        "detected_timecode": "N/A",
-                        "related_sub_tags": related_matches
-                    }
-                )
+                match: Dict[str, object] = {
+                    "name": tag_name,
+                    "grade": grade,
+                    "reason": (
+                        f"キーワード『{keyword_hit or '（サブタグ検出）'}』が検出されたため。"
+                        if keyword_hit or related_matches
+                        else definition
+                    ),
+                    "detected_text": keyword_hit or (related_matches[0]["detected_text"] if related_matches else ""),
+                    "detected_timecode": (
+                        timecode_of(tag_hit) if tag_hit else related_matches[0]["detected_timecode"]
+                    ),
+                    "related_sub_tags": related_matches
+                }
+                if tag_hit:
+                    match["detected_position"] = locate(tag_hit)
+                matches.append(match)
         logger.info("Keyword scan produced %d matches", len(matches))
         return matches
 
@@ -390,38 +593,40 @@ class RiskAssessor:
         if not combined:
             return []
 
-        combined_lower = combined.lower()
-        matches: List[Dict[str, object]] = []
+        case_index, case_records, tag_index, tag_records = self._screening_indexes(cases, tag_entries)
+        scored: List[Tuple[float, Dict[str, object]]] = []
         case_hits = 0
         tag_hits = 0
 
-        def similarity(target: str) -> float:
-            if not target:
-                return 0.0
-            return SequenceMatcher(None, combined_lower, target.lower()).ratio()
-
         def ratio_to_grade(value: float) -> str:
-            if value > 0.75:
+            # 照合スコア (参照文の長さで割り引いた被覆率) の区切り
+            if value > 0.85:
                 return "E"
-            if value > 0.6:
+            if value > 0.7:
                 return "D"
-            if value > 0.45:
+            if value > CASE_MATCH_MIN_SCORE:
                 return "C"
-            if value > 0.3:
+            if value > 0.4:
                 return "B"
             return "A"
 
+        def weighted(reference: str, coverage: float) -> float:
+            length = len(normalize_text(reference))
+            if length < SCREENING_MIN_REFERENCE_CHARS:
+                return 0.0
+            return coverage * min(1.0, length / SCREENING_FULL_WEIGHT_CHARS)
+
         def snippet(value: str, limit: int = 48) -> str:
             text = value.strip()
             if len(text) <= limit:
                 return text
             return f"{text[:limit]}..."
 
-        for record in cases:
+        # 事前に作った n-gram 索引で C 以上になり得る事例だけを類似度順に取り出す
+        for doc_id, coverage in case_index.search(combined, min_score=CASE_MATCH_MIN_SCORE):
+            record = case_records[doc_id]
             trigger = str(record.get("発火要因") or "").strip()
-            if not trigger:
-                continue
-            ratio = similarity(trigger)
+            ratio = weighted(trigger, coverage)
             grade = ratio_to_grade(ratio)
             if grade not in {"C", "D", "E"}:
                 continue
@@ -434,6 +639,7 @@ class RiskAssessor:
                 "reason": reason,
                 "detected_text": trigger,
                 "detected_timecode": "N/A",
+                "score": round(ratio, 4),
                 "related_sub_tags": [],
             }
             if sub_tag:
@@ -446,17 +652,16 @@ class RiskAssessor:
                         "detected_timecode": "N/A",
                     }
                 )
-            matches.append(payload)
+            scored.append((ratio, payload))
             case_hits += 1
 
-        for entry in tag_entries:
+        for doc_id, coverage in tag_index.search(combined, min_score=TAG_DEFINITION_MIN_SCORE):
+            entry = tag_records[doc_id]
             definition = str(entry.get("definition") or "").strip()
-            tag_name = str(entry.get("name") or "").strip()
-            if not definition or not tag_name:
-                continue
-            ratio = similarity(definition)
-            if ratio <= 0.55:
+            ratio = weighted(definition, coverage)
+            if ratio <= TAG_DEFINITION_MIN_SCORE:
                 continue
+            tag_name = str(entry.get("name") or "").strip()
             grade = ratio_to_grade(ratio)
             if grade not in {"C", "D", "E"}:
                 grade = "C"
@@ -475,6 +680,7 @@ class RiskAssessor:
                 "reason": base_reason,
                 "detected_text": definition,
                 "detected_timecode": "N/A",
+                "score": round(ratio, 4),
                 "related_sub_tags": [],
             }
             if is_subtag:
@@ -487,9 +693,12 @@ class RiskAssessor:
                         "detected_timecode": "N/A",
                     }
                 )
-            matches.append(payload)
+            scored.append((ratio, payload))
             tag_hits += 1
 
+        # 事例・タグ定義をまとめて類似度の高い順に並べる
+        scored.sort(key=lambda item: -item[0])
+        matches = [payload for _, payload in scored]
         if matches:
             screen_logger.info(
                 "Case screening produced %d matches (cases=%d, tag_definitions=%d)",
@@ -505,6 +714,38 @@ class RiskAssessor:
             )
         return matches
 
+    def _screening_indexes(
+        self, cases: List[Dict[str, object]], tag_entries: List[Dict[str, object]]
+    ) -> Tuple[NgramIndex, List[Dict[str, object]], NgramIndex, List[Dict[str, object]]]:
+        """炎上事例の発火要因とタグ定義の n-gram 索引を返す (参照データが変わった時だけ作り直す)."""
+
+        cached = getattr(self, "_screening_cache", None)
+        if cached is not None and cached[0] is cases and cached[1] is tag_entries:
+            return cached[2]
+
+        indexes = self._build_screening_indexes(cases, tag_entries)
+        self._screening_cache = (cases, tag_entries, indexes)
+        return indexes
+
+    @staticmethod
+    def _build_screening_indexes(
+        cases: List[Dict[str, object]], tag_entries: List[Dict[str, object]]
+    ) -> Tuple[NgramIndex, List[Dict[str, object]], NgramIndex, List[Dict[str, object]]]:
+        case_records = [
+            record for record in cases if str(record.get("発火要因") or "").strip()
+        ]
+        tag_records = [
+            entry
+            for entry in tag_entries
+            if str(entry.get("definition") or "").strip() and str(entry.get("name") or "").strip()
+        ]
+        return (
+            NgramIndex([str(record.get("発火要因")).strip() for record in case_records]),
+            case_records,
+            NgramIndex([str(entry.get("definition")).strip() for entry in tag_records]),
+            tag_records,
+        )
+
     def _aggregate_risk_results(
         self,
         base_results: List[Dict[str, object]],
@@ -639,13 +880,15 @@ class RiskAssessor:
             return {}
         return self._aggregate_risk_results(runs, [])
 
-    def _load_excel_digest(self, path: Path, label: str) -> str:
-        """Excel の内容を簡潔なテキストに変換する."""
+    def _load_excel_digest(
+        self, path: Path, label: str, *, frame: Optional[pd.DataFrame] = None
+    ) -> str:
+        """Excel の内容を簡潔なテキストに変換する (読み込み済みなら frame を使う)."""
 
         if not path.exists():
             return f"{label}: 参照ファイルが見つかりません ({path})."
 
-        df = pd.read_excel(path)
+        df = frame if frame is not None else pd.read_excel(path)
         preview_rows = df.head(20)
         return f"{label}:\n{preview_rows.to_csv(index=False)}"
 
@@ -664,23 +907,26 @@ class RiskAssessor:
             return risk
         return None
 
-    def _load_tag_structure(self, path: Path) -> List[Dict[str, object]]:
-        """タグリストを階層構造で読み込む."""
+    def _load_tag_structure(
+        self, path: Path, *, frame: Optional[pd.DataFrame] = None
+    ) -> List[Dict[str, object]]:
+        """タグリストを階層構造で読み込む (読み込み済みなら frame の先頭 3 列を使う)."""
 
         if not path.exists():
             return []
 
-        df = pd.read_excel(path, header=0, usecols=[0, 1, 2])
+        if frame is not None:
+            df = frame.iloc[:, :3].copy()
+        else:
+            df = pd.read_excel(path, header=0, usecols=[0, 1, 2])
         df.columns = ["tag", "definition", "risk"]
 
         structure: List[Dict[str, object]] = []
         current_tag: Optional[Dict[str, object]] = None
         parsing_subtags = False
 
-        for _, row in df.iterrows():
-            tag = row["tag"]
-            definition = row.get("definition")
-            risk_value = self._parse_risk_value(row.get("risk"))
+        for tag, definition, risk in df.itertuples(index=False, name=None):
+            risk_value = self._parse_risk_value(risk)
 
             if pd.isna(tag):
                 parsing_subtags = False
@@ -915,14 +1161,26 @@ class RiskAssessor:
         )
         return burn_profile
 
-    def _load_case_reference_rows(self, path: Path) -> List[Dict[str, object]]:
+    def _load_legal_reference_rows(
+        self, path: Path, *, frame: Optional[pd.DataFrame] = None
+    ) -> List[Dict[str, object]]:
+        """法務リストを読み込み、辞書リストで返す."""
+
+        if not path.exists():
+            return []
+        df = frame if frame is not None else pd.read_excel(path)
+        return df.fillna("").to_dict(orient="records")
+
+    def _load_case_reference_rows(
+        self, path: Path, *, frame: Optional[pd.DataFrame] = None
+    ) -> List[Dict[str, object]]:
         """炎上事例一覧を読み込み、辞書リストで返す."""
 
         if not path.exists():
             screen_logger.warning("Case reference file not found: %s", path)
             return []
         try:
-            df = pd.read_excel(path)
+            df = frame if frame is not None else pd.read_excel(path)
         except Exception as exc:  # pragma: no cover - depends on external file
             screen_logger.warning(
                 "Failed to read case reference file %s: %s", path, exc
@@ -0,0 +1,83 @@
+"""リスク判定を繰り返すときの結果の一致度と、一致した時点で打ち切る逐次合議の設定."""
+
+from __future__ import annotations
+
+import os
+from collections import Counter
+from dataclasses import dataclass
+from itertools import combinations
+from typing import FrozenSet, Mapping, Optional, Sequence, Tuple
+
+DEFAULT_THRESHOLD = 0.8
+# 最初にまとめて発行する判定の回数 (パイプラインでは 1 回目のイテレーションの先発分)
+DEFAULT_INITIAL_PASSES = 2
+
+
+def risk_signature(result: Mapping[str, object]) -> Tuple[Optional[str], Optional[str], FrozenSet[str]]:
+    """判定結果を (社会的グレード, 法務グレード, タグ名の集合) にまとめる."""
+
+    social = result.get("social")
+    legal = result.get("legal")
+    tags = result.get("tags")
+    return (
+        social.get("grade") if isinstance(social, dict) else None,
+        legal.get("grade") if isinstance(legal, dict) else None,
+        frozenset(
+            str(tag.get("name"))
+            for tag in (tags if isinstance(tags, list) else [])
+            if isinstance(tag, dict) and tag.get("name")
+        ),
+    )
+
+
+def _majority_share(values: Sequence[object]) -> float:
+    return Counter(values).most_common(1)[0][1] / len(values)
+
+
+def _jaccard(left: FrozenSet[str], right: FrozenSet[str]) -> float:
+    if not left and not right:
+        return 1.0
+    return len(left & right) / len(left | right)
+
+
+def agreement(results: Sequence[Mapping[str, object]]) -> float:
+    """判定結果どうしの一致度 (0〜1).
+
+    社会的グレードと法務グレードは最多の値に一致した割合、タグは 2 件ずつの Jaccard 係数の
+    平均をとり、3 項目のうち最も低い値を返す。1 件以下では一致を判断できないため 0 とする。
+    """
+
+    if len(results) < 2:
+        return 0.0
+    signatures = [risk_signature(result) for result in results]
+    tag_sets = [signature[2] for signature in signatures]
+    pairs = list(combinations(tag_sets, 2))
+    return min(
+        _majority_share([signature[0] for signature in signatures]),
+        _majority_share([signature[1] for signature in signatures]),
+        sum(_jaccard(left, right) for left, right in pairs) / len(pairs),
+    )
+
+
+@dataclass(frozen=True)
+class ConsensusPolicy:
+    """判定を少数から始め、結果が一致しない場合だけ回数を増やす設定 (enabled=False で常に全回数)."""
+
+    enabled: bool = True
+    threshold: float = DEFAULT_THRESHOLD
+    initial_passes: int = DEFAULT_INITIAL_PASSES
+
+    @classmethod
+    def from_env(cls) -> "ConsensusPolicy":
+        return cls(
+            enabled=os.getenv("RISK_CONSENSUS", "true").lower() not in {"0", "false", "no"},
+            threshold=float(os.getenv("RISK_CONSENSUS_THRESHOLD", DEFAULT_THRESHOLD)),
+            initial_passes=max(
+                1, int(os.getenv("RISK_CONSENSUS_INITIAL_PASSES", DEFAULT_INITIAL_PASSES))
+            ),
+        )
+
+    def is_settled(self, results: Sequence[Mapping[str, object]]) -> bool:
+        """これまでの判定結果が十分に一致していて、追加の判定が不要なら True."""
+
+        return self.enabled and agreement(results) >= self.threshold
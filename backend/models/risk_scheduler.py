@@ -0,0 +1,84 @@
+"""リスク評価呼び出しを並列実行するスケジューラ."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Sequence, TypeVar, Union
+
+T = TypeVar("T")
+
+DEFAULT_GLOBAL_CONCURRENCY = 12
+DEFAULT_PROJECT_CONCURRENCY = 9
+
+
+class RiskFanoutScheduler:
+    """プロセス全体と案件ごとの同時実行数を制限しながらリスク評価を並列に発行する.
+
+    グローバルな上限で Gemini へ同時に投げる判定数を抑え、案件ごとの上限で
+    1 件の大きな案件が枠を占有しないようにする。
+    """
+
+    def __init__(
+        self,
+        *,
+        global_limit: Optional[int] = None,
+        per_project_limit: Optional[int] = None,
+    ) -> None:
+        if global_limit is None:
+            global_limit = int(os.getenv("RISK_GLOBAL_CONCURRENCY", DEFAULT_GLOBAL_CONCURRENCY))
+        if per_project_limit is None:
+            per_project_limit = int(
+                os.getenv("RISK_PROJECT_CONCURRENCY", DEFAULT_PROJECT_CONCURRENCY)
+            )
+        self.global_limit = max(1, global_limit)
+        self.per_project_limit = max(1, per_project_limit)
+        self._global_slots = asyncio.Semaphore(self.global_limit)
+        self._project_slots: Dict[str, asyncio.Semaphore] = {}
+        self._project_users: Dict[str, int] = {}
+
+    def _acquire_project_slots(self, project_id: str) -> asyncio.Semaphore:
+        slots = self._project_slots.get(project_id)
+        if slots is None:
+            slots = asyncio.Semaphore(self.per_project_limit)
+            self._project_slots[project_id] = slots
+        self._project_users[project_id] = self._project_users.get(project_id, 0) + 1
+        return slots
+
+    def _release_project_slots(self, project_id: str) -> None:
+        remaining = self._project_users.get(project_id, 0) - 1
+        if remaining > 0:
+            self._project_users[project_id] = remaining
+            return
+        self._project_users.pop(project_id, None)
+        self._project_slots.pop(project_id, None)
+
+    async def as_completed(
+        self,
+        project_id: str,
+        jobs: Sequence[Callable[[], Awaitable[T]]],
+    ) -> AsyncIterator[tuple[int, Union[T, BaseException]]]:
+        """jobs を並列に実行し、完了した順に (投入順のインデックス, 結果または例外) を返す."""
+
+        project_slots = self._acquire_project_slots(project_id)
+
+        async def run(index: int, job: Callable[[], Awaitable[T]]) -> tuple[int, Union[T, BaseException]]:
+            # 案件の枠を先に確保し、待機中の案件がグローバル枠を握らないようにする
+            async with project_slots:
+                async with self._global_slots:
+                    try:
+                        return index, await job()
+                    except Exception as exc:  # pylint: disable=broad-except
+                        return index, exc
+
+        tasks = [asyncio.create_task(run(index, job)) for index, job in enumerate(jobs)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            self._release_project_slots(project_id)
@@ -0,0 +1,81 @@
+"""文字 n-gram の転置インデックスで、参照テキスト (炎上事例・タグ定義) との類似度を求める."""
+
+from __future__ import annotations
+
+import math
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+DEFAULT_NGRAM_SIZES = (2, 3)
+
+
+def normalize_text(text: str) -> str:
+    """全角・半角と大文字小文字をそろえ、空白・記号を除く."""
+
+    normalized = unicodedata.normalize("NFKC", text or "").lower()
+    return "".join(
+        char for char in normalized if not unicodedata.category(char).startswith(("Z", "P", "C"))
+    )
+
+
+def char_ngrams(text: str, sizes: Sequence[int] = DEFAULT_NGRAM_SIZES) -> Set[str]:
+    """正規化したテキストの文字 n-gram (日本語は分かち書きせず文字単位で切る)."""
+
+    normalized = normalize_text(text)
+    grams: Set[str] = set()
+    for size in sizes:
+        grams.update(normalized[index:index + size] for index in range(len(normalized) - size + 1))
+    return grams
+
+
+class NgramIndex:
+    """参照テキストの文字 n-gram を IDF で重み付けした転置インデックス.
+
+    類似度は「参照テキストの n-gram (IDF 重み) のうち、照合対象に含まれる割合」で 0〜1 をとる。
+    長いコンテンツと短い参照文の比較でも、参照文側がどれだけ現れているかで評価できる。
+    照合コストは対象テキストの n-gram 数とそれらのポスティング長に比例し、参照件数には依存しにくい。
+    """
+
+    def __init__(self, documents: Sequence[str], *, sizes: Sequence[int] = DEFAULT_NGRAM_SIZES) -> None:
+        self.sizes = tuple(sizes)
+        self.size = len(documents)
+        document_grams = [char_ngrams(document, self.sizes) for document in documents]
+        frequency: Counter = Counter()
+        for grams in document_grams:
+            frequency.update(grams)
+        self.idf: Dict[str, float] = {
+            gram: math.log((1 + self.size) / (1 + count)) + 1.0 for gram, count in frequency.items()
+        }
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+        self.norms: List[float] = []
+        for doc_id, grams in enumerate(document_grams):
+            for gram in grams:
+                self.postings[gram].append(doc_id)
+            self.norms.append(sum(self.idf[gram] ** 2 for gram in grams))
+        self.postings = dict(self.postings)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def search(
+        self, text: str, *, min_score: float = 0.0, limit: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """text と似ている参照テキストを (番号, 類似度) で類似度の高い順に返す."""
+
+        scores: Dict[int, float] = defaultdict(float)
+        for gram in char_ngrams(text, self.sizes):
+            doc_ids = self.postings.get(gram)
+            if not doc_ids:
+                continue
+            weight = self.idf[gram] ** 2
+            for doc_id in doc_ids:
+                scores[doc_id] += weight
+
+        ranked = [
+            (doc_id, score / self.norms[doc_id])
+            for doc_id, score in scores.items()
+            if self.norms[doc_id] and score / self.norms[doc_id] >= min_score
+        ]
+        ranked.sort(key=lambda item: (-item[1], item[0]))
+        return ranked[:limit] if limit is not None else ranked
@@ -1,25 +1,57 @@
 """分析パイプラインの調停ロジック."""
 
+import asyncio
 import json
+import os
+import uuid
 from collections import Counter
+from contextvars import ContextVar
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 import aiofiles
 
 from backend.models.gemini_client import GeminiClient
+from backend.models.gemini_files import MediaHandle
 from backend.models.risk_assessor import RiskAssessor
+from backend.models.risk_consensus import ConsensusPolicy, agreement
+from backend.models.risk_scheduler import RiskFanoutScheduler
 from backend.store import (
     PROJECT_STEPS,
     PipelineAlreadyRunningError,
     ProjectNotFoundError,
     ProjectStore,
 )
+from backend.utils.annotated_frames import collect_risk_timecodes, precompute_annotated_frames
 from backend.utils.logging_utils import setup_logger
+from backend.utils.media_jobs import MediaJobError, MediaJobTimeout
+from backend.utils.media_proxy import AnalysisMedia, prepare_analysis_media, proxy_enabled
+from backend.utils.shot_detection import ShotIndex, build_shot_index, shot_detection_enabled
+from backend.utils.tag_frames import (
+    build_frames_info,
+    collect_tag_timecodes,
+    extract_tag_frames,
+    tag_frame_filename,
+)
+
+# 情報摘出フェーズの実行回数 (結果を比較して適切な方を採用する)
+EXTRACTION_RUNS = 2
+DEFAULT_EXTRACTION_CONCURRENCY = 6
+# リスク分析 1 イテレーションあたりの Gemini 判定回数
+RISK_PASSES_PER_ITERATION = 3
+
+# 実行中の案件で使う GeminiClient (案件ごとにモデルが異なるためタスク単位で保持する)
+_project_gemini_client: ContextVar[Optional[GeminiClient]] = ContextVar(
+    "project_gemini_client", default=None
+)
+# 実行中の案件で使う RiskAssessor (参照データは分析の開始時の版に固定する)
+_project_risk_assessor: ContextVar[Optional[RiskAssessor]] = ContextVar(
+    "project_risk_assessor", default=None
+)
 
 
 class AnalysisPipeline:
-    """動画分析の各ステップを順次実行する."""
+    """動画分析の各ステップを調停して実行する."""
 
     def __init__(
         self,
@@ -28,11 +60,40 @@ class AnalysisPipeline:
         gemini_client: GeminiClient,
         risk_assessor: RiskAssessor,
         logger_name: str = "analysis_pipeline",
+        extraction_concurrency: Optional[int] = None,
+        risk_scheduler: Optional[RiskFanoutScheduler] = None,
+        risk_consensus: Optional[ConsensusPolicy] = None,
     ) -> None:
         self.store = store
         self.gemini_client = gemini_client
         self.risk_assessor = risk_assessor
         self.logger = setup_logger(logger_name)
+        if extraction_concurrency is None:
+            extraction_concurrency = int(
+                os.getenv("PIPELINE_EXTRACTION_CONCURRENCY", DEFAULT_EXTRACTION_CONCURRENCY)
+            )
+        self.extraction_concurrency = max(1, extraction_concurrency)
+        self.risk_scheduler = risk_scheduler or RiskFanoutScheduler()
+        # 判定が一致した時点で残りのイテレーションを打ち切る (RISK_CONSENSUS=false で常に全回数)
+        self.risk_consensus = risk_consensus or ConsensusPolicy.from_env()
+        # 完了を待たないバックグラウンド処理 (GC で消えないよう参照を持っておく)
+        self._background_tasks: set[asyncio.Task] = set()
+
+    @property
+    def gemini_client(self) -> GeminiClient:
+        return _project_gemini_client.get() or self._gemini_client
+
+    @gemini_client.setter
+    def gemini_client(self, client: GeminiClient) -> None:
+        self._gemini_client = client
+
+    @property
+    def risk_assessor(self) -> RiskAssessor:
+        return _project_risk_assessor.get() or self._risk_assessor
+
+    @risk_assessor.setter
+    def risk_assessor(self, assessor: RiskAssessor) -> None:
+        self._risk_assessor = assessor
 
     async def run(self, project_id: str) -> None:
         """パイプラインを実行するエントリポイント."""
@@ -48,20 +109,44 @@ class AnalysisPipeline:
             self.logger.warning("Project %s not found. Abort pipeline.", project_id)
             return
 
+        client_token = None
+        assessor_token = None
+        media_handle: Optional[MediaHandle] = None
+        audio_handle: Optional[MediaHandle] = None
         try:
             project = await self.store.get_project(project_id)
             video_path = Path(project.video_path)
             workspace_dir = Path(project.workspace_dir)
             media_type = project.media_type
 
-            # プロジェクトのmodelを使用して新しいGeminiClientインスタンスを作成
+            # プロジェクトのmodelを使用する (接続プールは共有クライアントのものを使い回す)
             allowed_models = ["gemini-2.5-flash", "gemini-2.0-flash-exp", "gemini-2.0-flash"]
             gemini_model = project.model if project.model in allowed_models else "gemini-2.5-flash"
             self.logger.info(f"Using Gemini model: {gemini_model} for project {project_id}")
 
-            # 一時的にgemini_clientを置き換える
-            original_gemini_client = self.gemini_client
-            self.gemini_client = GeminiClient(model=gemini_model)
+            # この案件の処理中だけ gemini_client を差し替える
+            client_token = _project_gemini_client.set(self._gemini_client.with_model(gemini_model))
+            # 参照データが途中で更新されても、この案件は開始時の版で最後まで評価する
+            assessor_token = _project_risk_assessor.set(self._risk_assessor.for_current_reference())
+
+            # 動画は縮小プロキシと 16 kHz モノラル音声に変換してから送る
+            # (OCR・映像解析はプロキシ、文字起こしは音声のみ。プロキシを作れなければ元ファイル)
+            analysis_media = AnalysisMedia(source=video_path, video=video_path)
+            if media_type == "video" and proxy_enabled():
+                analysis_media = await prepare_analysis_media(video_path, workspace_dir)
+            # プロキシを作れて音声が None なのは、音声ストリームが無いと確認できた素材だけ。
+            # 元ファイルを改めて送らず、文字起こしを省く
+            has_audio = analysis_media.audio is not None or not analysis_media.is_proxy
+
+            # カット検出でショット索引と代表フレームを作り、映像解析はショット単位で行う
+            shot_index: Optional[ShotIndex] = None
+            if media_type == "video" and shot_detection_enabled():
+                shot_index = await build_shot_index(analysis_media.video, workspace_dir)
+
+            # メディアは案件ごとに 1 度だけ登録し、各ステップからハンドルで参照する
+            media_handle = await self.gemini_client.register_media(analysis_media.video)
+            if analysis_media.audio is not None:
+                audio_handle = await self.gemini_client.register_media(analysis_media.audio)
 
             await self.store.update_iteration_state(
                 project_id,
@@ -69,71 +154,51 @@ class AnalysisPipeline:
                 total_iterations=total_iterations,
             )
 
-            # 情報摘出フェーズを2回実行し、適切な方を選択
-            self.logger.info("Starting information extraction (run 1/2) for project %s", project_id)
-            transcript_1, transcript_path_1, transcript_source_1, transcript_note_1 = await self._run_transcription(
-                project_id, video_path, workspace_dir, media_type
-            )
-            ocr_text_1, ocr_path_1, ocr_note_1 = await self._run_ocr(project_id, video_path, workspace_dir, media_type)
-            video_result_1, video_path_result_1, video_note_1 = await self._run_visual_analysis(
-                project_id, video_path, workspace_dir, media_type
-            )
-            self.logger.info("Information extraction run 1/2 completed for project %s", project_id)
-
-            self.logger.info("Starting information extraction (run 2/2) for project %s", project_id)
-            transcript_2, transcript_path_2, transcript_source_2, transcript_note_2 = await self._run_transcription(
-                project_id, video_path, workspace_dir, media_type
+            # 情報摘出フェーズを2回分まとめて並列実行し、適切な方を選択
+            self.logger.info(
+                "Starting information extraction (%d runs, concurrency=%d) for project %s",
+                EXTRACTION_RUNS,
+                self.extraction_concurrency,
+                project_id,
             )
-            ocr_text_2, ocr_path_2, ocr_note_2 = await self._run_ocr(project_id, video_path, workspace_dir, media_type)
-            video_result_2, video_path_result_2, video_note_2 = await self._run_visual_analysis(
-                project_id, video_path, workspace_dir, media_type
+            transcript_runs, ocr_runs, video_runs = await self._run_extraction_stage(
+                project_id,
+                analysis_media.video,
+                workspace_dir,
+                media_type,
+                media_handle=media_handle,
+                audio_path=analysis_media.audio,
+                audio_handle=audio_handle,
+                has_audio=has_audio,
+                shot_index=shot_index,
             )
-            self.logger.info("Information extraction run 2/2 completed for project %s", project_id)
+            self.logger.info("Information extraction runs completed for project %s", project_id)
 
             # 2つの結果を比較し、より適切な方を選択
             self.logger.info("Selecting best extraction results for project %s", project_id)
-            transcript, transcript_path, transcript_source, transcript_note = await self._select_best_transcription(
-                (transcript_1, transcript_path_1, transcript_source_1, transcript_note_1),
-                (transcript_2, transcript_path_2, transcript_source_2, transcript_note_2)
+            (
+                (transcript, transcript_path, transcript_source, transcript_note),
+                (ocr_text, ocr_path, ocr_note),
+                (video_result, video_path_result, video_note),
+            ) = await asyncio.gather(
+                self._select_best_transcription(*transcript_runs),
+                self._select_best_ocr(*ocr_runs),
+                self._select_best_video(*video_runs),
             )
-            ocr_text, ocr_path, ocr_note = await self._select_best_ocr(
-                (ocr_text_1, ocr_path_1, ocr_note_1),
-                (ocr_text_2, ocr_path_2, ocr_note_2)
-            )
-            video_result, video_path_result, video_note = await self._select_best_video(
-                (video_result_1, video_path_result_1, video_note_1),
-                (video_result_2, video_path_result_2, video_note_2)
+            await self._persist_selected_extraction(
+                workspace_dir, transcript, transcript_source, ocr_text, video_result
             )
             self.logger.info("Information extraction completed for project %s", project_id)
 
-            # リスク分析を3回実行
-            risk_results: List[Dict[str, Any]] = []
-            for iteration in range(1, total_iterations + 1):
-                await self.store.update_iteration_state(
-                    project_id,
-                    current_iteration=iteration,
-                    total_iterations=total_iterations,
-                )
-                self.logger.info(
-                    "Starting risk analysis iteration %d/%d for project %s",
-                    iteration,
-                    total_iterations,
-                    project_id,
-                )
-                risk_result, risk_path = await self._run_risk(
-                    project_id,
-                    transcript,
-                    ocr_text,
-                    video_result,
-                    workspace_dir,
-                )
-                risk_results.append(risk_result)
-                self.logger.info(
-                    "Risk analysis iteration %d/%d completed for project %s",
-                    iteration,
-                    total_iterations,
-                    project_id,
-                )
+            # リスク分析 (最大 3イテレーション × 3パス) を並列に発行し、完了順に集約
+            risk_results, risk_calls = await self._run_risk_fanout(
+                project_id,
+                transcript,
+                ocr_text,
+                video_result,
+                workspace_dir,
+                total_iterations=total_iterations,
+            )
 
             # リスク分析結果を統合（ハイブリッド戦略）
             aggregated_risk = self._aggregate_risk_results(risk_results)
@@ -158,6 +223,10 @@ class AnalysisPipeline:
                 self.logger.info("Extracting frames for risk tags in project %s", project_id)
                 await self._extract_tag_frames(project_id, workspace_dir, video_path, aggregated_risk)
 
+            # 指摘箇所の注釈付きフレームを裏で作っておき、/frame をキャッシュから返せるようにする
+            if media_type == "video":
+                self._schedule_frame_precompute(project_id, workspace_dir, video_path, aggregated_risk)
+
             aggregation = await self._finalize_with_single_extraction(
                 project_id,
                 workspace_dir,
@@ -174,13 +243,14 @@ class AnalysisPipeline:
                 video_path_result,
                 aggregated_risk,
                 risk_results,
+                risk_calls=risk_calls,
             )
             await self._apply_step_overrides(project_id, aggregation["step_payloads"])
             await self.store.mark_pipeline_completed(project_id, aggregation["final_report"])
             self.logger.info(
                 "Pipeline completed for project %s after %d iterations",
                 project_id,
-                total_iterations,
+                len(risk_results),
             )
         except Exception as exc:  # pylint: disable=broad-except
             # エラー時はステータスを failed にしてログを残す
@@ -188,59 +258,84 @@ class AnalysisPipeline:
             await self.store.mark_pipeline_failed(project_id, str(exc))
             raise
         finally:
-            # 元のgemini_clientに戻す
-            self.gemini_client = original_gemini_client
-
-    async def _execute_iteration(
+            if media_handle is not None:
+                await self.gemini_client.release_media(media_handle)
+            if audio_handle is not None:
+                await self.gemini_client.release_media(audio_handle)
+            if client_token is not None:
+                _project_gemini_client.reset(client_token)
+            if assessor_token is not None:
+                _project_risk_assessor.reset(assessor_token)
+
+    async def _run_extraction_stage(
         self,
         project_id: str,
         media_path: Path,
         workspace_dir: Path,
         media_type: str,
-        iteration: int,
-        total_iterations: int,
-    ) -> Dict[str, Any]:
-        """単一イテレーション分の解析を実行し、中間結果を返す."""
+        runs: int = EXTRACTION_RUNS,
+        *,
+        media_handle: Optional[MediaHandle] = None,
+        audio_path: Optional[Path] = None,
+        audio_handle: Optional[MediaHandle] = None,
+        has_audio: bool = True,
+        shot_index: Optional[ShotIndex] = None,
+    ) -> tuple[
+        List[tuple[str, Path, str, Optional[str]]],
+        List[tuple[str, Path, Optional[str]]],
+        List[tuple[dict, Path, Optional[str]]],
+    ]:
+        """文字起こし・OCR・映像解析を runs 回分まとめて並列実行する.
+
+        各呼び出しは互いに独立しているため、同時実行数の上限内で一斉に発行し、
+        フェーズ全体の所要時間を最も遅い 1 呼び出し程度に抑える。
+        audio_path を渡した場合、文字起こしだけはそちら (音声のみのトラック) を使う。
+        has_audio が False なら文字起こしは実施しない。
+        shot_index は映像解析にだけ渡す。
+        各回には実行番号を渡し、結果キャッシュ上でも別々の結果として扱わせる
+        (同じ結果を比較しても選択の意味がないため)。
+        """
+
+        semaphore = asyncio.Semaphore(self.extraction_concurrency)
+
+        async def bounded(step_runner: Any, run: int) -> Any:
+            path, handle = media_path, media_handle
+            options: Dict[str, Any] = {"run": run}
+            if step_runner == self._run_transcription:
+                options["has_audio"] = has_audio
+                if audio_path is not None:
+                    path, handle = audio_path, audio_handle
+            if step_runner == self._run_visual_analysis:
+                options["shot_index"] = shot_index
+            async with semaphore:
+                return await step_runner(
+                    project_id, path, workspace_dir, media_type, media_handle=handle, **options
+                )
 
-        transcript, _, transcript_source, transcript_note = await self._run_transcription(
-            project_id, media_path, workspace_dir, media_type
-        )
-        ocr_text, _, ocr_note = await self._run_ocr(project_id, media_path, workspace_dir, media_type)
-        video_result, _, video_note = await self._run_visual_analysis(
-            project_id, media_path, workspace_dir, media_type
-        )
-        risk_result, _ = await self._run_risk(
-            project_id,
-            transcript,
-            ocr_text,
-            video_result,
-            workspace_dir,
-        )
-        self.logger.info(
-            "Iteration %d/%d finished for %s",
-            iteration,
-            total_iterations,
-            project_id,
+        step_runners = (self._run_transcription, self._run_ocr, self._run_visual_analysis)
+        results = await asyncio.gather(
+            *(bounded(runner, run) for run in range(runs) for runner in step_runners)
         )
-        return {
-            "iteration": iteration,
-            "transcription": {
-                "text": transcript,
-                "source": transcript_source,
-                "note": transcript_note,
-            },
-            "ocr": {
-                "text": ocr_text,
-                "note": ocr_note,
-            },
-            "video": {
-                "result": video_result,
-                "note": video_note,
-            },
-            "risk": {
-                "result": risk_result,
-            },
-        }
+        step_count = len(step_runners)
+        transcript_runs = list(results[0::step_count])
+        ocr_runs = list(results[1::step_count])
+        video_runs = list(results[2::step_count])
+        return transcript_runs, ocr_runs, video_runs
+
+    async def _persist_selected_extraction(
+        self,
+        workspace_dir: Path,
+        transcript: str,
+        transcript_source: str,
+        ocr_text: str,
+        video_result: dict,
+    ) -> None:
+        """並列実行で後勝ちになった中間ファイルを採用結果で書き直す."""
+
+        if transcript_source != "skipped":
+            await self._save_text_file(workspace_dir, "transcription.txt", transcript)
+        await self._save_text_file(workspace_dir, "ocr.txt", ocr_text)
+        await self._save_json_file(workspace_dir, "video_analysis.json", video_result)
 
     def _aggregate_risk_results(self, risk_results: List[Dict[str, Any]]) -> Dict[str, Any]:
         """3回のリスク分析結果をハイブリッド戦略で統合."""
@@ -267,7 +362,7 @@ class AnalysisPipeline:
         if not selected_result:
             selected_result = risk_results[0] if risk_results else {}
 
-        # 2. タグ: 2回以上出現したタグのみ採用（多数決）
+        # 2. タグ: 2回以上出現したタグのみ採用（多数決。イテレーションが 1 回だけならその回のタグ）
         all_tags = []
         for result in risk_results:
             tags = result.get("tags") or []
@@ -281,9 +376,11 @@ class AnalysisPipeline:
                     tag_counter[tag_name] = []
                 tag_counter[tag_name].append(tag)
 
+        # 打ち切りでイテレーションが 1 回だけの場合は、その回のタグをそのまま採用する
+        required_votes = min(2, len(risk_results))
         consensus_tags = []
         for tag_name, tag_list in tag_counter.items():
-            if len(tag_list) >= 2:  # 2回以上出現
+            if len(tag_list) >= required_votes:
                 # 最も厳しいグレードを選択
                 grade_priority = {"S": 0, "A": 1, "B": 2, "C": 3}
                 best_tag = min(tag_list, key=lambda t: grade_priority.get(t.get("grade", "C"), 99))
@@ -330,8 +427,10 @@ class AnalysisPipeline:
         video_path: Path,
         aggregated_risk: Dict[str, Any],
         risk_results: List[Dict[str, Any]],
+        *,
+        risk_calls: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
-        """情報摘出1回+リスク分析3回の結果から最終レポートとステップデータを生成."""
+        """情報摘出1回+リスク分析 (最大 3 回) の結果から最終レポートとステップデータを生成."""
 
         transcript_formatted = self._format_transcript(transcript)
         ocr_formatted = self._format_ocr_text(ocr_text)
@@ -371,6 +470,7 @@ class AnalysisPipeline:
             ocr_note,
             video_note,
             iterations=iterations_serialized,
+            risk_calls=risk_calls,
         )
 
         step_payloads: Dict[str, Dict[str, Any]] = {
@@ -431,18 +531,18 @@ class AnalysisPipeline:
     ) -> None:
         """集約後のステップデータでストアを更新する."""
 
-        project = await self.store.get_project(project_id)
-        for step, payload in step_payloads.items():
-            preview = str(payload.get("preview") or "")
-            project.payloads[step] = {
-                "preview": preview[:300],
-                "data": payload.get("data"),
-            }
-            project.step_status[step] = "completed"
-        await self.store.save(project)
+        await self.store.update_step_payloads(project_id, step_payloads)
 
     async def _run_transcription(
-        self, project_id: str, media_path: Path, workspace_dir: Path, media_type: str
+        self,
+        project_id: str,
+        media_path: Path,
+        workspace_dir: Path,
+        media_type: str,
+        *,
+        media_handle: Optional[MediaHandle] = None,
+        has_audio: bool = True,
+        run: int = 0,
     ) -> tuple[str, Path, str, Optional[str]]:
         """音声文字起こしステップ."""
 
@@ -461,12 +561,25 @@ class AnalysisPipeline:
                 "transcription.txt",
                 "静止画コンテンツのため音声文字起こしは実施しません。",
             )
+        elif not has_audio:
+            self.logger.info("Skipping transcription for %s (no audio track).", project_id)
+            transcript = ""
+            transcript_source = "skipped"
+            transcript_note = "音声トラックが無いため音声文字起こしをスキップしました。"
+            formatted = "🗣️ 音声文字起こし\n音声トラックが無いため音声文字起こしは実施しません。"
+            transcript_path = await self._save_text_file(
+                workspace_dir,
+                "transcription.txt",
+                "音声トラックが無いため音声文字起こしは実施しません。",
+            )
         else:
             try:
                 transcript = await self.gemini_client.run_step(
                     "transcription",
                     media_path,
                     media_type=media_type,
+                    media_handle=media_handle,
+                    run=run,
                 )
             except Exception as gemini_error:
                 self.logger.warning(
@@ -484,7 +597,7 @@ class AnalysisPipeline:
                 )
             formatted = self._format_transcript(transcript)
             transcript_path = await self._save_text_file(
-                workspace_dir, "transcription.txt", transcript or formatted
+                workspace_dir, "transcription.txt", transcript
             )
         await self.store.update_status(
             project_id,
@@ -501,7 +614,14 @@ class AnalysisPipeline:
         return transcript, transcript_path, transcript_source, transcript_note
 
     async def _run_ocr(
-        self, project_id: str, video_path: Path, workspace_dir: Path, media_type: str
+        self,
+        project_id: str,
+        video_path: Path,
+        workspace_dir: Path,
+        media_type: str,
+        *,
+        media_handle: Optional[MediaHandle] = None,
+        run: int = 0,
     ) -> tuple[str, Path, Optional[str]]:
         """OCR ステップ."""
 
@@ -513,6 +633,8 @@ class AnalysisPipeline:
                 "ocr",
                 video_path,
                 media_type=media_type,
+                media_handle=media_handle,
+                run=run,
             )
         except Exception as exc:
             self.logger.warning(
@@ -544,7 +666,15 @@ class AnalysisPipeline:
         return ocr_text, ocr_path, ocr_note
 
     async def _run_visual_analysis(
-        self, project_id: str, media_path: Path, workspace_dir: Path, media_type: str
+        self,
+        project_id: str,
+        media_path: Path,
+        workspace_dir: Path,
+        media_type: str,
+        *,
+        media_handle: Optional[MediaHandle] = None,
+        shot_index: Optional[ShotIndex] = None,
+        run: int = 0,
     ) -> tuple[dict, Path, Optional[str]]:
         """映像解析ステップ."""
 
@@ -556,6 +686,9 @@ class AnalysisPipeline:
                 "visual",
                 media_path,
                 media_type=media_type,
+                media_handle=media_handle,
+                shot_index=shot_index,
+                run=run,
             )
             if not isinstance(video_result, dict):
                 raise ValueError("Visual analysis returned non-dict payload")
@@ -596,55 +729,218 @@ class AnalysisPipeline:
         )
         return video_result, video_path, video_note
 
-    async def _run_risk(
+    async def _run_risk_fanout(
         self,
         project_id: str,
         transcript: str,
         ocr_text: str,
         video_result: dict,
         workspace_dir: Path,
-    ) -> tuple[dict, Path]:
-        """Gemini を用いた統合リスク評価."""
+        *,
+        total_iterations: int,
+        passes: int = RISK_PASSES_PER_ITERATION,
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Gemini 判定を並列に発行し、イテレーションごとの結果と呼び出し回数の記録を返す.
+
+        判定は完了した順に passes 件ずつ 1 イテレーションとしてまとめ、
+        まとまるたびにステップ状態とイテレーション進捗を更新する。
+        逐次合議が無効なら全イテレーション分を一括で発行する。有効なら
+        ConsensusPolicy.initial_passes 件を並列に発行し、一致しなければ残りを一括で追加して、
+        イテレーションがまとまった時点で十分に一致していれば残りを打ち切る
+        (待ち時間は最大でも 2 ラウンド分)。
+        """
 
         step = PROJECT_STEPS[3]
-        await self.store.mark_step_running(project_id, step)
-        try:
-            risk_result = await self.risk_assessor.assess_with_enrichment(
+        policy = self.risk_consensus
+        await self.store.update_iteration_state(
+            project_id,
+            current_iteration=1,
+            total_iterations=total_iterations,
+        )
+        self.logger.info(
+            "Starting risk analysis fan-out (%s%d iterations x %d passes) for project %s",
+            "up to " if policy.enabled else "",
+            total_iterations,
+            passes,
+            project_id,
+        )
+
+        keyword_matches = self.risk_assessor.build_keyword_matches(transcript, ocr_text)
+
+        def make_job() -> Any:
+            return lambda: self.risk_assessor.assess(
                 transcript=transcript,
                 ocr_text=ocr_text,
                 video_summary=video_result,
             )
-            risk_result.setdefault("tags", [])
-            burn_risk = self.risk_assessor.calculate_burn_risk(risk_result.get("tags") or [])
-            risk_result["burn_risk"] = burn_risk
+
+        risk_results: List[Dict[str, Any]] = []
+        raw_results: List[Dict[str, Any]] = []
+        calls = 0
+
+        async def collect(jobs: List[Any]) -> AsyncIterator[Any]:
+            nonlocal calls
+            completions = self.risk_scheduler.as_completed(project_id, jobs)
+            try:
+                async for index, outcome in completions:
+                    calls += 1
+                    if isinstance(outcome, BaseException):
+                        self.logger.warning(
+                            "Gemini assess call %d failed for %s: %s", index + 1, project_id, outcome
+                        )
+                    else:
+                        raw_results.append(outcome)
+                    yield outcome
+            finally:
+                # 途中で打ち切られたら、スケジューラ側で未完了の判定を取り消させる
+                await completions.aclose()
+
+        async def complete_iteration(batch: List[Any]) -> None:
+            if not any(isinstance(outcome, dict) for outcome in batch):
+                # 全パスが失敗したイテレーションは 1 回だけ判定し直す
+                self.logger.warning(
+                    "All risk assessment passes failed for %s, retrying once", project_id
+                )
+                batch = batch + [outcome async for outcome in collect([make_job()])]
+            risk_result = self._build_iteration_risk(project_id, batch, keyword_matches)
+            await self._complete_risk_step(project_id, risk_result, workspace_dir)
+            risk_results.append(risk_result)
+            completed = len(risk_results)
+            await self.store.update_iteration_state(
+                project_id,
+                current_iteration=min(completed + 1, total_iterations),
+                total_iterations=total_iterations,
+            )
             self.logger.info(
-                "Risk assessment finished for %s: social=%s legal=%s tags=%d burn_entries=%d",
+                "Risk analysis iteration %d/%d completed for project %s",
+                completed,
+                total_iterations,
                 project_id,
-                risk_result.get("social", {}).get("grade"),
-                risk_result.get("legal", {}).get("grade"),
-                len(risk_result.get("tags") or []),
-                burn_risk.get("count") if isinstance(burn_risk, dict) else 0,
             )
-        except Exception as exc:  # pragma: no cover
-            self.logger.exception("Risk assessment failed for %s", project_id)
-            risk_result = {
-                "social": {
-                    "grade": "C",
-                    "reason": "リスク評価に失敗したため暫定評価を返却しています。",
-                    "findings": [],
-                },
-                "legal": {
-                    "grade": "抵触する可能性がある",
-                    "reason": "リスク評価に失敗したため暫定評価を返却しています。",
-                    "recommendations": "Gemini の設定を確認し、再度実行してください。",
-                    "violations": [],
-                    "findings": [],
-                },
-                "matrix": {"x_axis": "法務評価", "y_axis": "社会的感度", "position": [1, 2]},
-                "note": str(exc),
-                "tags": [],
-                "burn_risk": {"count": 0, "details": []},
-            }
+
+        max_calls = total_iterations * passes
+        consumed = 0
+
+        async def run_round(jobs: List[Any], batch: List[Any]) -> List[Any]:
+            # jobs を並列に発行し、passes 件そろうごとにイテレーションを確定する。
+            # 一致した時点で未完了の判定を取り消し、まとまっていない端数を返す
+            nonlocal consumed
+            outcomes = collect(jobs)
+            try:
+                async for outcome in outcomes:
+                    consumed += 1
+                    batch.append(outcome)
+                    if len(batch) < passes:
+                        continue
+                    settled = policy.is_settled(raw_results)
+                    if not settled and consumed < max_calls:
+                        # 次のイテレーションを先に開き、ステップが途中で完了扱いにならないようにする
+                        await self.store.mark_step_running(project_id, step)
+                    await complete_iteration(batch)
+                    batch = []
+                    if settled:
+                        break
+            finally:
+                await outcomes.aclose()
+            return batch
+
+        await self.store.mark_step_running(project_id, step)
+        first = min(max_calls, policy.initial_passes) if policy.enabled else max_calls
+        batch = await run_round([make_job() for _ in range(first)], [])
+        if first < max_calls and not policy.is_settled(raw_results):
+            # 一致しなければ残りをまとめて追加する (1 件ずつ足すより待ち時間を優先する)
+            batch = await run_round([make_job() for _ in range(max_calls - first)], batch)
+        if batch:
+            await complete_iteration(batch)
+        if len(risk_results) < total_iterations:
+            # 打ち切った場合は進捗表示の総数を実施したイテレーション数に合わせる
+            await self.store.update_iteration_state(
+                project_id,
+                current_iteration=len(risk_results),
+                total_iterations=len(risk_results),
+            )
+
+        risk_calls = {
+            "mode": "consensus" if policy.enabled else "fixed",
+            "calls": calls,
+            "max_calls": max_calls,
+            "iterations": len(risk_results),
+            "agreement": round(agreement(raw_results), 3),
+        }
+        self.logger.info(
+            "Risk analysis used %d/%d Gemini calls (%d iterations, agreement=%.2f) for project %s",
+            calls,
+            max_calls,
+            len(risk_results),
+            risk_calls["agreement"],
+            project_id,
+        )
+        return risk_results, risk_calls
+
+    def _build_iteration_risk(
+        self,
+        project_id: str,
+        outcomes: List[Any],
+        keyword_matches: List[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """1 イテレーション分の判定結果を補強タグと統合する."""
+
+        base_results = [outcome for outcome in outcomes if isinstance(outcome, dict)]
+        if not base_results:
+            errors = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+            self.logger.error("All risk assessment passes failed for %s", project_id)
+            return self._fallback_risk_result(errors[-1] if errors else "no result")
+        risk_result = self.risk_assessor.enrich(base_results, keyword_matches)
+        self._attach_burn_risk(project_id, risk_result)
+        return risk_result
+
+    def _attach_burn_risk(self, project_id: str, risk_result: Dict[str, Any]) -> None:
+        """タグ情報から炎上補正を算出してリスク結果に付与する."""
+
+        risk_result.setdefault("tags", [])
+        burn_risk = self.risk_assessor.calculate_burn_risk(risk_result.get("tags") or [])
+        risk_result["burn_risk"] = burn_risk
+        self.logger.info(
+            "Risk assessment finished for %s: social=%s legal=%s tags=%d burn_entries=%d",
+            project_id,
+            risk_result.get("social", {}).get("grade"),
+            risk_result.get("legal", {}).get("grade"),
+            len(risk_result.get("tags") or []),
+            burn_risk.get("count") if isinstance(burn_risk, dict) else 0,
+        )
+
+    @staticmethod
+    def _fallback_risk_result(error: object) -> Dict[str, Any]:
+        """リスク評価に失敗した場合の暫定結果."""
+
+        return {
+            "social": {
+                "grade": "C",
+                "reason": "リスク評価に失敗したため暫定評価を返却しています。",
+                "findings": [],
+            },
+            "legal": {
+                "grade": "抵触する可能性がある",
+                "reason": "リスク評価に失敗したため暫定評価を返却しています。",
+                "recommendations": "Gemini の設定を確認し、再度実行してください。",
+                "violations": [],
+                "findings": [],
+            },
+            "matrix": {"x_axis": "法務評価", "y_axis": "社会的感度", "position": [1, 2]},
+            "note": str(error),
+            "tags": [],
+            "burn_risk": {"count": 0, "details": []},
+        }
+
+    async def _complete_risk_step(
+        self,
+        project_id: str,
+        risk_result: Dict[str, Any],
+        workspace_dir: Path,
+    ) -> Path:
+        """リスク評価結果を保存し、ステップ完了を記録する."""
+
+        step = PROJECT_STEPS[3]
         formatted = self._format_risk(risk_result)
         risk_path = await self._save_json_file(workspace_dir, "risk_assessment.json", risk_result)
         await self.store.update_status(
@@ -657,7 +953,7 @@ class AnalysisPipeline:
                 "file_path": str(risk_path),
             },
         )
-        return risk_result, risk_path
+        return risk_path
 
     def _build_final_report(
         self,
@@ -674,6 +970,7 @@ class AnalysisPipeline:
         ocr_note: Optional[str],
         video_note: Optional[str],
         iterations: Optional[List[Dict[str, Any]]] = None,
+        risk_calls: Optional[Dict[str, Any]] = None,
     ) -> dict:
         """各モジュールの結果を人が読みやすい形式でまとめる."""
 
@@ -709,6 +1006,11 @@ class AnalysisPipeline:
             metadata["ocr_annotations"] = ocr_annotations
         if burn_risk:
             metadata["burn_risk"] = burn_risk
+        reference_version = getattr(self.risk_assessor, "reference_version", None)
+        if reference_version:
+            metadata["reference_version"] = reference_version
+        if risk_calls:
+            metadata["risk_calls"] = risk_calls
 
         return {
             "summary": disclaimer,
@@ -892,18 +1194,19 @@ class AnalysisPipeline:
         """テキスト結果を uploads ディレクトリに保存."""
 
         output_path = workspace_dir / filename
-        async with aiofiles.open(output_path, "w", encoding="utf-8") as file_obj:
+        # 並列実行中のステップが同じファイルへ書き込んでも内容が混ざらないよう、
+        # 一時ファイルへ書き出してから置き換える
+        temp_path = workspace_dir / f".{filename}.{uuid.uuid4().hex}.tmp"
+        async with aiofiles.open(temp_path, "w", encoding="utf-8") as file_obj:
             await file_obj.write(content)
+        os.replace(temp_path, output_path)
         return output_path
 
     async def _save_json_file(self, workspace_dir: Path, filename: str, payload: dict) -> Path:
         """JSON 結果を uploads ディレクトリに保存."""
 
-        output_path = workspace_dir / filename
-        async with aiofiles.open(output_path, "w", encoding="utf-8") as file_obj:
-            json_payload = json.dumps(payload, ensure_ascii=False, indent=2)
-            await file_obj.write(json_payload)
-        return output_path
+        json_payload = json.dumps(payload, ensure_ascii=False, indent=2)
+        return await self._save_text_file(workspace_dir, filename, json_payload)
 
     async def _select_best_transcription(
         self,
@@ -1035,111 +1338,73 @@ class AnalysisPipeline:
             self.logger.warning(f"Failed to get Gemini selection: {e}, defaulting to more detailed video analysis")
             return run1 if len1 >= len2 else run2
 
-    async def _extract_tag_frames(
+    def _schedule_frame_precompute(
         self,
         project_id: str,
         workspace_dir: Path,
         video_path: Path,
         risk_data: dict
     ) -> None:
-        """リスクタグのタイムコードからフレームを抽出してサムネイルを保存する."""
-        import subprocess
-        import shutil
-
-        frames_dir = workspace_dir / "tag_frames"
-        frames_dir.mkdir(exist_ok=True)
-
-        # タイムコードを収集
-        timecodes_to_extract = []
-        tags = risk_data.get("tags", [])
-
-        for tag in tags:
-            tag_name = tag.get("name", "unknown")
-
-            # メインタグのタイムコード
-            if tag.get("detected_timecode"):
-                timecodes_to_extract.append({
-                    "timecode": tag["detected_timecode"],
-                    "tag": tag_name,
-                    "sub_tag": None
-                })
-
-            # サブタグのタイムコード
-            for sub_tag in tag.get("related_sub_tags", []):
-                if sub_tag.get("detected_timecode"):
-                    timecodes_to_extract.append({
-                        "timecode": sub_tag["detected_timecode"],
-                        "tag": tag_name,
-                        "sub_tag": sub_tag.get("name")
-                    })
-
-        # 重複を削除
-        seen = set()
-        unique_timecodes = []
-        for item in timecodes_to_extract:
-            tc = item["timecode"]
-            if tc not in seen:
-                seen.add(tc)
-                unique_timecodes.append(item)
+        """リスク指摘・タグのタイムコードについて注釈付きフレームの事前生成を開始する."""
 
-        self.logger.info(f"Extracting {len(unique_timecodes)} unique frames for tags")
+        if os.getenv("FRAME_CACHE_PRECOMPUTE", "true").lower() in {"0", "false", "no"}:
+            return
+        timecodes = collect_risk_timecodes(risk_data)
+        if not timecodes:
+            return
 
-        # フレームを抽出
-        for item in unique_timecodes:
-            timecode = item["timecode"]
-            tag = item["tag"]
-            sub_tag = item["sub_tag"]
+        self.logger.info(
+            "Precomputing %d annotated frames in background for project %s", len(timecodes), project_id
+        )
+        task = asyncio.create_task(precompute_annotated_frames(video_path, workspace_dir, timecodes))
+        self._background_tasks.add(task)
+
+        def finished(done: asyncio.Task) -> None:
+            self._background_tasks.discard(done)
+            if done.cancelled():
+                return
+            if done.exception() is not None:
+                self.logger.warning(
+                    "Annotated frame precompute failed for project %s: %s", project_id, done.exception()
+                )
+            else:
+                self.logger.info(
+                    "Precomputed %d annotated frames for project %s", done.result(), project_id
+                )
 
-            # タイムコードをファイル名に使える形式に変換 (例: 00:31 -> 00-31)
-            tc_safe = timecode.replace(":", "-")
+        task.add_done_callback(finished)
 
-            # ファイル名を生成
-            if sub_tag:
-                filename = f"{tag}_{sub_tag}_{tc_safe}.jpg"
-            else:
-                filename = f"{tag}_{tc_safe}.jpg"
+    async def _extract_tag_frames(
+        self,
+        project_id: str,
+        workspace_dir: Path,
+        video_path: Path,
+        risk_data: dict
+    ) -> None:
+        """リスクタグのタイムコードからフレームを抽出してサムネイルを保存する."""
 
-            # 安全なファイル名に変換（スペースや特殊文字を置換）
-            filename = filename.replace(" ", "_").replace("/", "_")
+        frames_dir = workspace_dir / "tag_frames"
+        unique_timecodes = collect_tag_timecodes(risk_data)
 
-            output_path = frames_dir / filename
+        self.logger.info(f"Extracting {len(unique_timecodes)} unique frames for tags")
 
-            try:
-                # ffmpegでフレームを抽出
-                subprocess.run(
-                    [
-                        "ffmpeg",
-                        "-ss", timecode,
-                        "-i", str(video_path),
-                        "-vframes", "1",
-                        "-q:v", "2",
-                        "-y",
-                        str(output_path)
-                    ],
-                    check=True,
-                    capture_output=True,
-                    timeout=10
+        # すべてのタイムコードを 1 回のデコードでまとめて抽出する
+        try:
+            extracted, failed = await extract_tag_frames(video_path, frames_dir, unique_timecodes)
+        except MediaJobTimeout:
+            self.logger.error("Timeout extracting tag frames")
+        except MediaJobError as e:
+            self.logger.error(f"Failed to extract tag frames: {e}")
+        else:
+            for item in extracted:
+                self.logger.info(
+                    f"Extracted frame at {item['timecode']} for tag '{item['tag']}' -> {tag_frame_filename(item)}"
                 )
-                self.logger.info(f"Extracted frame at {timecode} for tag '{tag}' -> {filename}")
-            except subprocess.CalledProcessError as e:
-                self.logger.error(f"Failed to extract frame at {timecode}: {e.stderr.decode()}")
-            except subprocess.TimeoutExpired:
-                self.logger.error(f"Timeout extracting frame at {timecode}")
-            except Exception as e:
-                self.logger.error(f"Error extracting frame at {timecode}: {e}")
+            for item in failed:
+                self.logger.error(f"Failed to extract frame at {item['timecode']}")
 
         # フレーム情報をJSONに保存
-        frames_info = {
-            "frames": [
-                {
-                    "timecode": item["timecode"],
-                    "tag": item["tag"],
-                    "sub_tag": item["sub_tag"],
-                    "filename": f"{item['tag']}_{item['sub_tag'] or ''}{('_' if item['sub_tag'] else '')}{item['timecode'].replace(':', '-')}.jpg".replace(" ", "_").replace("/", "_")
-                }
-                for item in unique_timecodes
-            ]
-        }
+        frames_info = build_frames_info(unique_timecodes)
 
         frames_info_path = workspace_dir / "tag_frames_info.json"
         async with aiofiles.open(frames_info_path, "w", encoding="utf-8") as f:
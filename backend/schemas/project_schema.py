@@ -1,11 +1,11 @@
 """FastAPI レスポンス向けのスキーマ定義."""
 
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Union
 
 from pydantic import BaseModel, Field
 
-from backend.store import PROJECT_STEPS, Project
+from backend.store import PROJECT_STEPS, Project, ProjectSummaryRow
 
 
 class Finding(BaseModel):
@@ -79,6 +79,31 @@ class ProjectStatusResponse(BaseModel):
     process_flow: Optional[ProcessFlowState] = None
 
 
+class LogAppend(BaseModel):
+    offset: int
+    lines: List[str]
+
+
+class ProcessFlowNodeStatus(BaseModel):
+    key: str
+    status: str
+
+
+class ProjectStatusDelta(BaseModel):
+    """進捗ストリームで送る差分 (変化したフィールドだけを含む)."""
+
+    status: Optional[str] = None
+    analysis_progress: Optional[float] = None
+    analysis_started_at: Optional[datetime] = None
+    analysis_completed_at: Optional[datetime] = None
+    analysis_duration_seconds: Optional[float] = None
+    current_iteration: Optional[int] = None
+    total_iterations: Optional[int] = None
+    steps: Optional[List[AnalysisStep]] = None
+    logs: Optional[LogAppend] = None
+    process_flow_nodes: Optional[List[ProcessFlowNodeStatus]] = None
+
+
 class FinalReportSections(BaseModel):
     transcription: str
     ocr: str
@@ -190,31 +215,31 @@ PROCESS_FLOW_TEMPLATE = [
         "key": "subtitle",
         "label": "字幕摘出",
         "step": "OCR字幕抽出",
-        "dependencies": ["audio"],
+        "dependencies": ["upload"],
     },
     {
         "key": "visual",
         "label": "映像表現",
         "step": "映像解析",
-        "dependencies": ["subtitle"],
+        "dependencies": ["upload"],
     },
     {
         "key": "risk-a",
         "label": "リスク分析1",
         "step": "リスク統合",
-        "dependencies": ["visual"],
+        "dependencies": ["audio", "subtitle", "visual"],
     },
     {
         "key": "risk-b",
         "label": "リスク分析2",
         "step": "リスク統合",
-        "dependencies": ["visual"],
+        "dependencies": ["audio", "subtitle", "visual"],
     },
     {
         "key": "risk-c",
         "label": "リスク分析3",
         "step": "リスク統合",
-        "dependencies": ["visual"],
+        "dependencies": ["audio", "subtitle", "visual"],
     },
     {
         "key": "risk-merge",
@@ -227,10 +252,16 @@ PROCESS_FLOW_TEMPLATE = [
 
 PROCESS_FLOW_EDGES = [
     {"source": "upload", "target": "audio"},
-    {"source": "audio", "target": "subtitle"},
-    {"source": "subtitle", "target": "visual"},
+    {"source": "upload", "target": "subtitle"},
+    {"source": "upload", "target": "visual"},
+    {"source": "audio", "target": "risk-a"},
+    {"source": "subtitle", "target": "risk-a"},
     {"source": "visual", "target": "risk-a"},
+    {"source": "audio", "target": "risk-b"},
+    {"source": "subtitle", "target": "risk-b"},
     {"source": "visual", "target": "risk-b"},
+    {"source": "audio", "target": "risk-c"},
+    {"source": "subtitle", "target": "risk-c"},
     {"source": "visual", "target": "risk-c"},
     {"source": "risk-a", "target": "risk-merge"},
     {"source": "risk-b", "target": "risk-merge"},
@@ -260,21 +291,7 @@ def build_created_response(project: Project) -> ProjectCreatedResponse:
 def build_status_response(project: Project) -> ProjectStatusResponse:
     """分析状況レスポンスを生成."""
 
-    steps = []
-    for step in PROJECT_STEPS:
-        payload_data = project.payloads.get(step)
-        payload = (
-            AnalysisStepPayload(preview=payload_data.get("preview"))
-            if payload_data
-            else None
-        )
-        steps.append(
-            AnalysisStep(
-                name=step,
-                status=project.step_status.get(step, "pending"),
-                payload=payload,
-            )
-        )
+    steps = [_build_step(project, step) for step in PROJECT_STEPS]
 
     return ProjectStatusResponse(
         id=project.id,
@@ -297,6 +314,82 @@ def build_status_response(project: Project) -> ProjectStatusResponse:
     )
 
 
+def _build_step(project: Project, step: str) -> AnalysisStep:
+    payload_data = project.payloads.get(step)
+    payload = (
+        AnalysisStepPayload(preview=payload_data.get("preview"))
+        if payload_data
+        else None
+    )
+    return AnalysisStep(
+        name=step,
+        status=project.step_status.get(step, "pending"),
+        payload=payload,
+    )
+
+
+STATUS_DELTA_FIELDS = (
+    "status",
+    "analysis_progress",
+    "analysis_started_at",
+    "analysis_completed_at",
+    "analysis_duration_seconds",
+    "current_iteration",
+    "total_iterations",
+)
+# プロセスフローの各ノード状態を決める入力
+_PROCESS_FLOW_INPUTS = (
+    "status",
+    "step_status",
+    "current_iteration",
+    "total_iterations",
+    "analysis_started",
+)
+
+
+def build_status_delta(previous: Project, current: Project) -> Optional[ProjectStatusDelta]:
+    """2 つのスナップショットの差分を返す (変化が無ければ None)."""
+
+    changes: Dict[str, Any] = {
+        name: getattr(current, name)
+        for name in STATUS_DELTA_FIELDS
+        if getattr(previous, name) != getattr(current, name)
+    }
+
+    changed_steps = [
+        _build_step(current, step)
+        for step in PROJECT_STEPS
+        if previous.step_status.get(step) != current.step_status.get(step)
+        or (previous.payloads.get(step) or {}).get("preview")
+        != (current.payloads.get(step) or {}).get("preview")
+    ]
+    if changed_steps:
+        changes["steps"] = changed_steps
+
+    previous_logs, current_logs = previous.logs, current.logs
+    if tuple(current_logs[: len(previous_logs)]) == tuple(previous_logs):
+        if len(current_logs) > len(previous_logs):
+            changes["logs"] = LogAppend(
+                offset=len(previous_logs), lines=list(current_logs[len(previous_logs):])
+            )
+    else:
+        changes["logs"] = LogAppend(offset=0, lines=list(current_logs))
+
+    if any(getattr(previous, name) != getattr(current, name) for name in _PROCESS_FLOW_INPUTS):
+        previous_nodes = {node.key: node.status for node in _build_process_flow(previous).nodes}
+        changed_nodes = [
+            ProcessFlowNodeStatus(key=node.key, status=node.status)
+            for node in _build_process_flow(current).nodes
+            if previous_nodes.get(node.key) != node.status
+        ]
+        if changed_nodes:
+            changes["process_flow_nodes"] = changed_nodes
+
+    if not changes:
+        return None
+    return ProjectStatusDelta(**changes)
+
+
 def build_report_response(project: Project) -> ProjectReportResponse:
     """最終レポートレスポンスを生成."""
 
@@ -315,7 +408,9 @@ def build_report_response(project: Project) -> ProjectReportResponse:
     )
 
 
-def build_project_summaries(projects: List[Project]) -> List[ProjectSummary]:
+def build_project_summaries(
+    projects: Sequence[Union[Project, ProjectSummaryRow]],
+) -> List[ProjectSummary]:
     summaries: List[ProjectSummary] = []
     for project in projects:
         summaries.append(
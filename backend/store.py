@@ -1,17 +1,30 @@
-"""プロジェクトの進行状態を保持するインメモリストア."""
+"""プロジェクトの進行状態を保持するストア (インメモリ / SQLite)."""
 
 from __future__ import annotations
 
 import asyncio
+import base64
+import binascii
 import copy
 import json
+import os
 import shutil
-from dataclasses import dataclass, field
+import socket
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
 from datetime import UTC, datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Sequence
 
 PROJECT_STEPS = ["音声文字起こし", "OCR字幕抽出", "映像解析", "リスク統合"]
+# 分析を実行中のワーカーが担当を主張できる秒数 (この 1/3 ごとに延長する)
+DEFAULT_PIPELINE_LEASE_SECONDS = 90.0
+# SQLite ストアがワーカーごとに保持するスナップショットの件数
+DEFAULT_SNAPSHOT_CACHE_SIZE = 64
 
 
 def _default_step_status() -> Dict[str, str]:
@@ -20,7 +33,12 @@ def _default_step_status() -> Dict[str, str]:
 
 @dataclass
 class Project:
-    """単一プロジェクトの状態モデル."""
+    """単一プロジェクトの状態モデル.
+
+    ストアが返す Project は共有のスナップショットで、logs はタプル、
+    step_status / payloads は読み取り専用のマッピングになっている。
+    変更したい場合は ProjectStore.get_project_for_update で複製を取得する。
+    """
 
     id: str
     company_name: str
@@ -34,9 +52,9 @@ class Project:
     created_at: datetime = field(default_factory=lambda: datetime.now(UTC))
     status: str = "created"
     analysis_progress: float = 0.0
-    logs: list[str] = field(default_factory=list)
-    payloads: Dict[str, Dict[str, Any]] = field(default_factory=dict)
-    step_status: Dict[str, str] = field(default_factory=_default_step_status)
+    logs: Sequence[str] = field(default_factory=list)
+    payloads: Mapping[str, Mapping[str, Any]] = field(default_factory=dict)
+    step_status: Mapping[str, str] = field(default_factory=_default_step_status)
     final_report: Optional[Dict[str, Any]] = None
     analysis_started: bool = False
     last_updated: datetime = field(default_factory=lambda: datetime.now(UTC))
@@ -47,6 +65,162 @@ class Project:
     current_iteration: int = 0
 
 
+def _read_only(*args: Any, **kwargs: Any) -> None:
+    raise TypeError("project snapshots are read-only; use get_project_for_update")
+
+
+class _FrozenDict(dict):
+    """変更操作を禁じた dict (JSON 化や isinstance(..., dict) はそのまま通る).
+
+    copy / deepcopy すると通常の dict として複製される。
+    """
+
+    __setitem__ = __delitem__ = __ior__ = _read_only  # type: ignore[assignment]
+    clear = pop = popitem = setdefault = update = _read_only  # type: ignore[assignment]
+
+    def __copy__(self) -> Dict[Any, Any]:
+        return dict(self)
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> Dict[Any, Any]:
+        return {key: copy.deepcopy(value, memo) for key, value in self.items()}
+
+
+class _FrozenList(list):
+    """変更操作を禁じた list. copy / deepcopy すると通常の list として複製される."""
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only  # type: ignore[assignment]
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only  # type: ignore[assignment]
+
+    def __copy__(self) -> List[Any]:
+        return list(self)
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> List[Any]:
+        return [copy.deepcopy(value, memo) for value in self]
+
+
+def _deep_freeze(value: Any) -> Any:
+    """dict / list を入れ子まで読み取り専用に置き換える (凍結済みの部分はそのまま共有する)."""
+
+    if isinstance(value, (_FrozenDict, _FrozenList)):
+        return value
+    if isinstance(value, Mapping):
+        return _FrozenDict((key, _deep_freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return _FrozenList(_deep_freeze(item) for item in value)
+    if isinstance(value, tuple):
+        return tuple(_deep_freeze(item) for item in value)
+    return value
+
+
+def _freeze_payloads(payloads: Mapping[str, Mapping[str, Any]]) -> Mapping[str, Mapping[str, Any]]:
+    return MappingProxyType(
+        {
+            step: MappingProxyType({key: _deep_freeze(item) for key, item in payload.items()})
+            for step, payload in payloads.items()
+        }
+    )
+
+
+def _freeze(project: Project, **changes: Any) -> Project:
+    """changes を反映した読み取り専用スナップショットを作る.
+
+    payloads と final_report は入れ子まで凍結する。凍結済みの値 (前のスナップショットから
+    引き継いだステップ結果やレポート) は複製せずに共有するため、状態更新のコストは
+    変更した部分の大きさにしか依存しない。
+    """
+
+    frozen = replace(project, **changes)
+    if not isinstance(frozen.logs, tuple):
+        frozen.logs = tuple(frozen.logs)
+    if not isinstance(frozen.step_status, MappingProxyType):
+        frozen.step_status = MappingProxyType(dict(frozen.step_status))
+    if not isinstance(frozen.payloads, MappingProxyType):
+        frozen.payloads = _freeze_payloads(frozen.payloads)
+    frozen.final_report = _deep_freeze(frozen.final_report)
+    return frozen
+
+
+def _thaw(project: Project) -> Project:
+    """スナップショットから呼び出し側が自由に変更できる複製を作る."""
+
+    return replace(
+        project,
+        logs=list(project.logs),
+        payloads={step: copy.deepcopy(dict(payload)) for step, payload in project.payloads.items()},
+        step_status=dict(project.step_status),
+        final_report=copy.deepcopy(project.final_report),
+    )
+
+
+@dataclass(frozen=True)
+class ProjectSummaryRow:
+    """一覧表示用に必要な列だけを持つプロジェクトの射影."""
+
+    id: str
+    company_name: str
+    product_name: str
+    title: str
+    model: str
+    media_type: str
+    status: str
+    analysis_progress: float
+    created_at: datetime
+    last_updated: datetime
+
+
+@dataclass(frozen=True)
+class ProjectPage:
+    """list_project_summaries の結果 (next_cursor が None なら最終ページ)."""
+
+    items: List[ProjectSummaryRow]
+    next_cursor: Optional[str] = None
+
+
+# 一覧の並び替えキー -> Project の属性名 (SQLite の列名と同じ)
+PROJECT_SORT_FIELDS = {"updated": "last_updated", "created": "created_at"}
+
+
+class InvalidCursorError(ValueError):
+    """ページングカーソルが不正、または並び順と一致しない場合のエラー."""
+
+
+def _encode_cursor(sort: str, descending: bool, value: float, project_id: str) -> str:
+    raw = json.dumps([sort, descending, value, project_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str, sort: str, descending: bool) -> tuple[float, str]:
+    try:
+        cursor_sort, cursor_descending, value, project_id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode("ascii"))
+        )
+    except (binascii.Error, UnicodeError, ValueError, TypeError) as exc:
+        raise InvalidCursorError(cursor) from exc
+    if cursor_sort != sort or cursor_descending != descending:
+        raise InvalidCursorError(cursor)
+    return float(value), str(project_id)
+
+
+def _sort_field(sort: str) -> str:
+    try:
+        return PROJECT_SORT_FIELDS[sort]
+    except KeyError:
+        raise ValueError(f"Unknown sort key: {sort}") from None
+
+
+def _build_page(
+    rows: List[ProjectSummaryRow], limit: Optional[int], sort: str, descending: bool
+) -> ProjectPage:
+    """limit + 1 件まで取得した rows からページと次のカーソルを作る."""
+
+    if limit is None or len(rows) <= limit:
+        return ProjectPage(items=rows)
+    items = rows[:limit]
+    last = items[-1]
+    value = getattr(last, _sort_field(sort)).timestamp()
+    return ProjectPage(items=items, next_cursor=_encode_cursor(sort, descending, value, last.id))
+
+
 class ProjectNotFoundError(KeyError):
     """指定 ID のプロジェクトが存在しない場合のエラー."""
 
@@ -56,11 +230,65 @@ class PipelineAlreadyRunningError(RuntimeError):
 
 
 class ProjectStore:
-    """インメモリなプロジェクトストア."""
+    """インメモリなプロジェクトストア.
+
+    保持する Project は更新のたびに差し替える (コピーオンライト) ため、
+    読み出しはスナップショットをそのまま返し、複製しない。
+    """
 
     def __init__(self) -> None:
         self._db: Dict[str, Project] = {}
         self._lock = asyncio.Lock()
+        # 並列実行中のステップ数 (project_id -> step -> 実行中の件数)
+        self._in_flight: Dict[str, Dict[str, int]] = {}
+        # 変更通知の購読者 (project_id -> Event の集合)
+        self._subscribers: Dict[str, set[asyncio.Event]] = {}
+        self.lease_seconds = DEFAULT_PIPELINE_LEASE_SECONDS
+
+    def subscribe(self, project_id: str) -> asyncio.Event:
+        """プロジェクトが更新されるたびに set される Event を返す.
+
+        受け取った側は clear してから最新のスナップショットを取得する。
+        不要になったら unsubscribe すること。
+        """
+
+        event = asyncio.Event()
+        self._subscribers.setdefault(project_id, set()).add(event)
+        return event
+
+    def unsubscribe(self, project_id: str, event: asyncio.Event) -> None:
+        subscribers = self._subscribers.get(project_id)
+        if subscribers is None:
+            return
+        subscribers.discard(event)
+        if not subscribers:
+            self._subscribers.pop(project_id, None)
+
+    def _notify(self, project_id: Optional[str] = None) -> None:
+        """購読者を起こす (project_id が None なら全購読者)."""
+
+        if project_id is None:
+            targets = [event for events in self._subscribers.values() for event in events]
+        else:
+            targets = list(self._subscribers.get(project_id, ()))
+        for event in targets:
+            event.set()
+
+    def _require(self, project_id: str) -> Project:
+        project = self._db.get(project_id)
+        if project is None:
+            raise ProjectNotFoundError(project_id)
+        return project
+
+    def _publish(self, project: Project, *, log: Optional[str] = None, **changes: Any) -> Project:
+        """変更を反映した新しいスナップショットを保存して返す (ロック内で呼ぶ)."""
+
+        if log is not None:
+            changes["logs"] = (*project.logs, log)
+        updated = _freeze(project, **changes)
+        self._db[project.id] = updated
+        self._notify(project.id)
+        return updated
 
     async def create_project(
         self,
@@ -88,59 +316,71 @@ class ProjectStore:
             model=model,
             media_type=media_type,
         )
-        project.logs.append("プロジェクト作成")
 
         async with self._lock:
-            self._db[project_id] = project
-            return copy.deepcopy(project)
+            self._in_flight.pop(project_id, None)
+            return self._publish(project, log="プロジェクト作成")
 
     async def get_project(self, project_id: str) -> Project:
-        """ID からプロジェクトを取得する."""
+        """ID からプロジェクトのスナップショットを取得する (複製しない)."""
 
         async with self._lock:
-            project = self._db.get(project_id)
-            if project is None:
-                raise ProjectNotFoundError(project_id)
-            return copy.deepcopy(project)
+            return self._require(project_id)
+
+    async def get_project_for_update(self, project_id: str) -> Project:
+        """変更用にプロジェクトの複製を取得する (save で書き戻す)."""
+
+        return _thaw(await self.get_project(project_id))
+
+    async def workspace_dirs(self) -> set[Path]:
+        """登録済みプロジェクトの作業ディレクトリを返す."""
+
+        async with self._lock:
+            return {Path(project.workspace_dir) for project in self._db.values()}
 
     async def mark_pipeline_started(self, project_id: str) -> Project:
         """分析パイプライン開始時のステータス更新."""
 
         async with self._lock:
-            project = self._db.get(project_id)
-            if project is None:
-                raise ProjectNotFoundError(project_id)
+            project = self._require(project_id)
             if project.analysis_started and project.status == "analyzing":
                 raise PipelineAlreadyRunningError(project_id)
 
             now = datetime.now(UTC)
-            project.analysis_started = True
-            project.status = "analyzing"
-            project.analysis_started_at = now
-            project.analysis_completed_at = None
-            project.analysis_duration_seconds = None
-            project.current_iteration = 0
-            project.total_iterations = max(project.total_iterations, 1)
-            project.logs.append("分析パイプライン開始")
-            project.last_updated = now
-            self._db[project_id] = project
-            return copy.deepcopy(project)
+            self._in_flight.pop(project_id, None)
+            return self._publish(
+                project,
+                log="分析パイプライン開始",
+                analysis_started=True,
+                status="analyzing",
+                analysis_started_at=now,
+                analysis_completed_at=None,
+                analysis_duration_seconds=None,
+                current_iteration=0,
+                total_iterations=max(project.total_iterations, 1),
+                last_updated=now,
+            )
 
     async def mark_step_running(self, project_id: str, step: str) -> Project:
-        """個別ステップの処理開始を記録."""
+        """個別ステップの処理開始を記録.
+
+        同じステップが並列に複数回実行される場合に備えて実行中の件数を数え、
+        最後の 1 件が完了するまで ``running`` を維持する。
+        """
 
         if step not in PROJECT_STEPS:
             raise ValueError(f"Unknown step: {step}")
 
         async with self._lock:
-            project = self._db.get(project_id)
-            if project is None:
-                raise ProjectNotFoundError(project_id)
-            project.step_status[step] = "running"
-            project.logs.append(f"{step} 開始")
-            project.last_updated = datetime.now(UTC)
-            self._db[project_id] = project
-            return copy.deepcopy(project)
+            project = self._require(project_id)
+            in_flight = self._in_flight.setdefault(project_id, {})
+            in_flight[step] = in_flight.get(step, 0) + 1
+            return self._publish(
+                project,
+                log=f"{step} 開始",
+                step_status={**project.step_status, step: "running"},
+                last_updated=datetime.now(UTC),
+            )
 
     async def update_status(
         self,
@@ -155,20 +395,42 @@ class ProjectStore:
             raise ValueError(f"Unknown step: {step}")
 
         async with self._lock:
-            project = self._db.get(project_id)
-            if project is None:
-                raise ProjectNotFoundError(project_id)
+            project = self._require(project_id)
+
+            in_flight = self._in_flight.get(project_id, {})
+            remaining = max(in_flight.get(step, 0) - 1, 0)
+            in_flight[step] = remaining
+            step_status = {**project.step_status, step: "running" if remaining else "completed"}
+            return self._publish(
+                project,
+                log=f"{step} 完了",
+                step_status=step_status,
+                payloads={**project.payloads, step: {"preview": preview[:300], "data": data}},
+                analysis_progress=self._calculate_progress(step_status),
+                last_updated=datetime.now(UTC),
+            )
+
+    async def update_step_payloads(
+        self, project_id: str, step_payloads: Mapping[str, Mapping[str, Any]]
+    ) -> Project:
+        """集約後のステップデータで payloads を差し替え、各ステップを完了扱いにする."""
 
-            project.step_status[step] = "completed"
-            project.logs.append(f"{step} 完了")
-            project.payloads[step] = {
-                "preview": preview[:300],
-                "data": data,
-            }
-            project.analysis_progress = self._calculate_progress(project)
-            project.last_updated = datetime.now(UTC)
-            self._db[project_id] = project
-            return copy.deepcopy(project)
+        async with self._lock:
+            project = self._require(project_id)
+            payloads = dict(project.payloads)
+            step_status = dict(project.step_status)
+            for step, payload in step_payloads.items():
+                payloads[step] = {
+                    "preview": str(payload.get("preview") or "")[:300],
+                    "data": payload.get("data"),
+                }
+                step_status[step] = "completed"
+            return self._publish(
+                project,
+                payloads=payloads,
+                step_status=step_status,
+                last_updated=datetime.now(UTC),
+            )
 
     async def update_iteration_state(
         self,
@@ -180,14 +442,13 @@ class ProjectStore:
         """現在の繰り返し回数を更新する."""
 
         async with self._lock:
-            project = self._db.get(project_id)
-            if project is None:
-                raise ProjectNotFoundError(project_id)
-            project.current_iteration = current_iteration
-            project.total_iterations = max(total_iterations, 1)
-            project.last_updated = datetime.now(UTC)
-            self._db[project_id] = project
-            return copy.deepcopy(project)
+            project = self._require(project_id)
+            return self._publish(
+                project,
+                current_iteration=current_iteration,
+                total_iterations=max(total_iterations, 1),
+                last_updated=datetime.now(UTC),
+            )
 
     async def mark_pipeline_completed(
         self, project_id: str, final_report: Dict[str, Any]
@@ -195,58 +456,74 @@ class ProjectStore:
         """パイプライン完了時の状態更新."""
 
         async with self._lock:
-            project = self._db.get(project_id)
-            if project is None:
-                raise ProjectNotFoundError(project_id)
+            project = self._require(project_id)
 
             completed_at = datetime.now(UTC)
-            project.status = "completed"
-            project.analysis_progress = 1.0
-            project.final_report = final_report
-            project.logs.append("分析パイプライン完了")
-            project.analysis_completed_at = completed_at
-            project.current_iteration = project.total_iterations
             if project.analysis_started_at:
                 duration = (completed_at - project.analysis_started_at).total_seconds()
-                project.analysis_duration_seconds = max(duration, 0.0)
+                duration_seconds: Optional[float] = max(duration, 0.0)
             else:
-                project.analysis_duration_seconds = None
-            project.last_updated = completed_at
-            self._db[project_id] = project
+                duration_seconds = None
+            self._in_flight.pop(project_id, None)
+            project = self._publish(
+                project,
+                log="分析パイプライン完了",
+                status="completed",
+                analysis_progress=1.0,
+                final_report=final_report,
+                analysis_completed_at=completed_at,
+                current_iteration=project.total_iterations,
+                analysis_duration_seconds=duration_seconds,
+                last_updated=completed_at,
+            )
 
             # 分析完了後、admin_archiveに自動複製
             await self._archive_project(project)
 
-            return copy.deepcopy(project)
+            return project
 
     async def save(self, project: Project) -> Project:
-        """互換性のための save メソッド."""
+        """互換性のための save メソッド (get_project_for_update で取得した複製を書き戻す)."""
 
         async with self._lock:
-            if project.id not in self._db:
-                raise ProjectNotFoundError(project.id)
-            project.last_updated = datetime.now(UTC)
-            self._db[project.id] = project
-            return copy.deepcopy(project)
+            self._require(project.id)
+            return self._publish(_thaw(project), last_updated=datetime.now(UTC))
 
     async def mark_pipeline_failed(self, project_id: str, reason: str) -> Project:
         """パイプライン失敗時の状態更新."""
 
         async with self._lock:
-            project = self._db.get(project_id)
-            if project is None:
-                raise ProjectNotFoundError(project_id)
+            project = self._require(project_id)
 
             now = datetime.now(UTC)
-            project.status = "failed"
-            project.logs.append(f"分析パイプライン失敗: {reason}")
-            project.analysis_completed_at = now
+            changes: Dict[str, Any] = {
+                "status": "failed",
+                "analysis_completed_at": now,
+                "last_updated": now,
+            }
             if project.analysis_started_at:
                 duration = (now - project.analysis_started_at).total_seconds()
-                project.analysis_duration_seconds = max(duration, 0.0)
-            project.last_updated = now
-            self._db[project_id] = project
-            return copy.deepcopy(project)
+                changes["analysis_duration_seconds"] = max(duration, 0.0)
+            self._in_flight.pop(project_id, None)
+            return self._publish(project, log=f"分析パイプライン失敗: {reason}", **changes)
+
+    async def renew_pipeline_leases(self) -> int:
+        """このプロセスが実行中の分析の担当期限を延ばし、延長した件数を返す.
+
+        インメモリのストアは他のプロセスと共有しないため、延長するものは無い。
+        """
+
+        return 0
+
+    async def fail_interrupted_pipelines(self, reason: str) -> List[str]:
+        """担当していたワーカーが止まって analyzing のまま残った案件を失敗扱いにする.
+
+        起動時と定期的なハートビートで呼ぶ。UI がいつまでも進捗をポーリングし続けない
+        ようにするため。失敗扱いにした案件の ID を返す。
+        インメモリのストアはプロセスと寿命が同じで、止まったワーカーの案件は残らない。
+        """
+
+        return []
 
     async def list_projects(self) -> List[Project]:
         """全プロジェクトを最新更新日時順に取得."""
@@ -254,7 +531,61 @@ class ProjectStore:
         async with self._lock:
             projects = list(self._db.values())
         projects.sort(key=lambda proj: proj.last_updated, reverse=True)
-        return [copy.deepcopy(project) for project in projects]
+        return projects
+
+    async def list_project_summaries(
+        self,
+        *,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        status: Optional[str] = None,
+        company_name: Optional[str] = None,
+        sort: str = "updated",
+        descending: bool = True,
+    ) -> ProjectPage:
+        """一覧表示用の列だけをページ単位で返す.
+
+        cursor には前ページの next_cursor を渡す (キーセットページング)。
+        """
+
+        attribute = _sort_field(sort)
+        after = _decode_cursor(cursor, sort, descending) if cursor else None
+        async with self._lock:
+            projects = [
+                project
+                for project in self._db.values()
+                if (status is None or project.status == status)
+                and (company_name is None or project.company_name == company_name)
+            ]
+
+        def sort_key(project: Project) -> tuple[float, str]:
+            return getattr(project, attribute).timestamp(), project.id
+
+        projects.sort(key=sort_key, reverse=descending)
+        if after is not None:
+            projects = [
+                project
+                for project in projects
+                if (sort_key(project) < after if descending else sort_key(project) > after)
+            ]
+        if limit is not None:
+            projects = projects[: limit + 1]
+        rows = [
+            ProjectSummaryRow(
+                id=project.id,
+                company_name=project.company_name,
+                product_name=project.product_name,
+                title=project.title,
+                model=project.model,
+                media_type=project.media_type,
+                status=project.status,
+                analysis_progress=project.analysis_progress,
+                created_at=project.created_at,
+                last_updated=project.last_updated,
+            )
+            for project in projects
+        ]
+        return _build_page(rows, limit, sort, descending)
 
     def _sanitize_component(self, value: str, default: str) -> str:
         """ファイル名の安全なコンポーネントを生成する（日本語保持）."""
@@ -369,9 +700,12 @@ class ProjectStore:
             if project_id not in self._db:
                 raise ProjectNotFoundError(project_id)
             del self._db[project_id]
+            self._in_flight.pop(project_id, None)
+            self._notify(project_id)
 
-    def _calculate_progress(self, project: Project) -> float:
-        completed = sum(1 for status in project.step_status.values() if status == "completed")
+    @staticmethod
+    def _calculate_progress(step_status: Mapping[str, str]) -> float:
+        completed = sum(1 for status in step_status.values() if status == "completed")
         return completed / len(PROJECT_STEPS)
 
     async def reset(self) -> None:
@@ -379,3 +713,858 @@ class ProjectStore:
 
         async with self._lock:
             self._db.clear()
+            self._in_flight.clear()
+            self._notify()
+
+
+def _to_timestamp(value: Optional[datetime]) -> Optional[float]:
+    return value.timestamp() if value is not None else None
+
+
+def _from_timestamp(value: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(value, UTC) if value is not None else None
+
+
+def _dump_json(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+class SQLiteProjectStore(ProjectStore):
+    """SQLite (WAL モード) に永続化するプロジェクトストア.
+
+    API は ProjectStore と同じ。ステップ状態・ペイロード・ログ・最終レポートは
+    別テーブルの行として持ち、状態更新のたびに案件全体を書き直さない。
+    同じ DB ファイルを複数の uvicorn ワーカーから共有できる。
+    分析を開始したワーカーは lease_owner / lease_expires で担当を記録して定期的に延長し、
+    期限の切れた案件 (止まったワーカーのもの) だけが失敗扱いになる。
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS projects (
+            id TEXT PRIMARY KEY,
+            company_name TEXT NOT NULL,
+            product_name TEXT NOT NULL,
+            title TEXT NOT NULL,
+            video_path TEXT NOT NULL,
+            file_name TEXT NOT NULL,
+            workspace_dir TEXT NOT NULL,
+            model TEXT NOT NULL,
+            media_type TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            status TEXT NOT NULL,
+            analysis_progress REAL NOT NULL DEFAULT 0,
+            analysis_started INTEGER NOT NULL DEFAULT 0,
+            last_updated REAL NOT NULL,
+            analysis_started_at REAL,
+            analysis_completed_at REAL,
+            analysis_duration_seconds REAL,
+            total_iterations INTEGER NOT NULL DEFAULT 1,
+            current_iteration INTEGER NOT NULL DEFAULT 0,
+            version INTEGER NOT NULL DEFAULT 0,
+            lease_owner TEXT,
+            lease_expires REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_projects_updated ON projects (last_updated, id);
+        CREATE INDEX IF NOT EXISTS idx_projects_created ON projects (created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_projects_status_updated
+            ON projects (status, last_updated, id);
+        CREATE INDEX IF NOT EXISTS idx_projects_status_created
+            ON projects (status, created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_projects_company_updated
+            ON projects (company_name, last_updated, id);
+        CREATE INDEX IF NOT EXISTS idx_projects_company_created
+            ON projects (company_name, created_at, id);
+        CREATE TABLE IF NOT EXISTS project_steps (
+            project_id TEXT NOT NULL REFERENCES projects (id) ON DELETE CASCADE,
+            step TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            in_flight INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (project_id, step)
+        );
+        CREATE TABLE IF NOT EXISTS project_payloads (
+            project_id TEXT NOT NULL REFERENCES projects (id) ON DELETE CASCADE,
+            step TEXT NOT NULL,
+            preview TEXT NOT NULL,
+            data TEXT,
+            PRIMARY KEY (project_id, step)
+        );
+        CREATE TABLE IF NOT EXISTS project_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            project_id TEXT NOT NULL REFERENCES projects (id) ON DELETE CASCADE,
+            message TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_project_logs_project_id ON project_logs (project_id, id);
+        CREATE TABLE IF NOT EXISTS project_reports (
+            project_id TEXT PRIMARY KEY REFERENCES projects (id) ON DELETE CASCADE,
+            report TEXT NOT NULL
+        );
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        *,
+        lease_seconds: float = DEFAULT_PIPELINE_LEASE_SECONDS,
+        snapshot_cache_size: int = DEFAULT_SNAPSHOT_CACHE_SIZE,
+    ) -> None:
+        super().__init__()
+        self.db_path = Path(db_path)
+        self.lease_seconds = lease_seconds
+        # 分析の担当者としてこのストア (= ワーカープロセス) を識別する値
+        self.owner_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        # project_id -> ((version, created_at), スナップショット). 最近使った順の LRU
+        self._snapshots: OrderedDict[str, tuple[tuple[int, float], Project]] = OrderedDict()
+        self._snapshot_cache_size = max(0, snapshot_cache_size)
+        self._snapshots_lock = threading.Lock()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(self._SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """スレッドごとの接続を返す (asyncio.to_thread のワーカースレッドで使い回す)."""
+
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _transaction(self, fn, *args, write: bool):
+        conn = self._connection()
+        # 書き込みは BEGIN IMMEDIATE で最初に書き込みロックを取り、
+        # 他ワーカーとの読み取り→更新の競合を防ぐ
+        conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            result = fn(conn, *args)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    async def _write(self, fn, *args):
+        result = await asyncio.to_thread(self._transaction, fn, *args, write=True)
+        if isinstance(result, Project):
+            self._notify(result.id)
+        return result
+
+    async def _read(self, fn, *args):
+        return await asyncio.to_thread(self._transaction, fn, *args, write=False)
+
+    def close(self) -> None:
+        """開いている全接続を閉じる."""
+
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    # --- 行 <-> Project の変換 -------------------------------------------------
+
+    @staticmethod
+    def _build_project(
+        row: sqlite3.Row,
+        steps: Dict[str, str],
+        payloads: Dict[str, Dict[str, Any]],
+        logs: List[str],
+        report: Optional[Dict[str, Any]],
+    ) -> Project:
+        step_status = _default_step_status()
+        step_status.update(steps)
+        return _freeze(Project(
+            id=row["id"],
+            company_name=row["company_name"],
+            product_name=row["product_name"],
+            title=row["title"],
+            video_path=Path(row["video_path"]),
+            file_name=row["file_name"],
+            workspace_dir=Path(row["workspace_dir"]),
+            model=row["model"],
+            media_type=row["media_type"],
+            created_at=_from_timestamp(row["created_at"]),
+            status=row["status"],
+            analysis_progress=row["analysis_progress"],
+            logs=logs,
+            payloads=payloads,
+            step_status=step_status,
+            final_report=report,
+            analysis_started=bool(row["analysis_started"]),
+            last_updated=_from_timestamp(row["last_updated"]),
+            analysis_started_at=_from_timestamp(row["analysis_started_at"]),
+            analysis_completed_at=_from_timestamp(row["analysis_completed_at"]),
+            analysis_duration_seconds=row["analysis_duration_seconds"],
+            total_iterations=row["total_iterations"],
+            current_iteration=row["current_iteration"],
+        ))
+
+    def _load_project(
+        self, conn: sqlite3.Connection, project_id: str, *, remember: bool = True
+    ) -> Project:
+        """案件を読み込む (remember が True ならスナップショットとして保持する)."""
+
+        row = conn.execute("SELECT * FROM projects WHERE id = ?", (project_id,)).fetchone()
+        if row is None:
+            raise ProjectNotFoundError(project_id)
+        steps = {
+            step_row["step"]: step_row["status"]
+            for step_row in conn.execute(
+                "SELECT step, status FROM project_steps WHERE project_id = ?", (project_id,)
+            )
+        }
+        payloads = {
+            payload_row["step"]: {
+                "preview": payload_row["preview"],
+                "data": json.loads(payload_row["data"]) if payload_row["data"] is not None else None,
+            }
+            for payload_row in conn.execute(
+                "SELECT step, preview, data FROM project_payloads WHERE project_id = ?",
+                (project_id,),
+            )
+        }
+        logs = [
+            log_row["message"]
+            for log_row in conn.execute(
+                "SELECT message FROM project_logs WHERE project_id = ? ORDER BY id", (project_id,)
+            )
+        ]
+        report_row = conn.execute(
+            "SELECT report FROM project_reports WHERE project_id = ?", (project_id,)
+        ).fetchone()
+        report = json.loads(report_row["report"]) if report_row is not None else None
+        project = self._build_project(row, steps, payloads, logs, report)
+        if remember:
+            self._remember(row, project)
+        return project
+
+    def _remember(self, row: sqlite3.Row, project: Project) -> None:
+        """スナップショットを保持し、上限を超えたら最も長く使っていないものから捨てる."""
+
+        with self._snapshots_lock:
+            self._snapshots[row["id"]] = ((row["version"], row["created_at"]), project)
+            self._snapshots.move_to_end(row["id"])
+            while len(self._snapshots) > self._snapshot_cache_size:
+                self._snapshots.popitem(last=False)
+
+    def _cached_snapshot(self, project_id: str, version: tuple[int, float]) -> Optional[Project]:
+        """DB 上の版と一致するスナップショットがあれば返す."""
+
+        with self._snapshots_lock:
+            cached = self._snapshots.get(project_id)
+            if cached is None or cached[0] != version:
+                return None
+            self._snapshots.move_to_end(project_id)
+        return cached[1]
+
+    @staticmethod
+    def _require_project(conn: sqlite3.Connection, project_id: str) -> sqlite3.Row:
+        row = conn.execute(
+            """
+            SELECT status, analysis_started, analysis_started_at, lease_expires
+            FROM projects WHERE id = ?
+            """,
+            (project_id,),
+        ).fetchone()
+        if row is None:
+            raise ProjectNotFoundError(project_id)
+        return row
+
+    @staticmethod
+    def _append_log(conn: sqlite3.Connection, project_id: str, message: str, now: datetime) -> None:
+        conn.execute(
+            "INSERT INTO project_logs (project_id, message, created_at) VALUES (?, ?, ?)",
+            (project_id, message, now.timestamp()),
+        )
+
+    @staticmethod
+    def _update_fields(conn: sqlite3.Connection, project_id: str, **fields: Any) -> None:
+        """projects の列を更新し、スナップショットの版を進める."""
+
+        assignments = "".join(f"{name} = ?, " for name in fields)
+        conn.execute(
+            f"UPDATE projects SET {assignments}version = version + 1 WHERE id = ?",  # noqa: S608
+            (*fields.values(), project_id),
+        )
+
+    @staticmethod
+    def _delete_rows(conn: sqlite3.Connection, project_id: str) -> None:
+        conn.execute("DELETE FROM projects WHERE id = ?", (project_id,))
+
+    # --- ProjectStore API -------------------------------------------------------
+
+    async def create_project(
+        self,
+        *,
+        project_id: str,
+        company_name: str,
+        product_name: str,
+        title: str,
+        video_path: Path,
+        file_name: str,
+        workspace_dir: Path,
+        model: str,
+        media_type: str,
+    ) -> Project:
+        """新規プロジェクトを登録する."""
+
+        project = Project(
+            id=project_id,
+            company_name=company_name,
+            product_name=product_name,
+            title=title,
+            video_path=video_path,
+            file_name=file_name,
+            workspace_dir=workspace_dir,
+            model=model,
+            media_type=media_type,
+        )
+
+        def create(conn: sqlite3.Connection) -> Project:
+            self._delete_rows(conn, project_id)
+            conn.execute(
+                """
+                INSERT INTO projects (
+                    id, company_name, product_name, title, video_path, file_name,
+                    workspace_dir, model, media_type, created_at, status, last_updated,
+                    total_iterations, current_iteration
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    project.id,
+                    project.company_name,
+                    project.product_name,
+                    project.title,
+                    str(project.video_path),
+                    project.file_name,
+                    str(project.workspace_dir),
+                    project.model,
+                    project.media_type,
+                    project.created_at.timestamp(),
+                    project.status,
+                    project.last_updated.timestamp(),
+                    project.total_iterations,
+                    project.current_iteration,
+                ),
+            )
+            conn.executemany(
+                "INSERT INTO project_steps (project_id, step) VALUES (?, ?)",
+                [(project_id, step) for step in PROJECT_STEPS],
+            )
+            self._append_log(conn, project_id, "プロジェクト作成", project.created_at)
+            return self._load_project(conn, project_id)
+
+        return await self._write(create)
+
+    async def get_project(self, project_id: str) -> Project:
+        """ID からプロジェクトを取得する.
+
+        版が変わっていなければキャッシュ済みのスナップショットを返し、
+        ペイロードやレポートの JSON を読み直さない。
+        """
+
+        def load(conn: sqlite3.Connection) -> Project:
+            row = conn.execute(
+                "SELECT version, created_at FROM projects WHERE id = ?", (project_id,)
+            ).fetchone()
+            if row is None:
+                raise ProjectNotFoundError(project_id)
+            cached = self._cached_snapshot(project_id, (row["version"], row["created_at"]))
+            return cached if cached is not None else self._load_project(conn, project_id)
+
+        return await self._read(load)
+
+    async def workspace_dirs(self) -> set[Path]:
+        """登録済みプロジェクトの作業ディレクトリを返す."""
+
+        def select(conn: sqlite3.Connection) -> set[Path]:
+            rows = conn.execute("SELECT workspace_dir FROM projects")
+            return {Path(row["workspace_dir"]) for row in rows}
+
+        return await self._read(select)
+
+    async def mark_pipeline_started(self, project_id: str) -> Project:
+        """分析パイプライン開始時のステータス更新.
+
+        このワーカーを担当として記録する。担当期限の切れた analyzing の案件は再開できる。
+        """
+
+        def start(conn: sqlite3.Connection) -> Project:
+            row = self._require_project(conn, project_id)
+            now = datetime.now(UTC)
+            if (
+                row["analysis_started"]
+                and row["status"] == "analyzing"
+                and (row["lease_expires"] or 0.0) >= now.timestamp()
+            ):
+                raise PipelineAlreadyRunningError(project_id)
+            conn.execute(
+                """
+                UPDATE projects SET
+                    analysis_started = 1, status = 'analyzing', analysis_started_at = ?,
+                    analysis_completed_at = NULL, analysis_duration_seconds = NULL,
+                    current_iteration = 0, total_iterations = MAX(total_iterations, 1),
+                    last_updated = ?, lease_owner = ?, lease_expires = ?,
+                    version = version + 1
+                WHERE id = ?
+                """,
+                (
+                    now.timestamp(),
+                    now.timestamp(),
+                    self.owner_id,
+                    now.timestamp() + self.lease_seconds,
+                    project_id,
+                ),
+            )
+            conn.execute("UPDATE project_steps SET in_flight = 0 WHERE project_id = ?", (project_id,))
+            self._append_log(conn, project_id, "分析パイプライン開始", now)
+            return self._load_project(conn, project_id)
+
+        return await self._write(start)
+
+    async def mark_step_running(self, project_id: str, step: str) -> Project:
+        """個別ステップの処理開始を記録.
+
+        実行中の件数は project_steps.in_flight に持ち、ワーカー間で共有する。
+        """
+
+        if step not in PROJECT_STEPS:
+            raise ValueError(f"Unknown step: {step}")
+
+        def mark(conn: sqlite3.Connection) -> Project:
+            self._require_project(conn, project_id)
+            now = datetime.now(UTC)
+            conn.execute(
+                """
+                INSERT INTO project_steps (project_id, step, status, in_flight)
+                VALUES (?, ?, 'running', 1)
+                ON CONFLICT (project_id, step)
+                DO UPDATE SET status = 'running', in_flight = in_flight + 1
+                """,
+                (project_id, step),
+            )
+            self._append_log(conn, project_id, f"{step} 開始", now)
+            self._update_fields(conn, project_id, last_updated=now.timestamp())
+            return self._load_project(conn, project_id)
+
+        return await self._write(mark)
+
+    async def update_status(
+        self,
+        project_id: str,
+        step: str,
+        preview: str,
+        data: Optional[Any] = None,
+    ) -> Project:
+        """ステップ完了と結果プレビューを記録."""
+
+        if step not in PROJECT_STEPS:
+            raise ValueError(f"Unknown step: {step}")
+
+        def update(conn: sqlite3.Connection) -> Project:
+            self._require_project(conn, project_id)
+            now = datetime.now(UTC)
+            row = conn.execute(
+                "SELECT in_flight FROM project_steps WHERE project_id = ? AND step = ?",
+                (project_id, step),
+            ).fetchone()
+            remaining = max((row["in_flight"] if row else 0) - 1, 0)
+            conn.execute(
+                """
+                INSERT INTO project_steps (project_id, step, status, in_flight)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (project_id, step)
+                DO UPDATE SET status = excluded.status, in_flight = excluded.in_flight
+                """,
+                (project_id, step, "running" if remaining else "completed", remaining),
+            )
+            self._append_log(conn, project_id, f"{step} 完了", now)
+            self._upsert_payload(conn, project_id, step, preview[:300], data)
+            self._update_fields(
+                conn,
+                project_id,
+                analysis_progress=self._progress(conn, project_id),
+                last_updated=now.timestamp(),
+            )
+            return self._load_project(conn, project_id)
+
+        return await self._write(update)
+
+    @staticmethod
+    def _upsert_payload(
+        conn: sqlite3.Connection, project_id: str, step: str, preview: str, data: Any
+    ) -> None:
+        conn.execute(
+            """
+            INSERT INTO project_payloads (project_id, step, preview, data) VALUES (?, ?, ?, ?)
+            ON CONFLICT (project_id, step)
+            DO UPDATE SET preview = excluded.preview, data = excluded.data
+            """,
+            (project_id, step, preview, _dump_json(data) if data is not None else None),
+        )
+
+    @staticmethod
+    def _progress(conn: sqlite3.Connection, project_id: str) -> float:
+        completed = conn.execute(
+            "SELECT COUNT(*) FROM project_steps WHERE project_id = ? AND status = 'completed'",
+            (project_id,),
+        ).fetchone()[0]
+        return completed / len(PROJECT_STEPS)
+
+    async def update_step_payloads(
+        self, project_id: str, step_payloads: Mapping[str, Mapping[str, Any]]
+    ) -> Project:
+        """集約後のステップデータで payloads を差し替え、各ステップを完了扱いにする."""
+
+        def update(conn: sqlite3.Connection) -> Project:
+            self._require_project(conn, project_id)
+            for step, payload in step_payloads.items():
+                self._upsert_payload(
+                    conn,
+                    project_id,
+                    step,
+                    str(payload.get("preview") or "")[:300],
+                    payload.get("data"),
+                )
+                conn.execute(
+                    """
+                    INSERT INTO project_steps (project_id, step, status) VALUES (?, ?, 'completed')
+                    ON CONFLICT (project_id, step) DO UPDATE SET status = 'completed'
+                    """,
+                    (project_id, step),
+                )
+            self._update_fields(conn, project_id, last_updated=datetime.now(UTC).timestamp())
+            return self._load_project(conn, project_id)
+
+        return await self._write(update)
+
+    async def update_iteration_state(
+        self,
+        project_id: str,
+        *,
+        current_iteration: int,
+        total_iterations: int,
+    ) -> Project:
+        """現在の繰り返し回数を更新する."""
+
+        def update(conn: sqlite3.Connection) -> Project:
+            self._require_project(conn, project_id)
+            self._update_fields(
+                conn,
+                project_id,
+                current_iteration=current_iteration,
+                total_iterations=max(total_iterations, 1),
+                last_updated=datetime.now(UTC).timestamp(),
+            )
+            return self._load_project(conn, project_id)
+
+        return await self._write(update)
+
+    async def mark_pipeline_completed(
+        self, project_id: str, final_report: Dict[str, Any]
+    ) -> Project:
+        """パイプライン完了時の状態更新."""
+
+        def complete(conn: sqlite3.Connection) -> Project:
+            row = self._require_project(conn, project_id)
+            completed_at = datetime.now(UTC)
+            started_at = _from_timestamp(row["analysis_started_at"])
+            duration = (
+                max((completed_at - started_at).total_seconds(), 0.0) if started_at else None
+            )
+            conn.execute(
+                """
+                UPDATE projects SET
+                    status = 'completed', analysis_progress = 1.0,
+                    analysis_completed_at = ?, analysis_duration_seconds = ?,
+                    current_iteration = total_iterations, last_updated = ?,
+                    lease_owner = NULL, lease_expires = NULL, version = version + 1
+                WHERE id = ?
+                """,
+                (completed_at.timestamp(), duration, completed_at.timestamp(), project_id),
+            )
+            conn.execute(
+                """
+                INSERT INTO project_reports (project_id, report) VALUES (?, ?)
+                ON CONFLICT (project_id) DO UPDATE SET report = excluded.report
+                """,
+                (project_id, _dump_json(final_report)),
+            )
+            conn.execute("UPDATE project_steps SET in_flight = 0 WHERE project_id = ?", (project_id,))
+            self._append_log(conn, project_id, "分析パイプライン完了", completed_at)
+            return self._load_project(conn, project_id)
+
+        project = await self._write(complete)
+        # 分析完了後、admin_archiveに自動複製
+        await self._archive_project(project)
+        return project
+
+    async def save(self, project: Project) -> Project:
+        """互換性のための save メソッド (Project 全体を書き戻す)."""
+
+        def save(conn: sqlite3.Connection) -> Project:
+            self._require_project(conn, project.id)
+            now = datetime.now(UTC)
+            self._update_fields(
+                conn,
+                project.id,
+                company_name=project.company_name,
+                product_name=project.product_name,
+                title=project.title,
+                video_path=str(project.video_path),
+                file_name=project.file_name,
+                workspace_dir=str(project.workspace_dir),
+                model=project.model,
+                media_type=project.media_type,
+                status=project.status,
+                analysis_progress=project.analysis_progress,
+                analysis_started=int(project.analysis_started),
+                last_updated=now.timestamp(),
+                analysis_started_at=_to_timestamp(project.analysis_started_at),
+                analysis_completed_at=_to_timestamp(project.analysis_completed_at),
+                analysis_duration_seconds=project.analysis_duration_seconds,
+                total_iterations=project.total_iterations,
+                current_iteration=project.current_iteration,
+            )
+            for step, status in project.step_status.items():
+                conn.execute(
+                    """
+                    INSERT INTO project_steps (project_id, step, status) VALUES (?, ?, ?)
+                    ON CONFLICT (project_id, step) DO UPDATE SET status = excluded.status
+                    """,
+                    (project.id, step, status),
+                )
+            conn.execute("DELETE FROM project_payloads WHERE project_id = ?", (project.id,))
+            for step, payload in project.payloads.items():
+                self._upsert_payload(
+                    conn, project.id, step, str(payload.get("preview") or ""), payload.get("data")
+                )
+            # ログは追記のみ想定のため、未保存の末尾だけ書き足す
+            stored_logs = conn.execute(
+                "SELECT COUNT(*) FROM project_logs WHERE project_id = ?", (project.id,)
+            ).fetchone()[0]
+            for message in project.logs[stored_logs:]:
+                self._append_log(conn, project.id, message, now)
+            if project.final_report is not None:
+                conn.execute(
+                    """
+                    INSERT INTO project_reports (project_id, report) VALUES (?, ?)
+                    ON CONFLICT (project_id) DO UPDATE SET report = excluded.report
+                    """,
+                    (project.id, _dump_json(project.final_report)),
+                )
+            else:
+                conn.execute("DELETE FROM project_reports WHERE project_id = ?", (project.id,))
+            return self._load_project(conn, project.id)
+
+        return await self._write(save)
+
+    async def mark_pipeline_failed(self, project_id: str, reason: str) -> Project:
+        """パイプライン失敗時の状態更新."""
+
+        def fail(conn: sqlite3.Connection) -> Project:
+            row = self._require_project(conn, project_id)
+            now = datetime.now(UTC)
+            started_at = _from_timestamp(row["analysis_started_at"])
+            fields: Dict[str, Any] = {
+                "status": "failed",
+                "analysis_completed_at": now.timestamp(),
+                "last_updated": now.timestamp(),
+                "lease_owner": None,
+                "lease_expires": None,
+            }
+            if started_at:
+                fields["analysis_duration_seconds"] = max((now - started_at).total_seconds(), 0.0)
+            self._update_fields(conn, project_id, **fields)
+            conn.execute("UPDATE project_steps SET in_flight = 0 WHERE project_id = ?", (project_id,))
+            self._append_log(conn, project_id, f"分析パイプライン失敗: {reason}", now)
+            return self._load_project(conn, project_id)
+
+        return await self._write(fail)
+
+    async def renew_pipeline_leases(self) -> int:
+        """このワーカーが実行中の分析の担当期限を延ばし、延長した件数を返す."""
+
+        def renew(conn: sqlite3.Connection) -> int:
+            expires = datetime.now(UTC).timestamp() + self.lease_seconds
+            return conn.execute(
+                """
+                UPDATE projects SET lease_expires = ?
+                WHERE status = 'analyzing' AND lease_owner = ?
+                """,
+                (expires, self.owner_id),
+            ).rowcount
+
+        return await self._write(renew)
+
+    async def fail_interrupted_pipelines(self, reason: str) -> List[str]:
+        """担当期限の切れた analyzing の案件 (止まったワーカーが実行していたもの) を失敗扱いにする.
+
+        生きているワーカーは担当期限を延長し続けるため、その案件は対象にならない。
+        status のインデックスで analyzing の行だけを 1 回の UPDATE で更新し、
+        案件の内容は読み込まない。
+        """
+
+        def fail(conn: sqlite3.Connection) -> List[str]:
+            now = datetime.now(UTC)
+            rows = conn.execute(
+                """
+                UPDATE projects SET
+                    status = 'failed', analysis_completed_at = :now, last_updated = :now,
+                    analysis_duration_seconds = CASE
+                        WHEN analysis_started_at IS NULL THEN analysis_duration_seconds
+                        ELSE MAX(:now - analysis_started_at, 0.0)
+                    END,
+                    lease_owner = NULL, lease_expires = NULL, version = version + 1
+                WHERE status = 'analyzing' AND COALESCE(lease_expires, 0) < :now
+                RETURNING id
+                """,
+                {"now": now.timestamp()},
+            ).fetchall()
+            interrupted = sorted(row["id"] for row in rows)
+            for project_id in interrupted:
+                conn.execute(
+                    "UPDATE project_steps SET in_flight = 0 WHERE project_id = ?", (project_id,)
+                )
+                self._append_log(conn, project_id, f"分析パイプライン失敗: {reason}", now)
+            return interrupted
+
+        interrupted = await self._write(fail)
+        for project_id in interrupted:
+            self._notify(project_id)
+        return interrupted
+
+    async def list_projects(self) -> List[Project]:
+        """全プロジェクトを最新更新日時順に取得.
+
+        一括で読み込んだ案件はスナップショットとして保持しない (全件をメモリに残さないため)。
+        """
+
+        def select(conn: sqlite3.Connection) -> List[Project]:
+            rows = conn.execute(
+                "SELECT id, version, created_at FROM projects ORDER BY last_updated DESC"
+            ).fetchall()
+            projects = []
+            for row in rows:
+                cached = self._cached_snapshot(row["id"], (row["version"], row["created_at"]))
+                if cached is None:
+                    cached = self._load_project(conn, row["id"], remember=False)
+                projects.append(cached)
+            return projects
+
+        return await self._read(select)
+
+    async def list_project_summaries(
+        self,
+        *,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        status: Optional[str] = None,
+        company_name: Optional[str] = None,
+        sort: str = "updated",
+        descending: bool = True,
+    ) -> ProjectPage:
+        """一覧表示用の列だけをページ単位で返す.
+
+        (status | company_name, 並び替え列, id) の複合インデックスで
+        フィルタ・並び替え・キーセットページングを処理する。
+        """
+
+        column = _sort_field(sort)
+        direction = "DESC" if descending else "ASC"
+        conditions: List[str] = []
+        params: List[Any] = []
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        if company_name is not None:
+            conditions.append("company_name = ?")
+            params.append(company_name)
+        if cursor:
+            value, project_id = _decode_cursor(cursor, sort, descending)
+            conditions.append(f"({column}, id) {'<' if descending else '>'} (?, ?)")
+            params.extend([value, project_id])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        limit_clause = ""
+        if limit is not None:
+            limit_clause = "LIMIT ?"
+            params.append(limit + 1)
+        query = f"""
+            SELECT id, company_name, product_name, title, model, media_type, status,
+                   analysis_progress, created_at, last_updated
+            FROM projects {where}
+            ORDER BY {column} {direction}, id {direction}
+            {limit_clause}
+        """  # noqa: S608 - 列名・方向は固定値のみ
+
+        def select(conn: sqlite3.Connection) -> List[ProjectSummaryRow]:
+            return [
+                ProjectSummaryRow(
+                    id=row["id"],
+                    company_name=row["company_name"],
+                    product_name=row["product_name"],
+                    title=row["title"],
+                    model=row["model"],
+                    media_type=row["media_type"],
+                    status=row["status"],
+                    analysis_progress=row["analysis_progress"],
+                    created_at=_from_timestamp(row["created_at"]),
+                    last_updated=_from_timestamp(row["last_updated"]),
+                )
+                for row in conn.execute(query, params)
+            ]
+
+        rows = await self._read(select)
+        return _build_page(rows, limit, sort, descending)
+
+    async def delete_project(self, project_id: str) -> None:
+        """プロジェクトをストアから削除する."""
+
+        def delete(conn: sqlite3.Connection) -> None:
+            self._require_project(conn, project_id)
+            self._delete_rows(conn, project_id)
+
+        await self._write(delete)
+        with self._snapshots_lock:
+            self._snapshots.pop(project_id, None)
+        self._notify(project_id)
+
+    async def reset(self) -> None:
+        """テスト用に全プロジェクトを削除."""
+
+        def clear(conn: sqlite3.Connection) -> None:
+            conn.execute("DELETE FROM projects")
+
+        await self._write(clear)
+        with self._snapshots_lock:
+            self._snapshots.clear()
+        self._notify()
+
+
+DEFAULT_PROJECT_DB_PATH = Path(__file__).resolve().parent / "projects.db"
+
+
+def create_project_store() -> ProjectStore:
+    """環境変数に応じたストアを生成する.
+
+    PROJECT_STORE_BACKEND=memory の場合はインメモリ、それ以外は PROJECT_DB_PATH の SQLite。
+    """
+
+    if os.getenv("PROJECT_STORE_BACKEND", "sqlite").lower() == "memory":
+        return ProjectStore()
+    return SQLiteProjectStore(
+        Path(os.getenv("PROJECT_DB_PATH", str(DEFAULT_PROJECT_DB_PATH))),
+        lease_seconds=float(
+            os.getenv("PIPELINE_LEASE_SECONDS", DEFAULT_PIPELINE_LEASE_SECONDS)
+        ),
+    )
@@ -0,0 +1,18 @@
+"""テスト共通の設定."""
+
+import os
+import tempfile
+
+import pytest
+
+# backend.app の import 時に作られるストアをリポジトリ外の一時 DB に向ける
+os.environ.setdefault(
+    "PROJECT_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="video_analysis_test_"), "projects.db")
+)
+
+
+@pytest.fixture(autouse=True)
+def _isolate_gemini_cache(tmp_path, monkeypatch):
+    """Gemini 結果キャッシュをテストごとの一時ディレクトリに向ける."""
+
+    monkeypatch.setenv("GEMINI_CACHE_DIR", str(tmp_path / "gemini_cache"))
@@ -0,0 +1,63 @@
+"""注釈付きフレームキャッシュのテスト."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from backend.utils import annotated_frames
+from backend.utils.annotated_frames import (
+    AnnotatedFrameCache,
+    collect_risk_timecodes,
+    normalize_timecode,
+    precompute_annotated_frames,
+)
+
+
+def test_timecodes_are_normalized_and_collected_from_findings_and_tags() -> None:
+    risk = {
+        "social": {"findings": [{"timecode": "00:05", "detail": "x"}, {"timecode": "N/A"}]},
+        "legal": {"violations": [{"timecode": "0:05.0"}]},
+        "tags": [
+            {"detected_timecode": "01:02", "related_sub_tags": [{"detected_timecode": "62"}]},
+            {"detected_timecode": "静止画"},
+        ],
+    }
+
+    assert normalize_timecode("01:02") == normalize_timecode("62.0") == "62.0"
+    assert collect_risk_timecodes(risk) == ["00:05", "01:02"]
+
+
+def test_cache_round_trips_images_with_stable_etags(tmp_path: Path) -> None:
+    cache = AnnotatedFrameCache(tmp_path)
+    assert cache.get("5.0") is None
+
+    path, etag = cache.put("5.0", b"jpeg-bytes", timecode="00:05")
+
+    assert path.read_bytes() == b"jpeg-bytes"
+    assert AnnotatedFrameCache(tmp_path).get("5.0") == (path, etag)
+    assert cache.put("5.0", b"jpeg-bytes", timecode="00:05")[1] == etag
+
+
+@pytest.mark.asyncio
+async def test_precompute_renders_each_missing_timecode_once(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    rendered = []
+
+    async def fake_render(video_path: Path, seconds: float) -> bytes:
+        rendered.append(seconds)
+        return f"frame@{seconds}".encode()
+
+    monkeypatch.setattr(annotated_frames, "render_annotated_frame", fake_render)
+    AnnotatedFrameCache(tmp_path).put("1.0", b"cached", timecode="00:01")
+
+    created = await precompute_annotated_frames(
+        tmp_path / "video.mp4", tmp_path, ["00:01", "00:02", "0:02", "bad"]
+    )
+
+    assert created == 1
+    assert rendered == [2.0]
+    path, _ = AnnotatedFrameCache(tmp_path).get("2.0")
+    assert path.read_bytes() == b"frame@2.0"
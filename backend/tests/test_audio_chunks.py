@@ -0,0 +1,68 @@
+"""長尺音声のチャンク分割と文字起こしのつなぎ直しのテスト."""
+
+from __future__ import annotations
+
+import pytest
+
+from backend.utils.audio_chunks import (
+    parse_silencedetect_log,
+    parse_timed_lines,
+    plan_chunks,
+    stitch_transcripts,
+)
+
+SILENCEDETECT_LOG = """\
+Input #0, flac, from 'audio.flac':
+  Duration: 00:05:00.50, start: 0.000000, bitrate: 200 kb/s
+[silencedetect @ 0x1] silence_start: 118.2
+[silencedetect @ 0x1] silence_end: 119.0 | silence_duration: 0.8
+[silencedetect @ 0x1] silence_start: 245.5
+[silencedetect @ 0x1] silence_end: 246.5 | silence_duration: 1.0
+"""
+
+
+def test_parse_silencedetect_log_reads_duration_and_silences() -> None:
+    duration, silences = parse_silencedetect_log(SILENCEDETECT_LOG)
+
+    assert duration == 300.5
+    assert silences == [(118.2, 119.0), (245.5, 246.5)]
+
+
+def test_plan_chunks_cuts_at_nearby_silences_with_overlap() -> None:
+    chunks = plan_chunks(300.5, [(118.2, 119.0), (245.5, 246.5)], chunk_seconds=120, overlap=3)
+
+    assert [(chunk.owned_start, chunk.owned_end) for chunk in chunks] == [
+        (0.0, 118.6),
+        (118.6, 246.0),
+        (246.0, 300.5),
+    ]
+    assert (chunks[1].start, chunks[1].end) == pytest.approx((115.6, 249.0))
+    assert chunks[-1].end == 300.5
+
+
+def test_parse_timed_lines_keeps_untimed_lines() -> None:
+    lines = parse_timed_lines("[00:05] こんにちは\n続きの文\n[1:02:03] 終わり")
+
+    assert [(line.seconds, line.text) for line in lines] == [
+        (5.0, "こんにちは"),
+        (None, "続きの文"),
+        (3723.0, "終わり"),
+    ]
+
+
+def test_stitch_transcripts_uses_absolute_time_and_drops_overlap_duplicates() -> None:
+    chunks = plan_chunks(200.0, [(99.0, 101.0)], chunk_seconds=100, overlap=3)
+    transcripts = [
+        "[00:10] 最初の発話\n[01:38] 境界の発話です。\n[01:42] 重複した発話",
+        # 2 つ目は 97 秒から切り出しているので、00:01 は 98 秒 (前のチャンクの担当範囲)
+        "[00:01] 境界の発話です\n[00:04] 境界の発話です\n[00:05] 重複した発話\n[01:30] 最後の発話",
+    ]
+
+    stitched = stitch_transcripts(chunks, transcripts, overlap=3)
+
+    assert stitched.splitlines() == [
+        "[00:10] 最初の発話",
+        "[01:38] 境界の発話です。",
+        "[01:42] 重複した発話",
+        "[03:07] 最後の発話",
+    ]
@@ -0,0 +1,68 @@
+"""frame_utils のテスト (OpenCV が無い環境ではスキップ)."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+
+from backend.utils.frame_utils import (  # noqa: E402
+    annotate_text_regions,
+    decode_and_score_window,
+    decode_frame_window,
+    encode_window_frames,
+    laplacian_sharpness,
+)
+
+
+def _write_video(path: Path, seconds: float, fps: int = 30) -> None:
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (64, 48))
+    for index in range(int(seconds * fps)):
+        frame = np.full((48, 64, 3), index % 255, dtype=np.uint8)
+        writer.write(frame)
+    writer.release()
+
+
+def test_decode_frame_window_returns_frames_around_center(tmp_path: Path) -> None:
+    video_path = tmp_path / "clip.avi"
+    _write_video(video_path, seconds=3)
+
+    frames = decode_frame_window(video_path, 1.5)
+
+    assert 9 <= len(frames) <= 11
+    timestamps = [timestamp for timestamp, _ in frames]
+    assert timestamps == sorted(timestamps)
+    assert timestamps[0] >= 0.9 and timestamps[-1] <= 2.1
+    assert frames[0][1].shape == (48, 64, 3)
+
+
+def test_laplacian_sharpness_prefers_edges() -> None:
+    flat = np.zeros((32, 32, 3), dtype=np.uint8)
+    edged = flat.copy()
+    edged[:, ::2] = 255
+
+    flat_score, edged_score = laplacian_sharpness([flat, edged])
+
+    assert flat_score == pytest.approx(0.0)
+    assert edged_score > flat_score
+
+
+def test_window_candidates_cross_the_process_boundary_as_jpeg(tmp_path: Path) -> None:
+    video_path = tmp_path / "clip.avi"
+    _write_video(video_path, seconds=3)
+
+    candidates = decode_and_score_window(video_path, 1.5)
+
+    scores = [score for _, score, _ in candidates]
+    assert scores == sorted(scores, reverse=True)
+    # 最も鮮明な 1 枚だけ JPEG で返し、ndarray は返さない
+    assert candidates[0][2][:2] == b"\xff\xd8"
+    assert all(image is None for _, _, image in candidates[1:])
+
+    rest = encode_window_frames(video_path, 1.5, [timestamp for timestamp, _, _ in candidates[1:]])
+    assert len(rest) == len(candidates) - 1
+    annotated = annotate_text_regions(rest[0], [([[1, 1], [20, 1], [20, 10], [1, 10]], "テロップ", 0.9)])
+    assert cv2.imdecode(np.frombuffer(annotated, np.uint8), cv2.IMREAD_COLOR).shape == (48, 64, 3)
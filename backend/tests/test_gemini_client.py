@@ -0,0 +1,469 @@
+"""GeminiClient の通信まわりのテスト (ローカルのスタンドインサーバーを使用)."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+import httpx
+import pytest
+
+from backend.models.gemini_cache import GeminiResultCache
+from backend.models.gemini_client import GeminiAPIError, GeminiClient
+from backend.models.gemini_context_cache import PromptPrefix
+from backend.models.rate_limit import GeminiRequestScheduler, TokenBucket, parse_retry_after
+from backend.utils.shot_detection import Shot, ShotIndex
+
+API_ROOT = "http://gemini.test"
+
+
+class _StandInGemini:
+    """Files API と generateContent を模したスタンドインサーバー."""
+
+    def __init__(
+        self,
+        *,
+        fail_upload: bool = False,
+        throttled_responses: int = 0,
+        transcript: str = "テキスト",
+        visual_result: Optional[dict] = None,
+        cache_status: int = 200,
+    ) -> None:
+        self.fail_upload = fail_upload
+        self.transcript = transcript
+        self.throttled_responses = throttled_responses
+        self.uploaded_bytes = 0
+        self.upload_starts = 0
+        self.deleted: list[str] = []
+        self.generate_payloads: list[dict] = []
+        self.visual_result = visual_result or {"summary": "ok", "segments": []}
+        self.cache_status = cache_status
+        self.cache_creates: list[dict] = []
+        self.expired_caches: set[str] = set()
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path == "/upload/v1beta/files":
+            self.upload_starts += 1
+            if self.fail_upload:
+                return httpx.Response(503, json={"error": "unavailable"})
+            return httpx.Response(200, headers={"x-goog-upload-url": f"{API_ROOT}/upload/session/1"})
+        if path == "/upload/session/1":
+            self.uploaded_bytes += len(request.read())
+            return httpx.Response(
+                200,
+                json={
+                    "file": {
+                        "name": "files/abc123",
+                        "uri": f"{API_ROOT}/v1beta/files/abc123",
+                        "mimeType": "video/mp4",
+                        "state": "ACTIVE",
+                    }
+                },
+            )
+        if path == "/v1beta/cachedContents" and request.method == "POST":
+            self.cache_creates.append(json.loads(request.read()))
+            if self.cache_status != 200:
+                return httpx.Response(self.cache_status, json={"error": "too small"})
+            return httpx.Response(200, json={"name": f"cachedContents/c{len(self.cache_creates)}"})
+        if request.method == "DELETE" and path.startswith("/v1beta/cachedContents/"):
+            self.deleted.append(path)
+            return httpx.Response(200, json={})
+        if path.endswith(":generateContent"):
+            if json.loads(request.read()).get("cached_content") in self.expired_caches:
+                return httpx.Response(404, json={"error": "CachedContent not found"})
+            if self.throttled_responses:
+                self.throttled_responses -= 1
+                return httpx.Response(429, headers={"retry-after": "0"}, json={"error": "quota"})
+            payload = json.loads(request.read())
+            self.generate_payloads.append(payload)
+            wants_json = payload.get("generation_config", {}).get("response_mime_type")
+            text = json.dumps(self.visual_result) if wants_json else self.transcript
+            return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": text}]}}]})
+        if request.method == "DELETE" and path == "/v1beta/files/abc123":
+            self.deleted.append(path)
+            return httpx.Response(200, json={})
+        return httpx.Response(404)
+
+
+def _fast_scheduler(max_retries: int = 3) -> GeminiRequestScheduler:
+    return GeminiRequestScheduler(
+        TokenBucket(1000.0, 100), max_retries=max_retries, base_delay=0.001, max_delay=0.01
+    )
+
+
+def _build_client(server: _StandInGemini, **kwargs) -> GeminiClient:
+    kwargs.setdefault("request_scheduler", _fast_scheduler())
+    return GeminiClient(
+        api_key="test-key",
+        model="gemini-2.5-flash",
+        api_root=API_ROOT,
+        transport=httpx.MockTransport(server.handler),
+        use_files_api=True,
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+async def test_media_is_uploaded_once_and_referenced_by_uri(tmp_path: Path) -> None:
+    media_path = tmp_path / "demo.mp4"
+    media_path.write_bytes(b"0123456789" * 1000)
+    server = _StandInGemini()
+    client = _build_client(server)
+
+    handle = await client.register_media(media_path)
+    assert await client.register_media(media_path) is handle
+    for step in ("transcription", "ocr", "visual"):
+        await client.run_step(step, media_path, media_type="video", media_handle=handle)
+
+    assert server.upload_starts == 1
+    assert server.uploaded_bytes == media_path.stat().st_size
+    assert len(server.generate_payloads) == 3
+    for payload in server.generate_payloads:
+        media_part = payload["contents"][0]["parts"][1]
+        assert "inline_data" not in media_part
+        assert media_part["file_data"]["file_uri"] == f"{API_ROOT}/v1beta/files/abc123"
+
+    await client.release_media(handle)
+    assert server.deleted == ["/v1beta/files/abc123"]
+
+
+@pytest.mark.asyncio
+async def test_register_media_falls_back_to_inline_when_upload_fails(tmp_path: Path) -> None:
+    media_path = tmp_path / "demo.mp4"
+    media_path.write_bytes(b"fake video")
+    server = _StandInGemini(fail_upload=True)
+    client = _build_client(server)
+
+    handle = await client.register_media(media_path)
+    await client.run_step("ocr", media_path, media_type="video", media_handle=handle)
+
+    assert not handle.is_remote
+    # アップロードも共有スケジューラ経由で送るため、503 はリトライし尽くしてから諦める
+    assert server.upload_starts == 4
+    media_part = server.generate_payloads[0]["contents"][0]["parts"][1]
+    assert media_part["inline_data"]["mime_type"] == "video/mp4"
+
+
+@pytest.mark.asyncio
+async def test_clients_share_one_connection_pool_across_models() -> None:
+    server = _StandInGemini()
+    client = _build_client(server)
+    await client.open()
+    pool = client._http_client()
+
+    pro_client = client.with_model("gemini-2.5-pro")
+    await client.generate_text("ping")
+    await pro_client.generate_text("ping")
+
+    assert pro_client._http_client() is pool
+    assert pro_client.model == "gemini-2.5-pro"
+    assert client.model == "gemini-2.5-flash"
+    assert len(server.generate_payloads) == 2
+
+    await client.aclose()
+    assert pool.is_closed
+
+
+@pytest.mark.asyncio
+async def test_run_step_results_are_cached_by_media_model_and_instruction(tmp_path: Path) -> None:
+    media_path = tmp_path / "demo.mp4"
+    media_path.write_bytes(b"same creative")
+    reupload_path = tmp_path / "reupload.mp4"
+    reupload_path.write_bytes(b"same creative")
+    server = _StandInGemini()
+    cache = GeminiResultCache(tmp_path / "cache", max_bytes=1024 * 1024)
+    client = _build_client(server, result_cache=cache)
+
+    first = await client.run_step("ocr", media_path, media_handle=await client.register_media(media_path))
+    again = await client.run_step("ocr", reupload_path)
+    await client.with_model("gemini-2.5-pro").run_step("ocr", media_path)
+
+    assert first == again == "テキスト"
+    assert len(server.generate_payloads) == 2
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+    # ディスク上のエントリは新しいインスタンスからも参照できる
+    reopened = GeminiResultCache(tmp_path / "cache", max_bytes=1024 * 1024)
+    assert reopened.stats()["entries"] == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_steps_share_one_call_and_settings_change_the_key(
+    tmp_path: Path,
+) -> None:
+    media_path = tmp_path / "audio.flac"
+    media_path.write_bytes(b"same audio")
+    server = _StandInGemini()
+    cache = GeminiResultCache(tmp_path / "cache", max_bytes=1024 * 1024)
+    client = _build_client(server, result_cache=cache)
+    client.long_media_seconds = 0
+
+    # 同じキーの並列実行は Gemini への呼び出しが 1 回にまとまる
+    results = await asyncio.gather(
+        *(client.run_step("transcription", media_path) for _ in range(3))
+    )
+    assert results == ["テキスト"] * 3
+    assert len(server.generate_payloads) == 1
+
+    # 実行番号が違えば独立した結果として呼び直し、同じ番号の再実行だけがキャッシュに当たる
+    await client.run_step("transcription", media_path, run=1)
+    assert len(server.generate_payloads) == 2
+    await client.run_step("transcription", media_path, run=1)
+    assert len(server.generate_payloads) == 2
+
+    # 長尺の分割条件が変われば結果の形が変わり得るため、別のキーで引き直す
+    client.long_media_seconds = 300
+    await client.run_step("transcription", media_path)
+    assert len(server.generate_payloads) == 3
+    client.transcription_chunk_seconds += 30
+    await client.run_step("transcription", media_path)
+    assert len(server.generate_payloads) == 4
+
+
+@pytest.mark.asyncio
+async def test_result_cache_evicts_least_recently_used_entries(tmp_path: Path) -> None:
+    cache = GeminiResultCache(tmp_path / "cache", max_bytes=200)
+    payload = "x" * 60
+
+    await cache.put("a" * 64, payload)
+    await cache.put("b" * 64, payload)
+    assert await cache.get("a" * 64) == payload
+    await cache.put("c" * 64, payload)
+
+    assert await cache.get("b" * 64) is None
+    assert await cache.get("a" * 64) == payload
+    assert await cache.get("c" * 64) == payload
+    assert cache.stats()["bytes"] <= 200
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg が必要")
+async def test_long_audio_is_transcribed_in_chunks_with_absolute_timecodes(tmp_path: Path) -> None:
+    # 12 秒のトーンの 4 秒・8 秒付近に無音を入れ、そこで 3 チャンクに分かれるようにする
+    audio_path = tmp_path / "long.flac"
+    subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-f", "lavfi", "-i", "sine=frequency=440:duration=12",
+            "-af", "volume=enable='between(t,3.5,4.5)+between(t,7.5,8.5)':volume=0",
+            "-y", str(audio_path),
+        ],
+        check=True,
+    )
+    server = _StandInGemini(transcript="[00:01] テキスト")
+    client = _build_client(server)
+    client.long_media_seconds = 10
+    client.transcription_chunk_seconds = 4
+    client.transcription_chunk_overlap = 1
+
+    transcript = await client.transcribe_audio(audio_path)
+
+    assert len(server.generate_payloads) == 3
+    # 各チャンクの相対時刻 (00:01) が切り出し開始位置 (0 / 3 / 7 秒) を足した絶対時刻になる
+    assert transcript.splitlines() == ["[00:01] テキスト", "[00:04] テキスト", "[00:08] テキスト"]
+
+
+@pytest.mark.asyncio
+async def test_silence_probe_runs_once_per_media_file(tmp_path: Path, monkeypatch) -> None:
+    audio_path = tmp_path / "short.flac"
+    audio_path.write_bytes(b"audio")
+    probes: list[Path] = []
+
+    async def fake_detect_silences(path: Path):
+        probes.append(path)
+        await asyncio.sleep(0.01)
+        return 30.0, []
+
+    monkeypatch.setattr("backend.models.gemini_client.detect_silences", fake_detect_silences)
+    server = _StandInGemini()
+    client = _build_client(server)
+
+    await asyncio.gather(*(client.transcribe_audio(audio_path) for _ in range(3)))
+
+    assert probes == [audio_path]
+    assert len(server.generate_payloads) == 3
+
+
+@pytest.mark.asyncio
+async def test_visual_analysis_sends_shot_keyframes_in_batches(tmp_path: Path) -> None:
+    media_path = tmp_path / "proxy.mp4"
+    media_path.write_bytes(b"fake video")
+    shots = []
+    for number, start in enumerate(range(0, 10, 2), start=1):
+        (tmp_path / f"shot_{number}.jpg").write_bytes(b"jpeg")
+        shots.append(Shot(index=number, start=start, end=start + 2, keyframe=f"shot_{number}.jpg"))
+    index = ShotIndex(duration=10.0, shots=shots, directory=tmp_path)
+    server = _StandInGemini(
+        visual_result={
+            "summary": "ok",
+            "segments": [{"label": "商品", "description": "商品カット", "shots": [{"shot": 2}, {"shot": 5}]}],
+        }
+    )
+    client = _build_client(server)
+    client.keyframe_batch_size = 2
+
+    result = await client.run_step("visual", media_path, shot_index=index)
+
+    assert len(server.generate_payloads) == 3
+    assert all(
+        len(payload["contents"][0]["parts"]) <= 1 + 2 * 2 for payload in server.generate_payloads
+    )
+    # ショット番号は索引の区間に置き換わり、バッチをまたいだ同じラベルは 1 つにまとまる
+    assert [segment["label"] for segment in result["segments"]] == ["商品"]
+    timecodes = [shot["timecode"] for shot in result["segments"][0]["shots"]]
+    assert timecodes == ["00:02.0-00:04.0", "00:08.0-00:10.0"] * 3
+
+
+PREFIX = PromptPrefix(instruction="判定してください", text="参照データ一式", label="risk-reference-v1")
+
+
+@pytest.mark.asyncio
+async def test_prompt_prefix_is_cached_once_and_referenced_by_name() -> None:
+    server = _StandInGemini()
+    client = _build_client(server)
+
+    for _ in range(3):
+        await client.generate_structured_judgement(
+            "判定してください", "本文+参照データ(絞り込み)", prefix=PREFIX, prefix_content="本文"
+        )
+    # モデルごとに別のキャッシュになる
+    await client.with_model("gemini-2.0-flash").generate_structured_judgement(
+        "判定してください", "本文+参照データ(絞り込み)", prefix=PREFIX, prefix_content="本文"
+    )
+
+    assert [create["model"] for create in server.cache_creates] == [
+        "models/gemini-2.5-flash",
+        "models/gemini-2.0-flash",
+    ]
+    assert server.cache_creates[0]["contents"][0]["parts"][0]["text"] == "参照データ一式"
+    assert [payload["cached_content"] for payload in server.generate_payloads] == [
+        "cachedContents/c1",
+        "cachedContents/c1",
+        "cachedContents/c1",
+        "cachedContents/c2",
+    ]
+    assert all(
+        payload["contents"][0]["parts"] == [{"text": "本文"}] for payload in server.generate_payloads
+    )
+
+    await client.aclose()
+    assert sorted(server.deleted) == ["/v1beta/cachedContents/c1", "/v1beta/cachedContents/c2"]
+
+
+@pytest.mark.asyncio
+async def test_prompt_prefix_is_inlined_when_caching_is_unavailable() -> None:
+    server = _StandInGemini(cache_status=400)
+    client = _build_client(server)
+
+    for _ in range(2):
+        await client.generate_structured_judgement(
+            "判定してください", "本文+参照データ(絞り込み)", prefix=PREFIX, prefix_content="本文"
+        )
+
+    # 作成に失敗したら暫くは作り直さずにインラインで送る
+    assert len(server.cache_creates) == 1
+    assert [payload["contents"][0]["parts"] for payload in server.generate_payloads] == [
+        [{"text": "判定してください"}, {"text": "本文+参照データ(絞り込み)"}]
+    ] * 2
+
+
+@pytest.mark.asyncio
+async def test_expired_prompt_cache_falls_back_to_inline_and_is_recreated() -> None:
+    server = _StandInGemini()
+    client = _build_client(server)
+    await client.generate_structured_judgement("判定してください", "全文", prefix=PREFIX)
+
+    server.expired_caches.add("cachedContents/c1")
+    await client.generate_structured_judgement("判定してください", "全文", prefix=PREFIX)
+    await client.generate_structured_judgement("判定してください", "全文", prefix=PREFIX)
+
+    assert [payload.get("cached_content") for payload in server.generate_payloads] == [
+        "cachedContents/c1",
+        None,
+        "cachedContents/c2",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_throttled_requests_are_retried_until_they_succeed() -> None:
+    server = _StandInGemini(throttled_responses=2)
+    client = _build_client(server)
+
+    assert await client.generate_text("ping") == "テキスト"
+    assert server.throttled_responses == 0
+    assert len(server.generate_payloads) == 1
+
+
+@pytest.mark.asyncio
+async def test_retries_give_up_with_gemini_api_error() -> None:
+    server = _StandInGemini(throttled_responses=10)
+    client = _build_client(server, request_scheduler=_fast_scheduler(max_retries=2))
+
+    with pytest.raises(GeminiAPIError, match="429"):
+        await client.generate_text("ping")
+    assert server.throttled_responses == 7
+
+
+@pytest.mark.asyncio
+async def test_only_connect_errors_are_retried() -> None:
+    scheduler = _fast_scheduler(max_retries=3)
+    attempts: list[str] = []
+
+    async def flaky_connect() -> httpx.Response:
+        attempts.append("connect")
+        if len(attempts) < 3:
+            raise httpx.ConnectError("refused")
+        return httpx.Response(200)
+
+    assert (await scheduler.send(flaky_connect)).status_code == 200
+    assert len(attempts) == 3
+
+    async def hung() -> httpx.Response:
+        attempts.append("read")
+        raise httpx.ReadTimeout("timed out")
+
+    # 読み取りタイムアウトは再送せず、1 回で呼び出し元に返す
+    with pytest.raises(httpx.ReadTimeout):
+        await scheduler.send(hung)
+    assert attempts.count("read") == 1
+
+
+@pytest.mark.asyncio
+async def test_retries_stop_at_the_deadline() -> None:
+    scheduler = GeminiRequestScheduler(
+        TokenBucket(1000.0, 100), max_retries=5, base_delay=0.001, max_delay=60.0, deadline=1.0
+    )
+    calls = 0
+
+    async def throttled() -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        return httpx.Response(429, headers={"retry-after": "30"})
+
+    # Retry-After の待ちが期限を超えるため、リトライせずに 429 を返す
+    assert (await scheduler.send(throttled)).status_code == 429
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_paces_requests_beyond_burst() -> None:
+    bucket = TokenBucket(rate_per_second=50.0, capacity=2)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    for _ in range(5):
+        await bucket.acquire()
+    # バースト 2 件の後は 1/50 秒ごとに 1 件ずつ
+    assert loop.time() - started >= 0.05
+
+
+def test_parse_retry_after_accepts_seconds_and_http_dates() -> None:
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
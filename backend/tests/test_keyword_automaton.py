@@ -0,0 +1,34 @@
+"""キーワードオートマトンのテスト."""
+
+from __future__ import annotations
+
+from backend.models.keyword_automaton import KeywordAutomaton, TagKeywordIndex
+
+
+def test_automaton_reports_overlapping_matches_with_positions() -> None:
+    automaton: KeywordAutomaton[str] = KeywordAutomaton()
+    for keyword in ("he", "she", "his", "hers", "最安"):
+        automaton.add(keyword, keyword)
+
+    hits = [(hit.start, hit.end, hit.keyword) for hit in automaton.iter_matches("uSHErs 業界最安値")]
+
+    assert hits == [(1, 4, "she"), (2, 4, "he"), (2, 6, "hers"), (9, 11, "最安")]
+
+
+def test_tag_index_prefers_keywords_in_definition_order() -> None:
+    structure = [
+        {"name": "誇大表現", "definition": "No.1 / 最安 | 日本一", "sub_tags": []},
+        {
+            "name": "差別",
+            "definition": "",
+            "sub_tags": [{"name": "性別", "definition": "女のくせに, 男なら"}],
+        },
+    ]
+    index = TagKeywordIndex(structure)
+
+    hits = index.scan("日本一の最安値。男ならno.1を選ぶ")
+
+    assert hits[(0, None)].keyword == "No.1"
+    assert (hits[(0, None)].start, hits[(0, None)].end) == (11, 15)
+    assert hits[(1, 0)].keyword == "男なら"
+    assert (1, None) not in hits
@@ -0,0 +1,74 @@
+"""MediaExecutor のテスト (ffmpeg の代わりに sh を起動する)."""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+
+import pytest
+
+from backend.utils.media_jobs import (
+    ClientDisconnected,
+    MediaExecutor,
+    MediaJobError,
+    MediaJobTimeout,
+    cancel_on_disconnect,
+)
+
+
+@pytest.fixture
+def executor():
+    media_executor = MediaExecutor(ffmpeg_binary="sh", ffmpeg_concurrency=2, process_workers=1)
+    yield media_executor
+    media_executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_run_ffmpeg_returns_stdout_and_raises_on_failure(executor: MediaExecutor) -> None:
+    assert await executor.run_ffmpeg(["-c", "printf frame"]) == b"frame"
+
+    with pytest.raises(MediaJobError, match="exited with 3: boom"):
+        await executor.run_ffmpeg(["-c", "echo boom >&2; exit 3"])
+
+
+@pytest.mark.asyncio
+async def test_run_ffmpeg_times_out_without_blocking_the_loop(executor: MediaExecutor) -> None:
+    ticks = 0
+
+    async def ticker() -> None:
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticker_task = asyncio.create_task(ticker())
+    started = time.monotonic()
+    with pytest.raises(MediaJobTimeout):
+        await executor.run_ffmpeg(["-c", "exec sleep 5"], timeout=0.2)
+    ticker_task.cancel()
+
+    assert time.monotonic() - started < 2
+    assert ticks >= 5
+
+
+@pytest.mark.asyncio
+async def test_run_in_process_uses_the_worker_pool(executor: MediaExecutor) -> None:
+    assert await executor.run_in_process(math.factorial, 10) == 3628800
+
+
+@pytest.mark.asyncio
+async def test_cancel_on_disconnect_cancels_pending_work(executor: MediaExecutor) -> None:
+    disconnected = False
+
+    async def is_disconnected() -> bool:
+        return disconnected
+
+    work = asyncio.ensure_future(executor.run_ffmpeg(["-c", "exec sleep 5"]))
+    guarded = asyncio.create_task(cancel_on_disconnect(is_disconnected, work, poll_interval=0.05))
+    await asyncio.sleep(0.1)
+    disconnected = True
+
+    with pytest.raises(ClientDisconnected):
+        await guarded
+    assert work.cancelled()
@@ -0,0 +1,114 @@
+"""解析用プロキシ生成のテスト."""
+
+from __future__ import annotations
+
+import json
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from backend.utils.media_jobs import MediaExecutor, MediaJobTimeout
+from backend.utils.media_proxy import ProxySettings, prepare_analysis_media
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_original_when_ffmpeg_fails(tmp_path: Path) -> None:
+    source = tmp_path / "master.mov"
+    source.write_bytes(b"not a video")
+
+    media = await prepare_analysis_media(
+        source, tmp_path, executor=MediaExecutor(ffmpeg_binary="false")
+    )
+
+    assert media.video == source
+    assert media.audio is None
+    assert not media.is_proxy
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg が必要")
+async def test_builds_small_proxy_and_mono_audio_once(tmp_path: Path) -> None:
+    source = tmp_path / "master.mp4"
+    subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-f", "lavfi", "-i", "testsrc2=duration=1:size=1280x720:rate=30",
+            "-f", "lavfi", "-i", "sine=frequency=440:duration=1:sample_rate=48000",
+            "-ac", "2", "-c:v", "libx264", "-preset", "ultrafast", "-crf", "10", "-shortest", "-y", str(source),
+        ],
+        check=True,
+    )
+    executor = MediaExecutor()
+    settings = ProxySettings(max_dimension=640, fps=5, crf=30)
+
+    media = await prepare_analysis_media(source, tmp_path, settings=settings, executor=executor)
+
+    assert media.is_proxy
+    assert media.audio is not None and media.audio.suffix == ".flac"
+    assert media.video.stat().st_size * 10 < source.stat().st_size
+    assert json.loads((media.video.parent / "proxy.json").read_text())["has_audio"] is True
+
+    calls = []
+
+    async def fail_if_called(args, **kwargs):
+        calls.append(args)
+        raise AssertionError("proxy should be reused")
+
+    executor.run_ffmpeg = fail_if_called  # type: ignore[method-assign]
+    again = await prepare_analysis_media(source, tmp_path, settings=settings, executor=executor)
+    assert again == media
+    assert calls == []
+
+
+class _FakeExecutor:
+    """プロキシの映像は作れるが、音声の取り出しは指定どおりに失敗させるダミー."""
+
+    def __init__(self, *, audio_streams: str, audio_error: bool) -> None:
+        self.audio_streams = audio_streams
+        self.audio_error = audio_error
+        self.audio_attempts = 0
+
+    async def run_ffprobe(self, args, *, timeout=None):
+        return self.audio_streams
+
+    async def run_ffmpeg(self, args, *, timeout=None):
+        if "0:a:0" in args:
+            self.audio_attempts += 1
+            if self.audio_error:
+                raise MediaJobTimeout("ffmpeg timed out")
+        Path(args[-1]).write_bytes(b"media")
+        return b""
+
+
+@pytest.mark.asyncio
+async def test_skips_audio_only_when_the_source_has_no_audio_stream(tmp_path: Path) -> None:
+    source = tmp_path / "silent.mp4"
+    source.write_bytes(b"video without audio")
+    executor = _FakeExecutor(audio_streams="", audio_error=False)
+
+    media = await prepare_analysis_media(source, tmp_path, executor=executor)  # type: ignore[arg-type]
+
+    assert media.is_proxy
+    assert media.audio is None
+    assert executor.audio_attempts == 0
+    assert json.loads((media.video.parent / "proxy.json").read_text())["has_audio"] is False
+
+
+@pytest.mark.asyncio
+async def test_audio_extraction_failure_transcribes_the_original(tmp_path: Path) -> None:
+    source = tmp_path / "master.mp4"
+    source.write_bytes(b"video with audio")
+    executor = _FakeExecutor(audio_streams="1\n", audio_error=True)
+
+    media = await prepare_analysis_media(source, tmp_path, executor=executor)  # type: ignore[arg-type]
+
+    assert media.is_proxy
+    assert media.audio == source
+    # 一時的な失敗は保存せず、次回は音声の取り出しからやり直す
+    assert not (media.video.parent / "proxy.json").exists()
+    executor.audio_error = False
+    again = await prepare_analysis_media(source, tmp_path, executor=executor)  # type: ignore[arg-type]
+    assert again.audio == tmp_path / "analysis_proxy" / "audio.flac"
+    assert executor.audio_attempts == 2
@@ -0,0 +1,60 @@
+"""OCRReaderPool のテスト."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend.models.ocr_pool import OCRReaderPool
+
+
+class _StubReader:
+    def __init__(self) -> None:
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def readtext(self, image, **kwargs):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.01)
+        with self._lock:
+            self.active -= 1
+        return [([[0, 0], [1, 0], [1, 1], [0, 1]], f"text:{image}", 0.9)]
+
+
+@pytest.mark.asyncio
+async def test_readers_are_created_once_and_never_shared_concurrently() -> None:
+    readers: list[_StubReader] = []
+
+    def factory() -> _StubReader:
+        reader = _StubReader()
+        readers.append(reader)
+        return reader
+
+    pool = OCRReaderPool(size=2, reader_factory=factory)
+    try:
+        results = await asyncio.gather(*(pool.readtext(f"frame{i}") for i in range(10)))
+    finally:
+        pool.shutdown()
+
+    assert [result[0][1] for result in results] == [f"text:frame{i}" for i in range(10)]
+    assert 1 <= len(readers) <= 2
+    assert all(reader.max_active == 1 for reader in readers)
+
+
+@pytest.mark.asyncio
+async def test_warm_up_loads_all_readers_before_first_request() -> None:
+    created = []
+    pool = OCRReaderPool(size=3, reader_factory=lambda: created.append(1) or _StubReader())
+    try:
+        await pool.warm_up()
+        assert pool.created == 3
+        await pool.readtext("frame")
+        assert len(created) == 3
+    finally:
+        pool.shutdown()
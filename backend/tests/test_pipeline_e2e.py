@@ -1,12 +1,14 @@
 """FastAPI エンドポイントの E2E テスト."""
 
 import asyncio
+import json
 from pathlib import Path
 
 import pytest
 from httpx import ASGITransport, AsyncClient
 
 from ..app import app, store
+from ..store import PROJECT_STEPS
 
 
 @pytest.mark.asyncio
@@ -82,3 +84,132 @@ async def test_project_pipeline_flow() -> None:
         import shutil
 
         shutil.rmtree(workspace_dir, ignore_errors=True)
+
+
+@pytest.mark.asyncio
+async def test_project_list_pagination(tmp_path: Path) -> None:
+    """一覧 API のページングとフィルタを検証."""
+
+    await store.reset()
+    for index, company in enumerate(["A社", "B社", "A社"]):
+        await store.create_project(
+            project_id=f"p{index}",
+            company_name=company,
+            product_name="商品",
+            title=f"案件{index}",
+            video_path=tmp_path / f"p{index}.mp4",
+            file_name=f"p{index}.mp4",
+            workspace_dir=tmp_path / f"p{index}",
+            model="gemini-2.5-flash",
+            media_type="video",
+        )
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        first = await client.get("/projects", params={"limit": 2})
+        assert first.status_code == 200
+        assert [item["id"] for item in first.json()] == ["p2", "p1"]
+        next_cursor = first.headers["x-next-cursor"]
+
+        second = await client.get("/projects", params={"limit": 2, "cursor": next_cursor})
+        assert [item["id"] for item in second.json()] == ["p0"]
+        assert "x-next-cursor" not in second.headers
+
+        filtered = await client.get("/projects", params={"company": "A社", "order": "asc"})
+        assert [item["id"] for item in filtered.json()] == ["p0", "p2"]
+
+        invalid = await client.get("/projects", params={"limit": 2, "cursor": "broken"})
+        assert invalid.status_code == 400
+
+    await store.reset()
+
+
+@pytest.mark.asyncio
+async def test_analysis_event_stream_sends_snapshot_then_deltas(tmp_path: Path) -> None:
+    """進捗ストリームが初回スナップショットの後に差分と終了イベントを送ることを検証."""
+
+    await store.reset()
+    await store.create_project(
+        project_id="stream",
+        company_name="A社",
+        product_name="商品",
+        title="案件",
+        video_path=tmp_path / "stream.mp4",
+        file_name="stream.mp4",
+        workspace_dir=tmp_path,
+        model="gemini-2.5-flash",
+        media_type="video",
+    )
+    await store.mark_pipeline_started("stream")
+
+    async def drive() -> None:
+        await asyncio.sleep(0.05)
+        await store.mark_step_running("stream", PROJECT_STEPS[0])
+        await asyncio.sleep(0.05)
+        await store.mark_pipeline_failed("stream", "boom")
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        missing = await client.get("/projects/unknown/events")
+        assert missing.status_code == 404
+
+        response, _ = await asyncio.gather(client.get("/projects/stream/events"), drive())
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        events.append((fields["event"], json.loads(fields["data"])))
+
+    assert events[0][0] == "snapshot"
+    assert events[0][1]["status"] == "analyzing"
+    assert events[-1] == ("end", {"status": "failed"})
+    deltas = [data for name, data in events if name == "delta"]
+    assert any(
+        step["name"] == PROJECT_STEPS[0] and step["status"] == "running"
+        for delta in deltas
+        for step in delta.get("steps", [])
+    )
+    assert deltas[-1]["status"] == "failed"
+
+    await store.reset()
+
+
+@pytest.mark.asyncio
+async def test_frame_endpoint_serves_cached_frames_with_etag(tmp_path: Path) -> None:
+    """キャッシュ済みの注釈付きフレームが ETag 付きで返り、再検証で 304 になることを検証."""
+
+    from ..utils.annotated_frames import AnnotatedFrameCache
+
+    await store.reset()
+    video_path = tmp_path / "clip.mp4"
+    video_path.write_bytes(b"fake video data")
+    await store.create_project(
+        project_id="frames",
+        company_name="A社",
+        product_name="商品",
+        title="案件",
+        video_path=video_path,
+        file_name="clip.mp4",
+        workspace_dir=tmp_path,
+        model="gemini-2.5-flash",
+        media_type="video",
+    )
+    _, etag = AnnotatedFrameCache(tmp_path).put("65.0", b"annotated", timecode="01:05")
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        first = await client.get("/projects/frames/frame", params={"timecode": "01:05"})
+        assert first.status_code == 200
+        assert first.content == b"annotated"
+        assert first.headers["etag"] == etag
+        assert "max-age" in first.headers["cache-control"]
+
+        revalidated = await client.get(
+            "/projects/frames/frame",
+            params={"timecode": "00:01:05"},
+            headers={"If-None-Match": etag},
+        )
+        assert revalidated.status_code == 304
+
+    await store.reset()
@@ -0,0 +1,385 @@
+"""AnalysisPipeline の各フェーズ単位のテスト."""
+
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from typing import Optional
+
+import pytest
+
+from backend.models.risk_assessor import RiskAssessor
+from backend.models.risk_consensus import ConsensusPolicy, agreement
+from backend.models.risk_scheduler import RiskFanoutScheduler
+from backend.pipeline import EXTRACTION_RUNS, AnalysisPipeline
+from backend.store import PROJECT_STEPS, ProjectStore
+
+
+class _SlowGeminiClient:
+    """呼び出しごとに一定時間待機し、同時実行数を記録するダミー."""
+
+    def __init__(self, delay: float = 0.05) -> None:
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.calls: list[str] = []
+        self.media_paths: dict[str, set[Path]] = {}
+        self.shot_indexes: list = []
+        self.runs: dict[str, list[int]] = {}
+
+    async def run_step(
+        self,
+        name: str,
+        media_path: Path,
+        *,
+        media_type: str = "video",
+        media_handle=None,
+        shot_index=None,
+        run: int = 0,
+    ) -> object:
+        self.shot_indexes.append(shot_index)
+        self.runs.setdefault(name, []).append(run)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        self.calls.append(name)
+        self.media_paths.setdefault(name, set()).add(media_path)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        if name == "visual":
+            return {"summary": "テスト映像", "segments": []}
+        return f"{name} result"
+
+
+def _build_pipeline(store: ProjectStore, client: _SlowGeminiClient, **kwargs) -> AnalysisPipeline:
+    assessor = RiskAssessor.__new__(RiskAssessor)  # type: ignore[misc]
+    return AnalysisPipeline(
+        store=store,
+        gemini_client=client,  # type: ignore[arg-type]
+        risk_assessor=assessor,
+        **kwargs,
+    )
+
+
+async def _create_project(store: ProjectStore, tmp_path: Path) -> None:
+    await store.create_project(
+        project_id="p1",
+        company_name="テスト企業",
+        product_name="テスト商品",
+        title="デモ案件",
+        video_path=tmp_path / "demo.mp4",
+        file_name="demo.mp4",
+        workspace_dir=tmp_path,
+        model="gemini-2.5-flash",
+        media_type="video",
+    )
+    await store.mark_pipeline_started("p1")
+
+
+@pytest.mark.asyncio
+async def test_extraction_stage_runs_calls_concurrently(tmp_path: Path) -> None:
+    store = ProjectStore()
+    await _create_project(store, tmp_path)
+    client = _SlowGeminiClient()
+    pipeline = _build_pipeline(store, client)
+
+    transcripts, ocr_runs, video_runs = await pipeline._run_extraction_stage(
+        "p1", tmp_path / "demo.mp4", tmp_path, "video"
+    )
+
+    assert len(client.calls) == 3 * EXTRACTION_RUNS
+    assert client.max_active == 3 * EXTRACTION_RUNS
+    assert [run[0] for run in transcripts] == ["transcription result"] * EXTRACTION_RUNS
+    assert [run[0] for run in ocr_runs] == ["ocr result"] * EXTRACTION_RUNS
+    assert all(run[0]["summary"] == "テスト映像" for run in video_runs)
+    # 各回は別々の実行番号で呼び、キャッシュ上も独立した結果として扱わせる
+    for name in ("transcription", "ocr", "visual"):
+        assert sorted(client.runs[name]) == list(range(EXTRACTION_RUNS))
+
+    project = await store.get_project("p1")
+    for step in PROJECT_STEPS[:3]:
+        assert project.step_status[step] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_extraction_stage_respects_concurrency_limit(tmp_path: Path) -> None:
+    store = ProjectStore()
+    await _create_project(store, tmp_path)
+    client = _SlowGeminiClient(delay=0.01)
+    pipeline = _build_pipeline(store, client, extraction_concurrency=2)
+
+    await pipeline._run_extraction_stage("p1", tmp_path / "demo.mp4", tmp_path, "video")
+
+    assert client.max_active == 2
+    assert len(client.calls) == 3 * EXTRACTION_RUNS
+
+
+@pytest.mark.asyncio
+async def test_extraction_stage_sends_audio_track_to_transcription_only(tmp_path: Path) -> None:
+    store = ProjectStore()
+    await _create_project(store, tmp_path)
+    client = _SlowGeminiClient(delay=0)
+    pipeline = _build_pipeline(store, client)
+    proxy_path = tmp_path / "analysis_proxy" / "proxy.mp4"
+    audio_path = tmp_path / "analysis_proxy" / "audio.flac"
+
+    await pipeline._run_extraction_stage(
+        "p1", proxy_path, tmp_path, "video", audio_path=audio_path, audio_handle=object()
+    )
+
+    assert client.media_paths == {
+        "transcription": {audio_path},
+        "ocr": {proxy_path},
+        "visual": {proxy_path},
+    }
+
+
+@pytest.mark.asyncio
+async def test_extraction_stage_skips_transcription_without_audio_track(tmp_path: Path) -> None:
+    store = ProjectStore()
+    await _create_project(store, tmp_path)
+    client = _SlowGeminiClient(delay=0)
+    pipeline = _build_pipeline(store, client)
+    proxy_path = tmp_path / "analysis_proxy" / "proxy.mp4"
+
+    transcript_runs, _, _ = await pipeline._run_extraction_stage(
+        "p1", proxy_path, tmp_path, "video", has_audio=False
+    )
+
+    # 元ファイルを送り直さず、文字起こしの呼び出し自体を行わない
+    assert "transcription" not in client.media_paths
+    assert {run[2] for run in transcript_runs} == {"skipped"}
+
+
+@pytest.mark.asyncio
+async def test_extraction_stage_passes_shot_index_to_visual_analysis_only(tmp_path: Path) -> None:
+    store = ProjectStore()
+    await _create_project(store, tmp_path)
+    client = _SlowGeminiClient(delay=0)
+    pipeline = _build_pipeline(store, client)
+    shot_index = object()
+
+    await pipeline._run_extraction_stage(
+        "p1", tmp_path / "demo.mp4", tmp_path, "video", shot_index=shot_index
+    )
+
+    passed = dict(zip(client.calls, client.shot_indexes))
+    assert passed == {"transcription": None, "ocr": None, "visual": shot_index}
+
+
+class _SlowRiskAssessor(RiskAssessor):
+    """assess の呼び出しごとに待機時間を変えるダミー評価器."""
+
+    def __init__(  # pylint: disable=super-init-not-called
+        self, delays: list[float], grades: Optional[list[str]] = None
+    ) -> None:
+        self.tag_risk_map = {}
+        self.delays = list(delays)
+        self.grades = list(grades or [])
+        self.active = 0
+        self.max_active = 0
+
+    async def assess(self, *, transcript: str, ocr_text: str, video_summary: dict) -> dict:
+        delay = self.delays.pop(0)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self.active -= 1
+        return {
+            "social": {"grade": self.grades.pop(0) if self.grades else "B", "reason": f"delay={delay}"},
+            "legal": {"grade": "抵触していない", "reason": ""},
+            "matrix": {"x_axis": "", "y_axis": "", "position": [0, 0]},
+            "tags": [],
+        }
+
+    def build_keyword_matches(self, transcript: str, ocr_text: str) -> list:
+        return []
+
+
+class _RecordingStore(ProjectStore):
+    def __init__(self) -> None:
+        super().__init__()
+        self.iterations: list[int] = []
+
+    async def update_iteration_state(self, project_id, *, current_iteration, total_iterations):
+        self.iterations.append(current_iteration)
+        return await super().update_iteration_state(
+            project_id,
+            current_iteration=current_iteration,
+            total_iterations=total_iterations,
+        )
+
+
+@pytest.mark.asyncio
+async def test_risk_fanout_issues_all_passes_concurrently(tmp_path: Path) -> None:
+    store = _RecordingStore()
+    await _create_project(store, tmp_path)
+    delays = [0.05, 0.01, 0.03, 0.02, 0.04, 0.06, 0.01, 0.02, 0.03]
+    assessor = _SlowRiskAssessor(delays)
+    pipeline = AnalysisPipeline(
+        store=store,
+        gemini_client=_SlowGeminiClient(),  # type: ignore[arg-type]
+        risk_assessor=assessor,
+        risk_scheduler=RiskFanoutScheduler(global_limit=20, per_project_limit=9),
+        risk_consensus=ConsensusPolicy(enabled=False),
+    )
+
+    results, risk_calls = await pipeline._run_risk_fanout(
+        "p1", "transcript", "ocr", {"segments": []}, tmp_path, total_iterations=3
+    )
+
+    assert assessor.max_active == 9
+    assert len(results) == 3
+    assert risk_calls["calls"] == 9
+    assert store.iterations == [1, 2, 3, 3]
+    project = await store.get_project("p1")
+    assert project.step_status[PROJECT_STEPS[3]] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_consensus_stops_after_first_iteration_when_passes_agree(tmp_path: Path) -> None:
+    store = _RecordingStore()
+    await _create_project(store, tmp_path)
+    assessor = _SlowRiskAssessor([0.01] * 9)
+    pipeline = AnalysisPipeline(
+        store=store,
+        gemini_client=_SlowGeminiClient(),  # type: ignore[arg-type]
+        risk_assessor=assessor,
+        risk_consensus=ConsensusPolicy(threshold=0.8, initial_passes=2),
+    )
+
+    results, risk_calls = await pipeline._run_risk_fanout(
+        "p1", "transcript", "ocr", {"segments": []}, tmp_path, total_iterations=3
+    )
+
+    # 最初の 2 件が一致した時点で 3 件目も発行しない
+    assert len(results) == 1
+    assert risk_calls == {
+        "mode": "consensus",
+        "calls": 2,
+        "max_calls": 9,
+        "iterations": 1,
+        "agreement": 1.0,
+    }
+    project = await store.get_project("p1")
+    assert (project.current_iteration, project.total_iterations) == (1, 1)
+    assert project.step_status[PROJECT_STEPS[3]] == "completed"
+    # 1 回分でもタグの多数決で結果が消えないこと
+    assert pipeline._aggregate_risk_results(
+        [{"social": {"grade": "B"}, "legal": {}, "tags": [{"name": "誇大表現", "grade": "B"}]}]
+    )["tags"] == [{"name": "誇大表現", "grade": "B"}]
+
+
+@pytest.mark.asyncio
+async def test_consensus_escalates_while_passes_disagree(tmp_path: Path) -> None:
+    store = _RecordingStore()
+    await _create_project(store, tmp_path)
+    assessor = _SlowRiskAssessor([0.01] * 9, grades=["B", "D", "B", "B", "B", "B"])
+    pipeline = AnalysisPipeline(
+        store=store,
+        gemini_client=_SlowGeminiClient(),  # type: ignore[arg-type]
+        risk_assessor=assessor,
+        risk_consensus=ConsensusPolicy(threshold=0.8, initial_passes=2),
+    )
+
+    results, risk_calls = await pipeline._run_risk_fanout(
+        "p1", "transcript", "ocr", {"segments": []}, tmp_path, total_iterations=3
+    )
+
+    # 最初の 2 件は B/D が割れて残り 7 件をまとめて追加し (1 イテレーションずつ待たない)、
+    # 2 回目までで 5/6 が一致したところで残りを取り消す
+    assert assessor.max_active == 7
+    assert len(results) == 2
+    assert (risk_calls["calls"], risk_calls["agreement"]) == (6, 0.833)
+    project = await store.get_project("p1")
+    assert (project.current_iteration, project.total_iterations) == (2, 2)
+    assert project.step_status[PROJECT_STEPS[3]] == "completed"
+
+
+class _FlakyRiskAssessor(_SlowRiskAssessor):
+    def __init__(self, failures: int) -> None:
+        super().__init__([0.0] * 20)
+        self.failures = failures
+        self.calls = 0
+
+    async def assess(self, *, transcript: str, ocr_text: str, video_summary: dict) -> dict:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("temporary failure")
+        return await super().assess(
+            transcript=transcript, ocr_text=ocr_text, video_summary=video_summary
+        )
+
+
+@pytest.mark.asyncio
+async def test_risk_fanout_retries_once_when_every_pass_fails(tmp_path: Path) -> None:
+    store = _RecordingStore()
+    await _create_project(store, tmp_path)
+    assessor = _FlakyRiskAssessor(failures=3)
+    pipeline = AnalysisPipeline(
+        store=store,
+        gemini_client=_SlowGeminiClient(),  # type: ignore[arg-type]
+        risk_assessor=assessor,
+        risk_scheduler=RiskFanoutScheduler(global_limit=20, per_project_limit=1),
+        risk_consensus=ConsensusPolicy(enabled=False),
+    )
+
+    results, risk_calls = await pipeline._run_risk_fanout(
+        "p1", "transcript", "ocr", {"segments": []}, tmp_path, total_iterations=1
+    )
+
+    assert risk_calls["calls"] == 4
+    assert results[0]["social"]["grade"] == "B"
+
+
+def test_agreement_compares_grades_and_tag_sets() -> None:
+    def result(social: str, legal: str, *tags: str) -> dict:
+        return {
+            "social": {"grade": social},
+            "legal": {"grade": legal},
+            "tags": [{"name": name} for name in tags],
+        }
+
+    assert agreement([result("B", "抵触していない")]) == 0.0
+    assert agreement([result("B", "抵触していない")] * 2) == 1.0
+    assert agreement([result("B", "抵触していない", "a"), result("B", "抵触していない", "a", "b")]) == 0.5
+    assert agreement(
+        [result("B", "抵触していない"), result("B", "抵触する可能性がある"), result("B", "抵触していない")]
+    ) == pytest.approx(2 / 3)
+
+
+@pytest.mark.asyncio
+async def test_risk_scheduler_yields_in_completion_order_within_limits() -> None:
+    scheduler = RiskFanoutScheduler(global_limit=3, per_project_limit=2)
+    active = {"p1": 0, "p2": 0}
+    peaks = {"p1": 0, "p2": 0, "total": 0}
+
+    def make_job(project_id: str, delay: float, value: int):
+        async def job() -> int:
+            active[project_id] += 1
+            peaks[project_id] = max(peaks[project_id], active[project_id])
+            peaks["total"] = max(peaks["total"], active["p1"] + active["p2"])
+            await asyncio.sleep(delay)
+            active[project_id] -= 1
+            return value
+
+        return job
+
+    async def collect(project_id: str, delays: list[float]) -> list[tuple[int, object]]:
+        jobs = [make_job(project_id, delay, idx) for idx, delay in enumerate(delays)]
+        return [item async for item in scheduler.as_completed(project_id, jobs)]
+
+    first, second = await asyncio.gather(
+        collect("p1", [0.04, 0.01, 0.02]),
+        collect("p2", [0.01, 0.01]),
+    )
+
+    # p1 は枠 2 のため job2 は job1 の完了後に開始し、job0 より先に終わる
+    assert [index for index, _ in first] == [1, 2, 0]
+    assert sorted(index for index, _ in second) == [0, 1]
+    assert peaks["p1"] <= 2
+    assert peaks["p2"] <= 2
+    assert peaks["total"] <= 3
@@ -0,0 +1,77 @@
+"""リスク評価プロンプトの参照データ絞り込みのテスト."""
+
+from __future__ import annotations
+
+from backend.models.keyword_automaton import TagKeywordIndex
+from backend.models.prompt_context import (
+    ReferenceContextBuilder,
+    build_context_indexes,
+    estimate_tokens,
+)
+from backend.models.similarity_index import NgramIndex
+
+STRUCTURE = [
+    {
+        "name": "誇大表現",
+        "definition": "最安 / No.1",
+        "sub_tags": [
+            {"name": "最上級表現", "definition": "業界一"},
+            {"name": "効果保証", "definition": "必ず痩せる"},
+        ],
+    },
+    {"name": "動物倫理", "definition": "動物を虐待する演出", "sub_tags": []},
+]
+LEGAL_ROWS = [
+    {"関連法令": "景品表示法", "解釈": ""},
+    {"関連法令": "景品表示法5条1号", "解釈": "業界一などの最上級表現は根拠を明記する"},
+    {"関連法令": "航空法105条", "解釈": "運送約款に反する表示をしない"},
+]
+CASE_ROWS = [
+    {"発火要因": "広告", "タグ１": "誇大表現", "細分化タグ": "最上級表現", "全体像": "業界一と表示し根拠が無かった"},
+    {"発火要因": "発言", "タグ１": "動物倫理", "細分化タグ": "", "全体像": "動物を氷漬けにした展示"},
+]
+
+
+def _builder(token_budget: int = 4000) -> ReferenceContextBuilder:
+    return ReferenceContextBuilder(
+        tag_structure=STRUCTURE,
+        tag_summary="- 誇大表現\n- 動物倫理",
+        tag_keyword_index=TagKeywordIndex(STRUCTURE),
+        tag_index=NgramIndex([]),
+        tag_records=[],
+        context_indexes=build_context_indexes(CASE_ROWS, LEGAL_ROWS),
+        legal_rows=LEGAL_ROWS,
+        token_budget=token_budget,
+    )
+
+
+def test_estimate_tokens_counts_japanese_per_character() -> None:
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("業界一") == 3
+
+
+def test_context_keeps_only_relevant_tags_and_rows() -> None:
+    context = _builder().build("業界一の品質をお届け")
+
+    assert context.selected == {"tags": (1, 2), "legal": (1, 2), "cases": (1, 2)}
+    # 該当したサブタグだけ定義を載せ、残りは名前だけにする
+    assert '"sub_tags": [{"name": "最上級表現"' in context.text
+    assert '"other_sub_tags": ["効果保証"]' in context.text
+    assert "動物を虐待する演出" not in context.text
+    assert "景品表示法5条1号" in context.text
+    assert "航空法105条" not in context.text
+    # 法令名だけの見出し行は常に載せる
+    assert "## Legal Reference Index\n- 景品表示法" in context.text
+
+
+def test_context_respects_token_budget() -> None:
+    builder = _builder()
+    base = builder.build("関係のない本文")
+    assert base.selected["tags"][0] == 0
+
+    builder.token_budget = base.tokens + 5
+    context = builder.build("業界一の品質をお届け")
+
+    assert context.selected["tags"][0] == 0
+    assert context.tokens <= builder.token_budget
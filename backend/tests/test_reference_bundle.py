@@ -0,0 +1,89 @@
+"""参照データのコンパイル済み成果物キャッシュのテスト."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from backend.models.keyword_automaton import TagKeywordIndex
+from backend.models.reference_bundle import ReferenceBundle, load_reference_bundle
+from backend.models.risk_assessor import RiskAssessor
+from backend.models.similarity_index import NgramIndex
+
+
+def _empty_bundle() -> ReferenceBundle:
+    return ReferenceBundle(
+        social_case_digest="",
+        social_tag_digest="",
+        legal_digest="",
+        tag_structure=[],
+        tag_risk_map={},
+        case_reference_rows=[],
+        tag_definition_entries=[],
+        tag_keyword_index=TagKeywordIndex([]),
+        screening_indexes=(NgramIndex([]), [], NgramIndex([]), []),
+    )
+
+
+def _fail_read_excel(*args, **kwargs):
+    raise AssertionError("read_excel should not be called")
+
+
+def test_bundle_is_rebuilt_only_when_source_content_changes(tmp_path: Path) -> None:
+    source = tmp_path / "cases.xlsx"
+    source.write_bytes(b"v1")
+    builds: list[int] = []
+
+    def build() -> ReferenceBundle:
+        builds.append(1)
+        return _empty_bundle()
+
+    sources = {"social_case": source}
+    load_reference_bundle(sources, build, cache_dir=tmp_path / "cache")
+    load_reference_bundle(sources, build, cache_dir=tmp_path / "cache")
+    assert len(builds) == 1
+
+    # mtime だけ変わった場合は内容のハッシュで同一と判定して再利用する
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    load_reference_bundle(sources, build, cache_dir=tmp_path / "cache")
+    assert len(builds) == 1
+
+    source.write_bytes(b"v2")
+    load_reference_bundle(sources, build, cache_dir=tmp_path / "cache")
+    assert len(builds) == 2
+
+
+def test_risk_assessor_loads_reference_data_from_compiled_bundle(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("REFERENCE_BUNDLE_DIR", str(tmp_path / "cache"))
+    case_path = tmp_path / "cases.xlsx"
+    tag_path = tmp_path / "tags.xlsx"
+    pd.DataFrame(
+        [{"発火要因": "高齢者を笑いものにする演出", "タグ１": "年齢表現", "細分化タグ": "高齢者"}]
+    ).to_excel(case_path, index=False)
+    pd.DataFrame(
+        [
+            {"タグ": "年齢表現", "定義": "高齢者 / 老人", "リスク": 3},
+            {"タグ": "誇大表現", "定義": "最安", "リスク": 2},
+        ]
+    ).to_excel(tag_path, index=False)
+    paths = dict(
+        social_case_path=case_path,
+        social_tag_path=tag_path,
+        legal_reference_path=tmp_path / "missing.xlsx",
+        tag_list_path=tag_path,
+    )
+
+    first = RiskAssessor(None, **paths)  # type: ignore[arg-type]
+    # 2 回目は参照ファイルを読まずにコンパイル済みの成果物から復元される
+    monkeypatch.setattr(pd, "read_excel", _fail_read_excel)
+    second = RiskAssessor(None, **paths)  # type: ignore[arg-type]
+
+    assert second.tag_structure == first.tag_structure
+    assert second.tag_risk_map == {"年齢表現": 3, "誇大表現": 2}
+    assert second.case_reference_rows == first.case_reference_rows
+    assert second.legal_digest.startswith("法務リスト: 参照ファイルが見つかりません")
+    hits = second._screen_with_cases("高齢者を笑いものにする演出が話題", "")
+    assert hits and hits[0]["name"] == "年齢表現"
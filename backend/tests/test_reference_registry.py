@@ -0,0 +1,114 @@
+"""参照データの版管理とホットリロードのテスト."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pandas as pd
+
+from backend.models.keyword_automaton import TagKeywordIndex
+from backend.models.reference_bundle import ReferenceBundle, load_reference_bundle
+from backend.models.reference_registry import ReferenceRegistry
+from backend.models.risk_assessor import RiskAssessor
+from backend.models.similarity_index import NgramIndex
+
+
+def _empty_bundle() -> ReferenceBundle:
+    return ReferenceBundle(
+        social_case_digest="",
+        social_tag_digest="",
+        legal_digest="",
+        tag_structure=[],
+        tag_risk_map={},
+        case_reference_rows=[],
+        tag_definition_entries=[],
+        tag_keyword_index=TagKeywordIndex([]),
+        screening_indexes=(NgramIndex([]), [], NgramIndex([]), []),
+    )
+
+
+def test_registry_swaps_version_only_when_content_changes(tmp_path: Path) -> None:
+    source = tmp_path / "legal.xlsx"
+    source.write_bytes(b"v1")
+    sources = {"legal_reference": source}
+    registry = ReferenceRegistry(
+        sources,
+        lambda: load_reference_bundle(sources, _empty_bundle, cache_dir=tmp_path / "cache"),
+        watch_interval=0.01,
+    )
+    swapped: list[str] = []
+    registry.add_listener(lambda version: swapped.append(version.version))
+    first = registry.current
+
+    assert registry.reload() is False
+    assert registry.current is first
+
+    source.write_bytes(b"v2")
+    assert registry.reload() is True
+    assert registry.current.version != first.version
+    assert swapped == [registry.current.version]
+
+    # 内容を元に戻せば最初と同じ版になる
+    source.write_bytes(b"v1")
+    registry.reload()
+    assert registry.current.version == first.version
+
+
+def test_registry_detects_changes_with_bundle_disabled(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("REFERENCE_BUNDLE", "false")
+    source = tmp_path / "legal.xlsx"
+    source.write_bytes(b"v1")
+    sources = {"legal_reference": source}
+    builds: list[int] = []
+
+    def build() -> ReferenceBundle:
+        builds.append(1)
+        return _empty_bundle()
+
+    registry = ReferenceRegistry(
+        sources, lambda: load_reference_bundle(sources, build), watch_interval=0.01
+    )
+    first = registry.current
+
+    # 変更がなければ作り直さない
+    assert registry.reload() is False
+    assert len(builds) == 1
+
+    source.write_bytes(b"v2")
+    assert registry.reload() is True
+    assert registry.current.version != first.version
+    assert len(builds) == 2
+
+
+def _write_tags(path: Path, definition: str) -> None:
+    pd.DataFrame([{"タグ": "誇大表現", "定義": definition, "リスク": 2}]).to_excel(path, index=False)
+
+
+def test_running_analysis_keeps_the_reference_version_it_started_with(
+    tmp_path: Path, monkeypatch
+) -> None:
+    monkeypatch.setenv("REFERENCE_BUNDLE_DIR", str(tmp_path / "cache"))
+    tag_path = tmp_path / "tags.xlsx"
+    _write_tags(tag_path, "最安")
+    assessor = RiskAssessor(
+        None,  # type: ignore[arg-type]
+        social_case_path=tmp_path / "cases.xlsx",
+        social_tag_path=tag_path,
+        legal_reference_path=tmp_path / "legal.xlsx",
+        tag_list_path=tag_path,
+    )
+    pinned = assessor.for_current_reference()
+    assert pinned.reference_version == assessor.reference_version
+
+    _write_tags(tag_path, "最安 / 業界一")
+    assert assessor.reference_registry.reload() is True
+    # 元の評価器には切り替えの通知で新しい版が反映される
+    assert assessor.reference_version == assessor.reference_registry.current.version
+    updated = assessor.for_current_reference()
+
+    assert updated.reference_version == assessor.reference_registry.current.version
+    assert updated.tag_keyword_index is assessor.tag_keyword_index
+    assert pinned.reference_version != updated.reference_version
+    # 開始済みの評価器は古い定義のまま、新しい評価器だけが更新後の定義で照合する
+    assert pinned.build_keyword_matches("業界一の品質", "") == []
+    assert [match["name"] for match in updated.build_keyword_matches("業界一の品質", "")] == ["誇大表現"]
@@ -2,11 +2,15 @@
 
 from __future__ import annotations
 
+import asyncio
 from pathlib import Path
 
 import pandas as pd
 
+from backend.models.keyword_automaton import TagKeywordIndex
+from backend.models.prompt_context import ReferenceContextBuilder, build_context_indexes
 from backend.models.risk_assessor import RiskAssessor
+from backend.models.similarity_index import NgramIndex
 
 
 def _build_assessor() -> RiskAssessor:
@@ -15,6 +19,7 @@ def _build_assessor() -> RiskAssessor:
     assessor.case_reference_rows = []
     assessor.tag_definition_entries = []
     assessor.tag_structure = []
+    assessor.tag_keyword_index = TagKeywordIndex([])
     return assessor
 
 
@@ -70,6 +75,32 @@ def test_calculate_burn_risk_enriches_details() -> None:
     assert anonymous_entry["detected_text"] == "匿名字幕"
 
 
+def test_scan_tag_matches_reports_keyword_positions_and_timecodes() -> None:
+    assessor = _build_assessor()
+    assessor.tag_structure = [
+        {
+            "name": "誇大表現",
+            "definition": "最安 / No.1",
+            "risk": 3,
+            "sub_tags": [{"name": "比較", "definition": "他社", "risk": 2}],
+        },
+        {"name": "該当なし", "definition": "存在しない語", "risk": 5, "sub_tags": []},
+    ]
+    assessor.tag_keyword_index = TagKeywordIndex(assessor.tag_structure)
+
+    matches = assessor._scan_tag_matches("[00:03] こんにちは\n[01:05] 業界最安です", "他社比較 NO.1")
+
+    assert [match["name"] for match in matches] == ["誇大表現"]
+    match = matches[0]
+    assert match["detected_text"] == "最安"
+    assert match["detected_timecode"] == "01:05"
+    assert match["detected_position"] == {"source": "transcript", "start": 24, "end": 26}
+    sub = match["related_sub_tags"][0]
+    assert sub["detected_text"] == "他社"
+    assert sub["detected_timecode"] == "N/A"
+    assert sub["detected_position"] == {"source": "ocr", "start": 0, "end": 2}
+
+
 def test_screen_with_cases_returns_grade_c_or_higher() -> None:
     assessor = _build_assessor()
     assessor.case_reference_rows = [
@@ -98,6 +129,27 @@ def test_screen_with_cases_returns_grade_c_or_higher() -> None:
     assert top_hit["related_sub_tags"], "細分化タグが含まれるはず"
 
 
+def test_screen_with_cases_ignores_short_references_in_benign_content() -> None:
+    assessor = _build_assessor()
+    # 実データの発火要因の多くは「発言」「広告」などの区分名だけ
+    assessor.case_reference_rows = [
+        {"発火要因": "広告", "タグ１": "誇大表現", "細分化タグ": ""},
+        {"発火要因": "発言", "タグ１": "差別表現", "細分化タグ": ""},
+        {"発火要因": "個人差", "タグ１": "効果保証", "細分化タグ": ""},
+    ]
+    assessor.tag_definition_entries = [
+        {"name": "外見揶揄", "definition": "外見を揶揄する", "type": "tag", "parent": None},
+    ]
+    transcript = (
+        "この美容液は毎日のスキンケアにおすすめです。※効果には個人差があります。"
+        "広告の提供は株式会社サンプル。外見を気にせず、社長の発言もご紹介します。"
+    )
+
+    hits = assessor._screen_with_cases(transcript, "")
+
+    assert [hit for hit in hits if hit["grade"] in {"C", "D", "E"}] == []
+
+
 def test_load_case_reference_rows_reads_excel(tmp_path: Path) -> None:
     assessor = _build_assessor()
     sample_path = tmp_path / "cases.xlsx"
@@ -117,3 +169,44 @@ def test_load_case_reference_rows_reads_excel(tmp_path: Path) -> None:
 
     assert len(rows) == 1
     assert rows[0]["発火要因"] == "テスト案件の表現が問題視された"
+
+
+def test_assess_sends_the_same_reference_material_with_or_without_the_cache(monkeypatch) -> None:
+    monkeypatch.setenv("RISK_CONTEXT_FILTER", "true")
+    structure = [
+        {"name": "誇大表現", "definition": "業界一", "sub_tags": []},
+        {"name": "動物倫理", "definition": "動物を虐待する演出", "sub_tags": []},
+    ]
+    assessor = _build_assessor()
+    assessor.tag_structure = structure
+    assessor.tag_keyword_index = TagKeywordIndex(structure)
+    assessor.reference_context_builder = ReferenceContextBuilder(
+        tag_structure=structure,
+        tag_summary="- 誇大表現\n- 動物倫理",
+        tag_keyword_index=assessor.tag_keyword_index,
+        tag_index=NgramIndex([]),
+        tag_records=[],
+        context_indexes=build_context_indexes([], []),
+        legal_rows=[],
+    )
+    for name in ("tag_structure_json", "tag_structure_summary", "social_case_digest",
+                 "social_tag_digest", "legal_digest"):
+        setattr(assessor, name, "")
+    captured: dict = {}
+
+    class RecordingClient:
+        async def generate_structured_judgement(self, instruction, content, *, prefix, prefix_content):
+            captured.update(content=content, prefix=prefix, prefix_content=prefix_content)
+            return {"tags": []}
+
+    assessor.gemini_client = RecordingClient()  # type: ignore[assignment]
+    asyncio.run(assessor.assess(transcript="業界一の品質", ocr_text="", video_summary={}))
+
+    # キャッシュには共通部分だけを載せ、案件ごとに選んだタグは毎回の本文で送る
+    assert "## Tag Taxonomy Summary" in captured["prefix"].text
+    assert "## Relevant Tags" not in captured["prefix"].text
+    assert "## Relevant Tags" in captured["prefix_content"]
+    cached_material = captured["prefix"].text + captured["prefix_content"]
+    for section in ("## Tag Taxonomy Summary", "## Relevant Tags", "## Transcript"):
+        assert section in captured["content"] and section in cached_material
+    assert "動物を虐待する演出" not in captured["content"] + cached_material
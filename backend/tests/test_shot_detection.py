@@ -0,0 +1,70 @@
+"""ショット境界検出とショット索引のテスト."""
+
+from __future__ import annotations
+
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from backend.utils.shot_detection import (
+    ShotIndex,
+    build_shot_index,
+    build_shots,
+    load_shot_index,
+    parse_scene_log,
+)
+
+SCENE_LOG = """\
+Input #0, mov,mp4,m4a,3gp,3g2,mj2, from 'proxy.mp4':
+  Duration: 00:00:12.00, start: 0.000000, bitrate: 300 kb/s
+[Parsed_showinfo_2 @ 0x1] n:   0 pts:  20480 pts_time:2       duration:   2048 checksum:1
+[Parsed_showinfo_2 @ 0x1] n:   1 pts:  21504 pts_time:2.1     duration:   2048 checksum:2
+[Parsed_showinfo_2 @ 0x1] n:   2 pts:  71680 pts_time:7       duration:   2048 checksum:3
+"""
+
+
+def test_parse_scene_log_and_short_shots_are_merged() -> None:
+    duration, cuts = parse_scene_log(SCENE_LOG)
+    shots = build_shots(duration, cuts, min_shot_seconds=0.5)
+
+    assert duration == 12.0
+    assert cuts == [2.0, 2.1, 7.0]
+    # 2.1 秒の切り替わりは直前から 0.1 秒しかないので 1 つのショットにまとめる
+    assert [(shot.start, shot.end) for shot in shots] == [(0.0, 2.0), (2.0, 7.0), (7.0, 12.0)]
+
+
+def test_snap_timecode_moves_range_ends_to_nearby_boundaries(tmp_path: Path) -> None:
+    index = ShotIndex(duration=12.0, shots=build_shots(12.0, [2.0, 7.0]), directory=tmp_path)
+
+    assert index.snap_timecode("00:01.6〜00:07.4") == "00:02.0-00:07.0"
+    # 境界から離れた端はそのまま、解釈できない表記も変えない
+    assert index.snap_timecode("00:04-00:10") == "00:04.0-00:10.0"
+    assert index.snap_timecode("冒頭") == "冒頭"
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg が必要")
+async def test_build_shot_index_detects_cuts_and_writes_keyframes(tmp_path: Path) -> None:
+    video_path = tmp_path / "cuts.mp4"
+    subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-f", "lavfi", "-i", "color=red:s=320x240:d=2:r=10",
+            "-f", "lavfi", "-i", "color=blue:s=320x240:d=1.5:r=10",
+            "-f", "lavfi", "-i", "testsrc=s=320x240:d=2:r=10",
+            "-filter_complex", "[0][1][2]concat=n=3:v=1:a=0",
+            "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+            "-y", str(video_path),
+        ],
+        check=True,
+    )
+
+    index = await build_shot_index(video_path, tmp_path / "workspace")
+
+    assert index is not None
+    assert [(shot.start, shot.end) for shot in index.shots] == [(0.0, 2.0), (2.0, 3.5), (3.5, 5.5)]
+    assert index.has_keyframes()
+    reloaded = load_shot_index(tmp_path / "workspace")
+    assert reloaded is not None and reloaded.to_dict() == index.to_dict()
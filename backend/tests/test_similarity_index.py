@@ -0,0 +1,38 @@
+"""文字 n-gram 類似度索引のテスト."""
+
+from __future__ import annotations
+
+from backend.models.similarity_index import NgramIndex, char_ngrams, normalize_text
+
+
+def test_normalize_text_unifies_width_case_and_drops_punctuation() -> None:
+    assert normalize_text("ＣＭ、25歳は 女の子！") == "cm25歳は女の子"
+    assert char_ngrams("ABC") == {"ab", "bc", "abc"}
+
+
+def test_search_ranks_references_by_coverage_in_content() -> None:
+    index = NgramIndex(
+        [
+            "25歳は女の子じゃないという不適切表現",
+            "女性に関する差別的表現",
+            "動物を虐待しているように見える演出",
+        ]
+    )
+
+    ranked = index.search("25歳は女の子じゃない、と断言するCMです。")
+
+    assert [doc_id for doc_id, _ in ranked][:1] == [0]
+    assert ranked[0][1] > 0.45
+    assert all(score < 0.3 for doc_id, score in ranked if doc_id != 0)
+    assert index.search("25歳は女の子じゃない", min_score=0.99) == []
+
+
+def test_search_scales_to_many_reference_rows() -> None:
+    documents = [f"事例{number}番の発火要因は表現{number % 97}の扱い" for number in range(20000)]
+    documents.append("高齢者を笑いものにする演出")
+    index = NgramIndex(documents)
+
+    ranked = index.search("このCMは高齢者を笑いものにする演出が問題", limit=3)
+
+    assert ranked[0][0] == len(documents) - 1
+    assert ranked[0][1] == 1.0
@@ -0,0 +1,268 @@
+"""ProjectStore の状態遷移テスト."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from backend.schemas.project_schema import build_status_delta
+from backend.store import (
+    PROJECT_STEPS,
+    InvalidCursorError,
+    PipelineAlreadyRunningError,
+    ProjectNotFoundError,
+    ProjectStore,
+    SQLiteProjectStore,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path: Path) -> ProjectStore:
+    if request.param == "memory":
+        return ProjectStore()
+    return SQLiteProjectStore(tmp_path / "projects.db")
+
+
+async def _create_project(store: ProjectStore, tmp_path: Path, project_id: str = "p1"):
+    return await store.create_project(
+        project_id=project_id,
+        company_name="テスト企業",
+        product_name="テスト商品",
+        title="デモ案件",
+        video_path=tmp_path / "demo.mp4",
+        file_name="demo.mp4",
+        workspace_dir=tmp_path,
+        model="gemini-2.5-flash",
+        media_type="video",
+    )
+
+
+@pytest.mark.asyncio
+async def test_overlapping_step_runs_stay_running_until_last_completes(
+    store: ProjectStore, tmp_path: Path
+) -> None:
+    await _create_project(store, tmp_path)
+    await store.mark_pipeline_started("p1")
+    step = PROJECT_STEPS[0]
+
+    await store.mark_step_running("p1", step)
+    await store.mark_step_running("p1", step)
+
+    project = await store.update_status("p1", step, "run 1")
+    assert project.step_status[step] == "running"
+    assert project.analysis_progress == pytest.approx(0.0)
+
+    project = await store.update_status("p1", step, "run 2")
+    assert project.step_status[step] == "completed"
+    assert project.payloads[step]["preview"] == "run 2"
+    assert project.analysis_progress == pytest.approx(1 / len(PROJECT_STEPS))
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_persists_state_across_instances(tmp_path: Path) -> None:
+    db_path = tmp_path / "projects.db"
+    store = SQLiteProjectStore(db_path)
+    await _create_project(store, tmp_path, "p1")
+    await _create_project(store, tmp_path / "other", "p2")
+    await store.mark_pipeline_started("p1")
+    await store.mark_step_running("p1", PROJECT_STEPS[0])
+    await store.update_status("p1", PROJECT_STEPS[0], "preview", {"text": "字幕"})
+    await store.update_iteration_state("p1", current_iteration=2, total_iterations=3)
+    store.close()
+
+    reopened = SQLiteProjectStore(db_path)
+    project = await reopened.get_project("p1")
+    assert project.company_name == "テスト企業"
+    assert project.status == "analyzing"
+    assert project.step_status[PROJECT_STEPS[0]] == "completed"
+    assert project.payloads[PROJECT_STEPS[0]] == {"preview": "preview", "data": {"text": "字幕"}}
+    assert project.current_iteration == 2
+    assert project.logs[-1] == f"{PROJECT_STEPS[0]} 完了"
+    assert [p.id for p in await reopened.list_projects()] == ["p1", "p2"]
+
+    await reopened.delete_project("p1")
+    with pytest.raises(ProjectNotFoundError):
+        await reopened.get_project("p1")
+    assert await reopened.workspace_dirs() == {tmp_path / "other"}
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_fails_only_pipelines_whose_worker_stopped(tmp_path: Path) -> None:
+    db_path = tmp_path / "projects.db"
+    # 担当期限 0 秒 = 開始した直後にワーカーが止まった状態
+    stopped = SQLiteProjectStore(db_path, lease_seconds=0)
+    live = SQLiteProjectStore(db_path)
+    await _create_project(stopped, tmp_path)
+    await _create_project(stopped, tmp_path, project_id="idle")
+    await _create_project(live, tmp_path, project_id="running")
+    await stopped.mark_pipeline_started("p1")
+    await live.mark_pipeline_started("running")
+    stopped.close()
+
+    restarted = SQLiteProjectStore(db_path)
+    assert await restarted.fail_interrupted_pipelines("再起動") == ["p1"]
+    project = await restarted.get_project("p1")
+    assert project.status == "failed"
+    assert project.logs[-1] == "分析パイプライン失敗: 再起動"
+    assert (await restarted.get_project("idle")).status == "created"
+    # 他のワーカーが実行中の案件はそのまま
+    assert (await restarted.get_project("running")).status == "analyzing"
+    with pytest.raises(PipelineAlreadyRunningError):
+        await restarted.mark_pipeline_started("running")
+    # 失敗扱いにした案件はそのまま再実行できる
+    assert (await restarted.mark_pipeline_started("p1")).status == "analyzing"
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_renews_leases_of_its_own_pipelines(tmp_path: Path) -> None:
+    db_path = tmp_path / "projects.db"
+    worker = SQLiteProjectStore(db_path, lease_seconds=0)
+    other = SQLiteProjectStore(db_path)
+    await _create_project(worker, tmp_path)
+    await worker.mark_pipeline_started("p1")
+
+    worker.lease_seconds = 60
+    assert await worker.renew_pipeline_leases() == 1
+    assert await other.renew_pipeline_leases() == 0
+    assert await other.fail_interrupted_pipelines("停止") == []
+    assert (await other.get_project("p1")).status == "analyzing"
+
+
+@pytest.mark.asyncio
+async def test_reads_share_immutable_snapshots(
+    store: ProjectStore, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    async def _skip_archive(project) -> None:
+        return None
+
+    monkeypatch.setattr(store, "_archive_project", _skip_archive)
+    await _create_project(store, tmp_path)
+    report = {"summary": "ok", "iterations": [{"transcript": "字幕" * 1000}]}
+    await store.mark_pipeline_completed("p1", report)
+
+    first = await store.get_project("p1")
+    assert await store.get_project("p1") is first
+    with pytest.raises(TypeError):
+        first.payloads["extra"] = {}  # type: ignore[index]
+    with pytest.raises(AttributeError):
+        first.logs.append("extra")  # type: ignore[attr-defined]
+
+    # 入れ子のレポートも読み取り専用で、渡した元の dict を後から変えても影響しない
+    with pytest.raises(TypeError):
+        first.final_report["iterations"][0]["transcript"] = "改ざん"  # type: ignore[index]
+    with pytest.raises(TypeError):
+        first.final_report["iterations"].append({})  # type: ignore[union-attr]
+    report["iterations"][0]["transcript"] = "呼び出し側の変更"
+    assert first.final_report["iterations"][0]["transcript"] == "字幕" * 1000
+    assert json.loads(json.dumps(first.final_report))["summary"] == "ok"
+    editable = await store.get_project_for_update("p1")
+    editable.final_report["iterations"][0]["transcript"] = "編集"
+    assert first.final_report["iterations"][0]["transcript"] == "字幕" * 1000
+
+    updated = await store.update_iteration_state("p1", current_iteration=1, total_iterations=3)
+    assert first.current_iteration == first.total_iterations
+    assert updated.current_iteration == 1
+    assert (await store.get_project("p1")) is not first
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_keeps_a_bounded_lru_of_snapshots(tmp_path: Path) -> None:
+    store = SQLiteProjectStore(tmp_path / "projects.db", snapshot_cache_size=2)
+    for project_id in ("p1", "p2", "p3"):
+        await _create_project(store, tmp_path / project_id, project_id)
+    assert list(store._snapshots) == ["p2", "p3"]
+
+    await store.get_project("p2")
+    await store.get_project("p1")
+    assert list(store._snapshots) == ["p2", "p1"]
+
+    # 一覧の一括読み込みでは保持しない
+    await store.reset()
+    for project_id in ("p1", "p2", "p3"):
+        await _create_project(store, tmp_path / project_id, project_id)
+    store._snapshots.clear()
+    assert len(await store.list_projects()) == 3
+    assert not store._snapshots
+
+
+@pytest.mark.asyncio
+async def test_get_project_for_update_round_trips_through_save(
+    store: ProjectStore, tmp_path: Path
+) -> None:
+    await _create_project(store, tmp_path)
+    editable = await store.get_project_for_update("p1")
+    editable.payloads[PROJECT_STEPS[0]] = {"preview": "edited", "data": None}
+    editable.step_status[PROJECT_STEPS[0]] = "completed"
+
+    assert (await store.get_project("p1")).step_status[PROJECT_STEPS[0]] == "pending"
+    saved = await store.save(editable)
+    assert saved.step_status[PROJECT_STEPS[0]] == "completed"
+    assert (await store.get_project("p1")).payloads[PROJECT_STEPS[0]]["preview"] == "edited"
+
+
+@pytest.mark.asyncio
+async def test_list_project_summaries_paginates_filters_and_sorts(
+    store: ProjectStore, tmp_path: Path
+) -> None:
+    for index in range(5):
+        project = await _create_project(store, tmp_path / f"p{index}", f"p{index}")
+        if index % 2 == 0:
+            await store.mark_pipeline_started(project.id)
+    # p1 を最後に更新して並び順を入れ替える
+    await store.update_iteration_state("p1", current_iteration=1, total_iterations=1)
+
+    seen = []
+    cursor = None
+    while True:
+        page = await store.list_project_summaries(limit=2, cursor=cursor)
+        seen.extend(row.id for row in page.items)
+        if page.next_cursor is None:
+            break
+        cursor = page.next_cursor
+    assert seen == ["p1", "p4", "p3", "p2", "p0"]
+
+    analyzing = await store.list_project_summaries(status="analyzing", sort="created", descending=False)
+    assert [row.id for row in analyzing.items] == ["p0", "p2", "p4"]
+    assert analyzing.next_cursor is None
+    assert (await store.list_project_summaries(company_name="別企業")).items == []
+
+    with pytest.raises(InvalidCursorError):
+        await store.list_project_summaries(limit=2, cursor=cursor, sort="created")
+    with pytest.raises(InvalidCursorError):
+        await store.list_project_summaries(cursor="not-a-cursor")
+
+
+@pytest.mark.asyncio
+async def test_subscribers_are_notified_and_receive_deltas(
+    store: ProjectStore, tmp_path: Path
+) -> None:
+    await _create_project(store, tmp_path)
+    changed = store.subscribe("p1")
+    before = await store.mark_pipeline_started("p1")
+    assert changed.is_set()
+    changed.clear()
+
+    step = PROJECT_STEPS[0]
+    await store.mark_step_running("p1", step)
+    after = await store.update_status("p1", step, "preview text")
+    assert changed.is_set()
+
+    delta = build_status_delta(before, after)
+    assert delta is not None
+    sent = delta.model_dump(exclude_unset=True)
+    assert sent["analysis_progress"] == pytest.approx(1 / len(PROJECT_STEPS))
+    assert [item["name"] for item in sent["steps"]] == [step]
+    assert sent["steps"][0]["payload"]["preview"] == "preview text"
+    assert sent["logs"]["offset"] == len(before.logs)
+    assert list(before.logs) + sent["logs"]["lines"] == list(after.logs)
+    assert "status" not in sent
+    assert build_status_delta(after, after) is None
+
+    store.unsubscribe("p1", changed)
+    changed.clear()
+    await store.mark_pipeline_failed("p1", "boom")
+    await asyncio.sleep(0)
+    assert not changed.is_set()
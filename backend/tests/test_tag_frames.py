@@ -0,0 +1,113 @@
+"""タグフレーム抽出のテスト."""
+
+from __future__ import annotations
+
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from backend.utils.media_jobs import MediaExecutor, MediaJobTimeout
+from backend.utils.tag_frames import (
+    build_frames_info,
+    collect_tag_timecodes,
+    extract_tag_frames,
+    parse_timecode,
+)
+
+RISK_DATA = {
+    "tags": [
+        {
+            "name": "表現",
+            "detected_timecode": "00:01",
+            "related_sub_tags": [
+                {"name": "誇張 表現", "detected_timecode": "00:03"},
+                {"name": "重複", "detected_timecode": "00:01"},
+            ],
+        },
+        {"name": "法務", "detected_timecode": "0:02.5"},
+        {"name": "不正", "detected_timecode": "??"},
+    ]
+}
+
+
+def test_collect_tag_timecodes_dedupes_and_names_files() -> None:
+    items = collect_tag_timecodes(RISK_DATA)
+
+    assert [item["timecode"] for item in items] == ["00:01", "00:03", "0:02.5", "??"]
+    filenames = [frame["filename"] for frame in build_frames_info(items)["frames"]]
+    assert filenames[:2] == ["表現_00-01.jpg", "表現_誇張_表現_00-03.jpg"]
+    assert parse_timecode("01:02:03.5") == pytest.approx(3723.5)
+    assert parse_timecode("??") is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg が必要")
+async def test_extract_tag_frames_writes_all_thumbnails_in_one_pass(tmp_path: Path) -> None:
+    video_path = tmp_path / "clip.mp4"
+    subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-f", "lavfi", "-i", "testsrc=duration=5:size=160x120:rate=25",
+            "-y", str(video_path),
+        ],
+        check=True,
+    )
+    executor = MediaExecutor(ffmpeg_concurrency=1)
+    calls = []
+    run_ffmpeg = executor.run_ffmpeg
+
+    async def counting_run_ffmpeg(args, **kwargs):
+        calls.append(args)
+        return await run_ffmpeg(args, **kwargs)
+
+    executor.run_ffmpeg = counting_run_ffmpeg  # type: ignore[method-assign]
+
+    frames_dir = tmp_path / "tag_frames"
+    extracted, failed = await extract_tag_frames(
+        video_path, frames_dir, collect_tag_timecodes(RISK_DATA), executor=executor
+    )
+
+    assert len(calls) == 1
+    assert [item["timecode"] for item in extracted] == ["00:01", "00:03", "0:02.5"]
+    assert [item["timecode"] for item in failed] == ["??"]
+    assert sorted(path.name for path in frames_dir.iterdir()) == sorted(
+        ["表現_00-01.jpg", "表現_誇張_表現_00-03.jpg", "法務_0-02.5.jpg"]
+    )
+
+
+class _TimingOutExecutor:
+    """まとめて抽出する呼び出しだけ時間切れにし、1 枚ずつの抽出は成功させるダミー."""
+
+    ffmpeg_timeout = 10.0
+
+    def __init__(self) -> None:
+        self.timeouts: list = []
+
+    async def run_ffmpeg(self, args, *, timeout=None):
+        self.timeouts.append(timeout)
+        if "-copyts" in args:
+            raise MediaJobTimeout("ffmpeg timed out")
+        Path(args[-1]).write_bytes(b"jpeg")
+        return b""
+
+
+@pytest.mark.asyncio
+async def test_batch_timeout_falls_back_to_one_frame_at_a_time(tmp_path: Path) -> None:
+    executor = _TimingOutExecutor()
+    items = [
+        {"timecode": "00:10", "tag": "表現", "sub_tag": None},
+        {"timecode": "59:50", "tag": "法務", "sub_tag": None},
+    ]
+
+    extracted, failed = await extract_tag_frames(
+        tmp_path / "master.mp4", tmp_path / "tag_frames", items, executor=executor  # type: ignore[arg-type]
+    )
+
+    assert [item["timecode"] for item in extracted] == ["00:10", "59:50"]
+    assert failed == []
+    # まとめての抽出はデコードする区間 (約 1 時間) に応じてタイムアウトを延ばす
+    assert executor.timeouts[0] > 3580
+    # 1 枚ずつの抽出はそれぞれ既定のタイムアウト
+    assert executor.timeouts[1:] == [None, None]
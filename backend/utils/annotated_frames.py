@@ -0,0 +1,212 @@
+"""テロップ注釈付きフレームの生成と、プロジェクト単位のキャッシュ."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from backend.models.ocr_pool import get_default_ocr_pool
+from backend.utils.frame_utils import (
+    annotate_text_regions,
+    decode_and_score_window,
+    encode_window_frames,
+)
+from backend.utils.media_jobs import MediaJobError, get_media_executor
+from backend.utils.tag_frames import parse_timecode
+
+logger = logging.getLogger(__name__)
+
+ANNOTATED_FRAMES_DIRNAME = "annotated_frames"
+INDEX_FILENAME = "index.json"
+TIMECODE_KEYS = ("timecode", "detected_timecode")
+
+# index.json の読み書きはプロセス内で直列化する
+_index_lock = threading.Lock()
+
+
+def frame_cache_key(seconds: float) -> str:
+    """秒数を 0.1 秒単位のキャッシュキー ("62.0") にする."""
+
+    return f"{seconds:.1f}"
+
+
+def normalize_timecode(timecode: str) -> Optional[str]:
+    """01:02 / 0:62 / 62.0 などの表記ゆれを同じキャッシュキーにそろえる."""
+
+    seconds = parse_timecode(timecode)
+    if seconds is None:
+        return None
+    return frame_cache_key(seconds)
+
+
+def collect_risk_timecodes(risk_data: Any) -> List[str]:
+    """リスク評価結果に含まれる timecode / detected_timecode を出現順に重複なく集める."""
+
+    timecodes: Dict[str, str] = {}
+
+    def walk(node: Any) -> None:
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key in TIMECODE_KEYS and isinstance(value, str):
+                    normalized = normalize_timecode(value)
+                    if normalized is not None:
+                        timecodes.setdefault(normalized, value)
+                else:
+                    walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(risk_data)
+    return list(timecodes.values())
+
+
+async def render_annotated_frame(video_path: Path, total_seconds: float) -> bytes:
+    """指定時刻付近で最も鮮明なテロップ付きフレームを選び、注釈付き JPEG を返す."""
+
+    media_executor = get_media_executor()
+
+    # 前後0.5秒を 1 回のデコードで読み、0.1秒間隔のフレームの鮮明度をプロセスプールで求める。
+    # フレーム本体はワーカーに残し、最も鮮明な 1 枚だけ JPEG で受け取る
+    candidates = await media_executor.run_in_process(
+        decode_and_score_window, video_path, total_seconds
+    )
+    if not candidates:
+        raise MediaJobError("フレーム抽出に失敗しました。")
+
+    # EasyOCR の Reader はプロセス内で共有し、専用スレッドで実行する
+    ocr_pool = get_default_ocr_pool()
+
+    async def candidate_images() -> AsyncIterator[Tuple[float, bytes]]:
+        _, sharpness, image = candidates[0]
+        yield sharpness, image
+        if len(candidates) > 1:
+            # 最も鮮明なフレームにテロップが無い場合だけ、残りをまとめて JPEG で受け取る
+            images = await media_executor.run_in_process(
+                encode_window_frames,
+                video_path,
+                total_seconds,
+                [timestamp for timestamp, _, _ in candidates[1:]],
+            )
+            for (_, sharpness, _), image in zip(candidates[1:], images):
+                yield sharpness, image
+
+    # テロップを含むフレームのうち最も鮮明なものを選ぶ。
+    # 鮮明な順に OCR し、最初にテキストが見つかったフレームで打ち切る
+    best_image, best_sharpness, text_results = candidates[0][2], candidates[0][1], []
+    async for sharpness, image in candidate_images():
+        try:
+            # JPEG のまま渡す (EasyOCR がデコードして RGB として扱う)
+            results = await ocr_pool.readtext(image)
+        except ImportError:
+            raise
+        except Exception as e:
+            print(f"Error processing frame: {e}")
+            continue
+        if results:
+            best_image, best_sharpness, text_results = image, sharpness, results
+            print(f"Selected frame with text: {len(results)} regions, sharpness: {sharpness:.2f}")
+            break
+    else:
+        # テロップなしの場合は鮮明度のみで選択
+        print("No text detected, selecting by sharpness only")
+
+    for _, text, confidence in text_results:
+        print(f"Annotated text: {text} (confidence: {confidence:.2f})")
+
+    if not text_results:
+        return best_image
+    image = await media_executor.run_in_process(annotate_text_regions, best_image, text_results)
+    print(f"Final output: {len(text_results)} text regions annotated, sharpness: {best_sharpness:.2f}")
+    return image
+
+
+class AnnotatedFrameCache:
+    """注釈付きフレームをワークスペースに保存し、正規化したタイムコードで引く.
+
+    画像は annotated_frames/ 以下に置き、index.json にキー・ファイル名・ETag を記録する。
+    """
+
+    def __init__(self, workspace_dir: Path) -> None:
+        self.directory = Path(workspace_dir) / ANNOTATED_FRAMES_DIRNAME
+        self.index_path = self.directory / INDEX_FILENAME
+
+    def _load_index(self) -> Dict[str, dict]:
+        try:
+            return json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key: str) -> Optional[Tuple[Path, str]]:
+        """キャッシュ済みなら (画像パス, ETag) を返す."""
+
+        entry = self._load_index().get(key)
+        if entry is None:
+            return None
+        path = self.directory / entry["filename"]
+        if not path.exists():
+            return None
+        return path, entry["etag"]
+
+    def put(self, key: str, image: bytes, *, timecode: str) -> Tuple[Path, str]:
+        """画像を保存して索引に登録し、(画像パス, ETag) を返す."""
+
+        digest = hashlib.sha256(image).hexdigest()
+        etag = f'"{digest[:32]}"'
+        filename = f"{key.replace('.', '_')}.jpg"
+        path = self.directory / filename
+        self.directory.mkdir(parents=True, exist_ok=True)
+        _atomic_write(path, image)
+
+        with _index_lock:
+            index = self._load_index()
+            index[key] = {
+                "timecode": timecode,
+                "filename": filename,
+                "etag": etag,
+                "created_at": datetime.now(UTC).isoformat(),
+            }
+            _atomic_write(
+                self.index_path,
+                json.dumps(index, ensure_ascii=False, indent=2).encode("utf-8"),
+            )
+        return path, etag
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    temp_path.write_bytes(data)
+    os.replace(temp_path, path)
+
+
+async def precompute_annotated_frames(
+    video_path: Path, workspace_dir: Path, timecodes: Sequence[str]
+) -> int:
+    """まだキャッシュに無いタイムコードの注釈付きフレームを作成し、作成した枚数を返す."""
+
+    cache = AnnotatedFrameCache(workspace_dir)
+    created = 0
+    for timecode in timecodes:
+        key = normalize_timecode(timecode)
+        if key is None or await asyncio.to_thread(cache.get, key) is not None:
+            continue
+        try:
+            image = await render_annotated_frame(video_path, float(key))
+        except ImportError as exc:
+            # OpenCV / EasyOCR が入っていない環境ではリクエスト時の生成にも使えないので打ち切る
+            logger.warning("Skipping annotated frame precompute: %s", exc)
+            break
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.warning("Failed to precompute annotated frame at %s: %s", timecode, exc)
+            continue
+        await asyncio.to_thread(cache.put, key, image, timecode=timecode)
+        created += 1
+    return created
@@ -0,0 +1,237 @@
+"""長尺音声を無音区間で分割し、チャンクごとの文字起こしを絶対タイムコードでつなぎ直す."""
+
+from __future__ import annotations
+
+import asyncio
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+from backend.utils.media_jobs import MediaExecutor, get_media_executor, parse_ffmpeg_duration
+from backend.utils.tag_frames import parse_timecode
+
+DEFAULT_CHUNK_SECONDS = 120.0
+DEFAULT_OVERLAP_SECONDS = 3.0
+# 目標の切れ目からこの秒数以内にある無音区間を探して、そこで切る
+DEFAULT_SEARCH_WINDOW_SECONDS = 15.0
+SILENCE_NOISE_DB = -35
+SILENCE_MIN_SECONDS = 0.4
+# 無音検出は音声全体をデコードするので、通常の ffmpeg 呼び出しより長く待つ
+PROBE_TIMEOUT_SECONDS = 300.0
+CHUNK_SAMPLE_RATE = 16000
+
+_SILENCE_START_PATTERN = re.compile(r"silence_start:\s*(-?\d+(?:\.\d+)?)")
+_SILENCE_END_PATTERN = re.compile(r"silence_end:\s*(-?\d+(?:\.\d+)?)")
+_TIMED_LINE_PATTERN = re.compile(r"^\s*\[?\s*((?:\d+:)?\d{1,2}:\d{2}(?:\.\d+)?)\s*\]?\s*[-:：]?\s*(.*)$")
+
+
+@dataclass(frozen=True)
+class AudioChunk:
+    """分割したチャンク. start〜end を切り出し、owned_start〜owned_end の発話だけを採用する."""
+
+    index: int
+    start: float
+    end: float
+    owned_start: float
+    owned_end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+@dataclass(frozen=True)
+class TimedLine:
+    seconds: Optional[float]
+    text: str
+
+
+def parse_silencedetect_log(log: str) -> Tuple[Optional[float], List[Tuple[float, float]]]:
+    """ffmpeg の silencedetect ログから (全体の長さ, 無音区間のリスト) を取り出す."""
+
+    duration = parse_ffmpeg_duration(log)
+    silences: List[Tuple[float, float]] = []
+    start: Optional[float] = None
+    for line in log.splitlines():
+        start_match = _SILENCE_START_PATTERN.search(line)
+        if start_match:
+            start = max(0.0, float(start_match.group(1)))
+            continue
+        end_match = _SILENCE_END_PATTERN.search(line)
+        if end_match and start is not None:
+            silences.append((start, float(end_match.group(1))))
+            start = None
+    if start is not None and duration is not None:
+        # 末尾まで無音のまま終わった区間
+        silences.append((start, duration))
+    return duration, silences
+
+
+async def detect_silences(
+    audio_path: Path, *, executor: Optional[MediaExecutor] = None
+) -> Tuple[Optional[float], List[Tuple[float, float]]]:
+    """音声の長さと無音区間を 1 回の ffmpeg デコードで求める.
+
+    ffmpeg の失敗は MediaJobError (起動できなければ OSError) として送出する。
+    """
+
+    executor = executor or get_media_executor()
+    log = await executor.ffmpeg_log(
+        [
+            "-hide_banner",
+            "-nostats",
+            "-i", str(audio_path),
+            "-vn",
+            "-af", f"silencedetect=noise={SILENCE_NOISE_DB}dB:d={SILENCE_MIN_SECONDS}",
+            "-f", "null",
+            "-",
+        ],
+        timeout=PROBE_TIMEOUT_SECONDS,
+    )
+    return parse_silencedetect_log(log)
+
+
+def plan_chunks(
+    duration: float,
+    silences: Sequence[Tuple[float, float]],
+    *,
+    chunk_seconds: float = DEFAULT_CHUNK_SECONDS,
+    overlap: float = DEFAULT_OVERLAP_SECONDS,
+    search_window: Optional[float] = None,
+) -> List[AudioChunk]:
+    """chunk_seconds ごとの目標位置に最も近い無音区間の中央で切れ目を決める.
+
+    近くに無音が無ければ目標位置でそのまま切る。各チャンクは前後に overlap 秒ずつ
+    余分に切り出し、境界をまたぐ発話も取りこぼさないようにする。
+    search_window を省略した場合はチャンク長の 1/4 (最大 15 秒) を探す。
+    """
+
+    if duration <= 0:
+        return []
+    if search_window is None:
+        search_window = min(DEFAULT_SEARCH_WINDOW_SECONDS, chunk_seconds / 4)
+    midpoints = sorted((start + end) / 2 for start, end in silences if end > start)
+    cuts: List[float] = []
+    previous = 0.0
+    target = chunk_seconds
+    while duration - previous > chunk_seconds + search_window:
+        candidates = [
+            point for point in midpoints
+            if abs(point - target) <= search_window and point - previous >= chunk_seconds / 2
+        ]
+        cut = min(candidates, key=lambda point: abs(point - target)) if candidates else target
+        cuts.append(cut)
+        previous = cut
+        target = cut + chunk_seconds
+
+    boundaries = [0.0, *cuts, duration]
+    return [
+        AudioChunk(
+            index=index,
+            start=max(0.0, owned_start - overlap),
+            end=min(duration, owned_end + overlap),
+            owned_start=owned_start,
+            owned_end=owned_end,
+        )
+        for index, (owned_start, owned_end) in enumerate(zip(boundaries, boundaries[1:]))
+    ]
+
+
+async def split_audio(
+    audio_path: Path,
+    chunks: Sequence[AudioChunk],
+    output_dir: Path,
+    *,
+    executor: Optional[MediaExecutor] = None,
+) -> List[Path]:
+    """チャンクごとに 16 kHz モノラルの FLAC を切り出す (ffmpeg は executor の上限まで並列に動く)."""
+
+    executor = executor or get_media_executor()
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    async def cut(chunk: AudioChunk) -> Path:
+        output_path = output_dir / f"chunk_{chunk.index:04d}.flac"
+        await executor.run_ffmpeg(
+            [
+                "-hide_banner",
+                "-loglevel", "error",
+                "-ss", f"{chunk.start:.3f}",
+                "-t", f"{chunk.duration:.3f}",
+                "-i", str(audio_path),
+                "-vn",
+                "-ac", "1",
+                "-ar", str(CHUNK_SAMPLE_RATE),
+                "-c:a", "flac",
+                "-y",
+                str(output_path),
+            ],
+            timeout=executor.ffmpeg_timeout + chunk.duration / 10,
+        )
+        return output_path
+
+    return list(await asyncio.gather(*(cut(chunk) for chunk in chunks)))
+
+
+def parse_timed_lines(text: str) -> List[TimedLine]:
+    """"[mm:ss] 発話" 形式の文字起こしを行ごとに分解する (時刻の無い行は seconds=None)."""
+
+    lines = []
+    for raw in text.splitlines():
+        if not raw.strip():
+            continue
+        match = _TIMED_LINE_PATTERN.match(raw)
+        if match and match.group(2).strip():
+            lines.append(TimedLine(parse_timecode(match.group(1)), match.group(2).strip()))
+        else:
+            lines.append(TimedLine(None, raw.strip()))
+    return lines
+
+
+def format_timecode(seconds: float) -> str:
+    total = int(seconds)
+    hours, remainder = divmod(total, 3600)
+    minutes, secs = divmod(remainder, 60)
+    if hours:
+        return f"{hours:d}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+def _normalize_text(text: str) -> str:
+    return re.sub(r"[\s、。,.!?！？「」]", "", text)
+
+
+def stitch_transcripts(
+    chunks: Sequence[AudioChunk],
+    transcripts: Sequence[str],
+    *,
+    overlap: float = DEFAULT_OVERLAP_SECONDS,
+) -> str:
+    """チャンクごとの文字起こしを絶対タイムコードに直して 1 本にまとめる.
+
+    各チャンクからは自分の担当範囲 (owned_start〜owned_end) に始まる行だけを採用する。
+    タイムコードのずれで両側に残った重複は、境界付近で同じ文面の行を落として除く。
+    """
+
+    stitched: List[Tuple[float, str]] = []
+    for chunk, transcript in zip(chunks, transcripts):
+        is_last = chunk.index == len(chunks) - 1
+        # 重複の判定は直前のチャンクの末尾の行とだけ行う (同じチャンク内の繰り返しは残す)
+        previous_tail = [
+            (seconds, _normalize_text(text))
+            for seconds, text in stitched[-5:]
+            if chunk.owned_start - seconds <= overlap * 2
+        ]
+        current = chunk.owned_start
+        for line in parse_timed_lines(transcript):
+            if line.seconds is not None:
+                current = chunk.start + line.seconds
+            if current < chunk.owned_start - 1e-6 or (not is_last and current >= chunk.owned_end):
+                continue
+            normalized = _normalize_text(line.text)
+            if normalized and current - chunk.owned_start <= overlap * 2 and any(
+                text == normalized for _, text in previous_tail
+            ):
+                continue
+            stitched.append((current, line.text))
+    return "\n".join(f"[{format_timecode(seconds)}] {text}" for seconds, text in stitched)
@@ -0,0 +1,142 @@
+"""動画フレームのデコードと鮮明度評価ユーティリティ."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, List, Optional, Sequence, Tuple
+
+DEFAULT_WINDOW_SECONDS = 0.5
+DEFAULT_STEP_SECONDS = 0.1
+LABEL_MAX_CHARS = 20
+# OCR 候補としてプロセス間で受け渡すフレームの JPEG 品質 (注釈付き画像の元になるため高めにとる)
+CANDIDATE_JPEG_QUALITY = 95
+
+
+def decode_frame_window(
+    video_path: Path,
+    center_seconds: float,
+    *,
+    radius: float = DEFAULT_WINDOW_SECONDS,
+    step: float = DEFAULT_STEP_SECONDS,
+) -> List[Tuple[float, Any]]:
+    """center_seconds ± radius の範囲を 1 回のシークで読み、step 秒ごとのフレームを返す.
+
+    戻り値は (時刻, BGR の ndarray) のリスト。ファイルへは書き出さない。
+    """
+
+    import cv2
+
+    start = max(0.0, center_seconds - radius)
+    end = center_seconds + radius
+    targets = []
+    offset = start
+    while offset <= end + 1e-6:
+        targets.append(round(offset, 3))
+        offset += step
+
+    capture = cv2.VideoCapture(str(video_path))
+    if not capture.isOpened():
+        return []
+
+    frames: List[Tuple[float, Any]] = []
+    try:
+        capture.set(cv2.CAP_PROP_POS_MSEC, start * 1000)
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        tolerance = 0.5 / fps
+        next_index = 0
+        while next_index < len(targets):
+            ok, frame = capture.read()
+            if not ok:
+                break
+            position = capture.get(cv2.CAP_PROP_POS_MSEC) / 1000
+            # シーク直後はキーフレーム位置によって少し手前から返ることがあるので読み飛ばす
+            if position + tolerance < targets[next_index]:
+                continue
+            frames.append((position, frame))
+            while next_index < len(targets) and targets[next_index] <= position + tolerance:
+                next_index += 1
+    finally:
+        capture.release()
+    return frames
+
+
+def laplacian_sharpness(frames: Sequence[Any]) -> List[float]:
+    """各フレームのラプラシアン分散 (値が大きいほど鮮明) をまとめて計算する."""
+
+    import cv2
+
+    scores = []
+    for frame in frames:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        scores.append(float(cv2.Laplacian(gray, cv2.CV_64F).var()))
+    return scores
+
+
+def _encode_jpeg(frame: Any, quality: int) -> bytes:
+    import cv2
+
+    encoded, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not encoded:
+        raise ValueError("JPEG encoding failed")
+    return buffer.tobytes()
+
+
+def decode_and_score_window(
+    video_path: Path, center_seconds: float, encode_top: int = 1
+) -> List[Tuple[float, float, Optional[bytes]]]:
+    """窓内のフレームを鮮明度で評価し、(時刻, 鮮明度, JPEG) を鮮明な順に返す (プロセスプール用).
+
+    4K 素材ではフレーム 1 枚が数十 MB になるため ndarray はプロセス間で受け渡さず、
+    上位 encode_top 件だけ JPEG にして返す (残りは None)。
+    """
+
+    frames = decode_frame_window(video_path, center_seconds)
+    scores = laplacian_sharpness([frame for _, frame in frames])
+    ranked = sorted(zip(frames, scores), key=lambda item: item[1], reverse=True)
+    return [
+        (timestamp, score, _encode_jpeg(frame, CANDIDATE_JPEG_QUALITY) if rank < encode_top else None)
+        for rank, ((timestamp, frame), score) in enumerate(ranked)
+    ]
+
+
+def encode_window_frames(
+    video_path: Path, center_seconds: float, timestamps: Sequence[float]
+) -> List[bytes]:
+    """窓を読み直し、timestamps の各時刻のフレームを JPEG にして同じ順で返す (プロセスプール用)."""
+
+    wanted = {round(timestamp, 3): index for index, timestamp in enumerate(timestamps)}
+    encoded: List[Optional[bytes]] = [None] * len(timestamps)
+    for timestamp, frame in decode_frame_window(video_path, center_seconds):
+        index = wanted.get(round(timestamp, 3))
+        if index is not None:
+            encoded[index] = _encode_jpeg(frame, CANDIDATE_JPEG_QUALITY)
+    return [image for image in encoded if image is not None]
+
+
+def annotate_text_regions(image: bytes, detections: Sequence[Any], *, quality: int = 95) -> bytes:
+    """JPEG 画像に EasyOCR の検出結果 (bbox, text, confidence) を赤枠とラベルで描き、JPEG で返す."""
+
+    import cv2
+    import numpy as np
+
+    annotated = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if annotated is None:
+        raise ValueError("JPEG decoding failed")
+    for bbox, text, _confidence in detections:
+        # bboxは[[x1,y1], [x2,y2], [x3,y3], [x4,y4]]の形式
+        points = np.array(bbox, dtype=np.int32)
+        cv2.polylines(annotated, [points], True, (0, 0, 255), 3)
+
+        label = text[:LABEL_MAX_CHARS]
+        label_pos = (int(bbox[0][0]), max(int(bbox[0][1]) - 10, 20))
+        (label_w, label_h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
+        cv2.rectangle(
+            annotated,
+            (label_pos[0], label_pos[1] - label_h - 5),
+            (label_pos[0] + label_w, label_pos[1] + 5),
+            (0, 0, 255),
+            -1,
+        )
+        cv2.putText(annotated, label, label_pos, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+
+    return _encode_jpeg(annotated, quality)
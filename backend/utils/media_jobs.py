@@ -0,0 +1,243 @@
+"""ffmpeg / OpenCV などの重いメディア処理をイベントループの外で実行する."""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Awaitable, Callable, Optional, Sequence, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_FFMPEG_TIMEOUT = 10.0
+DEFAULT_JOB_TIMEOUT = 30.0
+DISCONNECT_POLL_SECONDS = 0.5
+
+_DURATION_PATTERN = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+
+class MediaJobError(RuntimeError):
+    """メディア処理ジョブが失敗した."""
+
+
+class MediaJobTimeout(MediaJobError):
+    """メディア処理ジョブが制限時間内に終わらなかった."""
+
+
+class ClientDisconnected(Exception):
+    """処理の完了前にクライアントが切断した."""
+
+
+def _default_workers() -> int:
+    return max(1, min(4, os.cpu_count() or 1))
+
+
+class MediaExecutor:
+    """ffmpeg サブプロセスと CPU 処理用プロセスプールの同時実行数を制限して実行する."""
+
+    def __init__(
+        self,
+        *,
+        ffmpeg_concurrency: Optional[int] = None,
+        process_workers: Optional[int] = None,
+        ffmpeg_timeout: float = DEFAULT_FFMPEG_TIMEOUT,
+        job_timeout: float = DEFAULT_JOB_TIMEOUT,
+        ffmpeg_binary: str = "ffmpeg",
+        ffprobe_binary: str = "ffprobe",
+    ) -> None:
+        self.ffmpeg_concurrency = max(1, ffmpeg_concurrency or _default_workers())
+        self.process_workers = max(1, process_workers or _default_workers())
+        self.ffmpeg_timeout = ffmpeg_timeout
+        self.job_timeout = job_timeout
+        self.ffmpeg_binary = ffmpeg_binary
+        self.ffprobe_binary = ffprobe_binary
+        # Semaphore はイベントループごとに作り直す (テストなどでループが変わるため)
+        self._ffmpeg_slots: Optional[asyncio.Semaphore] = None
+        self._ffmpeg_slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "MediaExecutor":
+        ffmpeg_concurrency = os.getenv("MEDIA_FFMPEG_CONCURRENCY")
+        process_workers = os.getenv("MEDIA_PROCESS_WORKERS")
+        return cls(
+            ffmpeg_concurrency=int(ffmpeg_concurrency) if ffmpeg_concurrency else None,
+            process_workers=int(process_workers) if process_workers else None,
+            ffmpeg_timeout=float(os.getenv("MEDIA_FFMPEG_TIMEOUT", DEFAULT_FFMPEG_TIMEOUT)),
+            job_timeout=float(os.getenv("MEDIA_JOB_TIMEOUT", DEFAULT_JOB_TIMEOUT)),
+        )
+
+    def _slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._ffmpeg_slots is None or self._ffmpeg_slots_loop is not loop:
+            self._ffmpeg_slots = asyncio.Semaphore(self.ffmpeg_concurrency)
+            self._ffmpeg_slots_loop = loop
+        return self._ffmpeg_slots
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # 親プロセスはスレッドを多数持つため fork ではなく spawn で起動する
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.process_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    async def run_ffmpeg(self, args: Sequence[str], *, timeout: Optional[float] = None) -> bytes:
+        """ffmpeg を非同期サブプロセスで実行し、標準出力を返す.
+
+        タイムアウトや呼び出し側のキャンセル時はプロセスを kill する。
+        """
+
+        stdout, _ = await self._run_ffmpeg(args, timeout)
+        return stdout
+
+    async def ffmpeg_log(self, args: Sequence[str], *, timeout: Optional[float] = None) -> str:
+        """ffmpeg を実行し、標準エラーに出たログ (silencedetect などの解析結果) を返す."""
+
+        _, stderr = await self._run_ffmpeg(args, timeout)
+        return stderr.decode(errors="replace")
+
+    async def run_ffprobe(self, args: Sequence[str], *, timeout: Optional[float] = None) -> str:
+        """ffprobe を実行し、標準出力をテキストで返す (失敗時の扱いは run_ffmpeg と同じ)."""
+
+        stdout, _ = await self._run_ffmpeg(args, timeout, binary=self.ffprobe_binary)
+        return stdout.decode(errors="replace")
+
+    async def _run_ffmpeg(
+        self, args: Sequence[str], timeout: Optional[float], *, binary: Optional[str] = None
+    ) -> Tuple[bytes, bytes]:
+        binary = binary or self.ffmpeg_binary
+        timeout = self.ffmpeg_timeout if timeout is None else timeout
+        async with self._slots():
+            process = await asyncio.create_subprocess_exec(
+                binary,
+                *args,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+            except asyncio.TimeoutError as exc:
+                await _kill(process)
+                raise MediaJobTimeout(f"{os.path.basename(binary)} timed out after {timeout:.1f}s") from exc
+            except asyncio.CancelledError:
+                await _kill(process)
+                raise
+        if process.returncode != 0:
+            raise MediaJobError(
+                f"{os.path.basename(binary)} exited with {process.returncode}: "
+                f"{stderr.decode(errors='replace').strip()[-500:]}"
+            )
+        return stdout, stderr
+
+    async def run_in_process(
+        self,
+        fn: Callable[..., T],
+        *args: Any,
+        timeout: Optional[float] = None,
+    ) -> T:
+        """fn をプロセスプールで実行する (fn と引数は pickle 可能であること).
+
+        タイムアウト時はまだ始まっていなければジョブを取り消す。実行中のジョブは
+        最後まで走るが、結果は捨てられる。
+        """
+
+        timeout = self.job_timeout if timeout is None else timeout
+        future = asyncio.get_running_loop().run_in_executor(self._get_pool(), fn, *args)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError as exc:
+            raise MediaJobTimeout(f"{getattr(fn, '__name__', fn)} timed out after {timeout:.1f}s") from exc
+
+    async def warm_up(self, *modules: str) -> None:
+        """全ワーカープロセスを起動し、modules を先に import しておく."""
+
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        await asyncio.gather(
+            *(
+                loop.run_in_executor(pool, _import_modules, modules)
+                for _ in range(self.process_workers)
+            )
+        )
+
+    def shutdown(self) -> None:
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def parse_ffmpeg_duration(log: str) -> Optional[float]:
+    """ffmpeg のログにある入力の長さ (Duration: HH:MM:SS.ss) を秒で返す."""
+
+    match = _DURATION_PATTERN.search(log)
+    if match is None:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def _import_modules(modules: Sequence[str]) -> None:
+    for module in modules:
+        importlib.import_module(module)
+
+
+async def _kill(process: asyncio.subprocess.Process) -> None:
+    if process.returncode is None:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+    await process.wait()
+
+
+async def cancel_on_disconnect(
+    is_disconnected: Callable[[], Awaitable[bool]],
+    work: Awaitable[T],
+    *,
+    poll_interval: float = DISCONNECT_POLL_SECONDS,
+) -> T:
+    """work を実行し、クライアントが切断したらキャンセルして ClientDisconnected を送出する."""
+
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await is_disconnected():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+_default_executor: Optional[MediaExecutor] = None
+_default_executor_lock = threading.Lock()
+
+
+def get_media_executor() -> MediaExecutor:
+    """プロセス内で共有するメディア処理の実行器を返す."""
+
+    global _default_executor  # pylint: disable=global-statement
+    with _default_executor_lock:
+        if _default_executor is None:
+            _default_executor = MediaExecutor.from_env()
+        return _default_executor
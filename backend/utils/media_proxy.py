@@ -0,0 +1,199 @@
+"""Gemini に送る前に解析用の軽量プロキシ (縮小した映像 + 16 kHz モノラル音声) を作る."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from backend.utils.media_jobs import MediaExecutor, MediaJobError, get_media_executor
+
+logger = logging.getLogger(__name__)
+
+PROXY_DIRNAME = "analysis_proxy"
+PROXY_VIDEO_NAME = "proxy.mp4"
+PROXY_AUDIO_NAME = "audio.flac"
+PROXY_META_NAME = "proxy.json"
+DEFAULT_PROXY_MAX_DIMENSION = 1280
+DEFAULT_PROXY_FPS = 5
+DEFAULT_PROXY_CRF = 28
+AUDIO_SAMPLE_RATE = 16000
+# 長尺の素材でもタイムアウトしないよう、変換は通常の ffmpeg 呼び出しより長く待つ
+PROXY_TIMEOUT_SECONDS = 600.0
+
+
+@dataclass(frozen=True)
+class AnalysisMedia:
+    """解析ステップごとに使うメディア (プロキシを作れなければ元ファイル)."""
+
+    source: Path
+    video: Path
+    audio: Optional[Path] = None
+
+    @property
+    def is_proxy(self) -> bool:
+        return self.video != self.source
+
+
+@dataclass(frozen=True)
+class ProxySettings:
+    max_dimension: int = DEFAULT_PROXY_MAX_DIMENSION
+    fps: int = DEFAULT_PROXY_FPS
+    crf: int = DEFAULT_PROXY_CRF
+
+    @classmethod
+    def from_env(cls) -> "ProxySettings":
+        return cls(
+            max_dimension=int(os.getenv("ANALYSIS_PROXY_MAX_DIMENSION", DEFAULT_PROXY_MAX_DIMENSION)),
+            fps=int(os.getenv("ANALYSIS_PROXY_FPS", DEFAULT_PROXY_FPS)),
+            crf=int(os.getenv("ANALYSIS_PROXY_CRF", DEFAULT_PROXY_CRF)),
+        )
+
+
+def proxy_enabled() -> bool:
+    return os.getenv("ANALYSIS_PROXY", "true").lower() not in {"0", "false", "no"}
+
+
+def _video_filter(settings: ProxySettings) -> str:
+    # 長辺を max_dimension 以下に縮小し (縦長素材も考慮)、固定フレームレートにそろえる
+    limit = settings.max_dimension
+    return (
+        f"scale='if(gte(iw,ih),min({limit},iw),-2)':'if(gte(iw,ih),-2,min({limit},ih))',"
+        f"fps={settings.fps}"
+    )
+
+
+def _source_signature(source: Path, settings: ProxySettings) -> dict:
+    stat = source.stat()
+    return {
+        "source": source.name,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "max_dimension": settings.max_dimension,
+        "fps": settings.fps,
+        "crf": settings.crf,
+    }
+
+
+async def _has_audio_stream(source: Path, executor: MediaExecutor) -> Optional[bool]:
+    """ffprobe で音声ストリームの有無を調べる (調べられなければ None)."""
+
+    try:
+        output = await executor.run_ffprobe(
+            [
+                "-v", "error",
+                "-select_streams", "a",
+                "-show_entries", "stream=index",
+                "-of", "csv=p=0",
+                str(source),
+            ]
+        )
+    except (MediaJobError, OSError) as exc:
+        logger.warning("Could not probe audio streams of %s: %s", source.name, exc)
+        return None
+    return bool(output.strip())
+
+
+async def prepare_analysis_media(
+    source: Path,
+    workspace_dir: Path,
+    *,
+    settings: Optional[ProxySettings] = None,
+    executor: Optional[MediaExecutor] = None,
+) -> AnalysisMedia:
+    """source の解析用プロキシをワークスペースに作り (作成済みなら再利用し)、その場所を返す.
+
+    ffmpeg が使えない・変換に失敗した場合は元ファイルをそのまま使う。
+    ffprobe で音声ストリームが無いと確認できた素材だけ audio を None にする。
+    音声の取り出しがそれ以外の理由で失敗した場合は、audio に元ファイルを返す。
+    """
+
+    settings = settings or ProxySettings.from_env()
+    executor = executor or get_media_executor()
+    proxy_dir = workspace_dir / PROXY_DIRNAME
+    video_path = proxy_dir / PROXY_VIDEO_NAME
+    audio_path = proxy_dir / PROXY_AUDIO_NAME
+    meta_path = proxy_dir / PROXY_META_NAME
+
+    signature = _source_signature(source, settings)
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        meta = None
+    if meta is not None and meta.get("signature") == signature and video_path.exists():
+        audio: Optional[Path] = None
+        if meta.get("has_audio"):
+            # 取り出した音声が消えていても、音声がある素材の文字起こしは省かない
+            audio = audio_path if audio_path.exists() else source
+        return AnalysisMedia(source=source, video=video_path, audio=audio)
+
+    proxy_dir.mkdir(parents=True, exist_ok=True)
+    # 作り直す間に失敗しても、前の版の has_audio を使い回さない
+    meta_path.unlink(missing_ok=True)
+    try:
+        await executor.run_ffmpeg(
+            [
+                "-hide_banner",
+                "-loglevel", "error",
+                "-i", str(source),
+                "-map", "0:v:0",
+                "-vf", _video_filter(settings),
+                "-c:v", "libx264",
+                "-preset", "veryfast",
+                "-crf", str(settings.crf),
+                "-pix_fmt", "yuv420p",
+                "-an",
+                "-movflags", "+faststart",
+                "-y",
+                str(video_path),
+            ],
+            timeout=PROXY_TIMEOUT_SECONDS,
+        )
+    except (MediaJobError, OSError) as exc:
+        logger.warning("Could not build analysis proxy for %s, using original: %s", source.name, exc)
+        return AnalysisMedia(source=source, video=source, audio=None)
+
+    # 音声トラックが無いと確認できた場合だけ文字起こしを省く (audio=None)
+    has_audio = await _has_audio_stream(source, executor) is not False
+    if has_audio:
+        try:
+            await executor.run_ffmpeg(
+                [
+                    "-hide_banner",
+                    "-loglevel", "error",
+                    "-i", str(source),
+                    "-map", "0:a:0",
+                    "-vn",
+                    "-ac", "1",
+                    "-ar", str(AUDIO_SAMPLE_RATE),
+                    "-c:a", "flac",
+                    "-y",
+                    str(audio_path),
+                ],
+                timeout=PROXY_TIMEOUT_SECONDS,
+            )
+        except (MediaJobError, OSError) as exc:
+            # 一時的な失敗 (タイムアウト・容量不足など) で文字起こしが消えないよう、
+            # 元ファイルを文字起こしに回す。結果は保存せず、次回の実行で作り直す
+            logger.warning(
+                "Could not extract audio from %s, transcribing the original: %s", source.name, exc
+            )
+            return AnalysisMedia(source=source, video=video_path, audio=source)
+    else:
+        logger.info("No audio stream in %s; transcription will be skipped", source.name)
+
+    meta_path.write_text(
+        json.dumps({"signature": signature, "has_audio": has_audio}, ensure_ascii=False),
+        encoding="utf-8",
+    )
+    logger.info(
+        "Analysis proxy ready for %s: %.1f MB -> video %.1f MB%s",
+        source.name,
+        source.stat().st_size / 1e6,
+        video_path.stat().st_size / 1e6,
+        f", audio {audio_path.stat().st_size / 1e6:.1f} MB" if has_audio else "",
+    )
+    return AnalysisMedia(source=source, video=video_path, audio=audio_path if has_audio else None)
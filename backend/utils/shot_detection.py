@@ -0,0 +1,280 @@
+"""ショット境界 (カット) を CPU で検出し、案件ごとのショット索引と代表フレームを作る."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from backend.utils.media_jobs import (
+    MediaExecutor,
+    MediaJobError,
+    get_media_executor,
+    parse_ffmpeg_duration,
+)
+from backend.utils.tag_frames import extract_frames_batch, parse_timecode
+
+logger = logging.getLogger(__name__)
+
+SHOTS_DIRNAME = "shots"
+SHOT_INDEX_NAME = "shots.json"
+DEFAULT_SCENE_THRESHOLD = 0.3
+DEFAULT_MIN_SHOT_SECONDS = 0.5
+# タイムコードの端がこの秒数以内にショット境界があれば、そこへ合わせる
+DEFAULT_SNAP_TOLERANCE_SECONDS = 1.0
+# フレーム差分は縮小した画像で求める (検出精度はほぼ変わらず、デコード後の処理が軽い)
+DETECTION_WIDTH = 160
+DETECTION_TIMEOUT_SECONDS = 300.0
+
+_PTS_TIME_PATTERN = re.compile(r"pts_time:\s*(\d+(?:\.\d+)?)")
+_RANGE_SEPARATOR = re.compile(r"\s*(?:-|〜|～|~|–)\s*")
+
+
+@dataclass(frozen=True)
+class Shot:
+    index: int
+    start: float
+    end: float
+    keyframe: Optional[str] = None
+
+    @property
+    def midpoint(self) -> float:
+        return (self.start + self.end) / 2
+
+    @property
+    def timecode(self) -> str:
+        return f"{format_seconds(self.start)}-{format_seconds(self.end)}"
+
+
+@dataclass
+class ShotIndex:
+    """案件のショット一覧. 代表フレームは directory 以下に置く."""
+
+    duration: float
+    shots: List[Shot]
+    directory: Path
+    signature: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def boundaries(self) -> List[float]:
+        return [shot.start for shot in self.shots] + [self.duration]
+
+    @property
+    def keyframes(self) -> List[Path]:
+        return [self.directory / shot.keyframe for shot in self.shots if shot.keyframe]
+
+    def has_keyframes(self) -> bool:
+        return bool(self.shots) and all(
+            shot.keyframe and (self.directory / shot.keyframe).exists() for shot in self.shots
+        )
+
+    def shot(self, number: int) -> Optional[Shot]:
+        """1 始まりのショット番号からショットを引く."""
+
+        if 1 <= number <= len(self.shots):
+            return self.shots[number - 1]
+        return None
+
+    def snap(self, seconds: float, *, tolerance: float = DEFAULT_SNAP_TOLERANCE_SECONDS) -> float:
+        """seconds に最も近いショット境界が tolerance 以内にあればその時刻を返す."""
+
+        nearest = min(self.boundaries, key=lambda boundary: abs(boundary - seconds))
+        return nearest if abs(nearest - seconds) <= tolerance else seconds
+
+    def snap_timecode(
+        self, timecode: str, *, tolerance: float = DEFAULT_SNAP_TOLERANCE_SECONDS
+    ) -> str:
+        """"00:05-00:08" のような区間の両端をショット境界に合わせる (解釈できなければそのまま)."""
+
+        parts = _RANGE_SEPARATOR.split(timecode.strip())
+        seconds = [parse_timecode(part) for part in parts]
+        if not 1 <= len(parts) <= 2 or any(value is None for value in seconds):
+            return timecode
+        return "-".join(format_seconds(self.snap(value, tolerance=tolerance)) for value in seconds)
+
+    def to_dict(self) -> dict:
+        return {
+            "signature": self.signature,
+            "duration": self.duration,
+            "shots": [
+                {
+                    "index": shot.index,
+                    "start": round(shot.start, 3),
+                    "end": round(shot.end, 3),
+                    "timecode": shot.timecode,
+                    "keyframe": shot.keyframe,
+                }
+                for shot in self.shots
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, payload: dict, directory: Path) -> "ShotIndex":
+        return cls(
+            duration=float(payload["duration"]),
+            shots=[
+                Shot(
+                    index=int(item["index"]),
+                    start=float(item["start"]),
+                    end=float(item["end"]),
+                    keyframe=item.get("keyframe"),
+                )
+                for item in payload.get("shots", [])
+            ],
+            directory=directory,
+            signature=payload.get("signature") or {},
+        )
+
+
+def format_seconds(seconds: float) -> str:
+    """秒を MM:SS.s (1 時間以上は H:MM:SS.s) の表記にする."""
+
+    minutes, secs = divmod(max(0.0, round(seconds, 1)), 60)
+    hours, minutes = divmod(int(minutes), 60)
+    if hours:
+        return f"{hours:d}:{minutes:02d}:{secs:04.1f}"
+    return f"{minutes:02d}:{secs:04.1f}"
+
+
+def shot_detection_enabled() -> bool:
+    return os.getenv("SHOT_DETECTION", "true").lower() not in {"0", "false", "no"}
+
+
+def parse_scene_log(log: str) -> Tuple[Optional[float], List[float]]:
+    """select=gt(scene,…),showinfo のログから (全体の長さ, 切り替わり時刻のリスト) を取り出す."""
+
+    cuts = [
+        float(match.group(1))
+        for line in log.splitlines()
+        if "showinfo" in line and (match := _PTS_TIME_PATTERN.search(line))
+    ]
+    return parse_ffmpeg_duration(log), sorted(cuts)
+
+
+def build_shots(
+    duration: float, cuts: Sequence[float], *, min_shot_seconds: float = DEFAULT_MIN_SHOT_SECONDS
+) -> List[Shot]:
+    """切り替わり時刻からショット一覧を作る. min_shot_seconds より短いショットは前につなげる."""
+
+    boundaries = [0.0]
+    for cut in sorted(cuts):
+        if cut - boundaries[-1] >= min_shot_seconds and duration - cut >= min_shot_seconds:
+            boundaries.append(cut)
+    boundaries.append(duration)
+    return [
+        Shot(index=number, start=start, end=end)
+        for number, (start, end) in enumerate(zip(boundaries, boundaries[1:]), start=1)
+    ]
+
+
+async def detect_shot_boundaries(
+    video_path: Path,
+    *,
+    threshold: float = DEFAULT_SCENE_THRESHOLD,
+    executor: Optional[MediaExecutor] = None,
+) -> Tuple[Optional[float], List[float]]:
+    """ffmpeg のフレーム差分 (scene スコア) で切り替わり時刻を求める.
+
+    ffmpeg の失敗は MediaJobError (起動できなければ OSError) として送出する。
+    """
+
+    executor = executor or get_media_executor()
+    log = await executor.ffmpeg_log(
+        [
+            "-hide_banner",
+            "-nostats",
+            "-i", str(video_path),
+            "-an",
+            "-vf", f"scale={DETECTION_WIDTH}:-2,select='gt(scene,{threshold})',showinfo",
+            "-f", "null",
+            "-",
+        ],
+        timeout=DETECTION_TIMEOUT_SECONDS,
+    )
+    return parse_scene_log(log)
+
+
+def _signature(video_path: Path, threshold: float, min_shot_seconds: float) -> dict:
+    stat = video_path.stat()
+    return {
+        "source": video_path.name,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "threshold": threshold,
+        "min_shot_seconds": min_shot_seconds,
+    }
+
+
+def load_shot_index(workspace_dir: Path) -> Optional[ShotIndex]:
+    """保存済みのショット索引を読む (無ければ None)."""
+
+    directory = Path(workspace_dir) / SHOTS_DIRNAME
+    try:
+        payload = json.loads((directory / SHOT_INDEX_NAME).read_text(encoding="utf-8"))
+        return ShotIndex.from_dict(payload, directory)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+async def build_shot_index(
+    video_path: Path,
+    workspace_dir: Path,
+    *,
+    threshold: Optional[float] = None,
+    min_shot_seconds: Optional[float] = None,
+    executor: Optional[MediaExecutor] = None,
+) -> Optional[ShotIndex]:
+    """ショット境界を検出して各ショットの中央のフレームを書き出し、shots/shots.json に保存する.
+
+    同じ動画・設定で作成済みなら再利用する。ffmpeg が使えない場合は None を返す。
+    """
+
+    if threshold is None:
+        threshold = float(os.getenv("SHOT_SCENE_THRESHOLD", DEFAULT_SCENE_THRESHOLD))
+    if min_shot_seconds is None:
+        min_shot_seconds = float(os.getenv("SHOT_MIN_SECONDS", DEFAULT_MIN_SHOT_SECONDS))
+    executor = executor or get_media_executor()
+    directory = Path(workspace_dir) / SHOTS_DIRNAME
+    signature = _signature(video_path, threshold, min_shot_seconds)
+
+    cached = load_shot_index(workspace_dir)
+    if cached is not None and cached.signature == signature and cached.has_keyframes():
+        return cached
+
+    try:
+        duration, cuts = await detect_shot_boundaries(video_path, threshold=threshold, executor=executor)
+    except (MediaJobError, OSError) as exc:
+        logger.warning("Shot detection failed for %s: %s", video_path.name, exc)
+        return None
+    if not duration:
+        logger.warning("Could not determine duration of %s for shot detection", video_path.name)
+        return None
+
+    shots = build_shots(duration, cuts, min_shot_seconds=min_shot_seconds)
+    directory.mkdir(parents=True, exist_ok=True)
+    targets = [(shot.midpoint, directory / f"shot_{shot.index:04d}.jpg") for shot in shots]
+    try:
+        written = set(await extract_frames_batch(video_path, targets, executor=executor))
+    except MediaJobError as exc:
+        logger.warning("Keyframe extraction failed for %s: %s", video_path.name, exc)
+        written = set()
+    shots = [
+        Shot(
+            index=shot.index,
+            start=shot.start,
+            end=shot.end,
+            keyframe=path.name if path in written else None,
+        )
+        for shot, (_, path) in zip(shots, targets)
+    ]
+
+    index = ShotIndex(duration=duration, shots=shots, directory=directory, signature=signature)
+    (directory / SHOT_INDEX_NAME).write_text(
+        json.dumps(index.to_dict(), ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+    logger.info("Detected %d shots in %s (%.1fs)", len(shots), video_path.name, duration)
+    return index
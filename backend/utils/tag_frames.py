@@ -0,0 +1,242 @@
+"""リスクタグのタイムコードからサムネイルをまとめて抽出する."""
+
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from backend.utils.media_jobs import (
+    MediaExecutor,
+    MediaJobError,
+    MediaJobTimeout,
+    get_media_executor,
+)
+
+# シーク位置を最初のタイムコードより少し手前にして、キーフレームからのデコードを確実にする
+SEEK_MARGIN_SECONDS = 1.0
+# バッチ全体のタイムアウトは ffmpeg 1 回分 + 1 枚あたり TIMEOUT_PER_FRAME_SECONDS
+# + 最初から最後のタイムコードまでデコードする映像 1 秒あたり TIMEOUT_PER_DECODED_SECOND
+TIMEOUT_PER_FRAME_SECONDS = 1.0
+TIMEOUT_PER_DECODED_SECOND = 1.0
+
+
+def collect_tag_timecodes(risk_data: dict) -> List[dict]:
+    """タグ・サブタグの detected_timecode を重複なく集める."""
+
+    timecodes_to_extract = []
+    for tag in risk_data.get("tags", []):
+        tag_name = tag.get("name", "unknown")
+
+        # メインタグのタイムコード
+        if tag.get("detected_timecode"):
+            timecodes_to_extract.append({
+                "timecode": tag["detected_timecode"],
+                "tag": tag_name,
+                "sub_tag": None
+            })
+
+        # サブタグのタイムコード
+        for sub_tag in tag.get("related_sub_tags", []):
+            if sub_tag.get("detected_timecode"):
+                timecodes_to_extract.append({
+                    "timecode": sub_tag["detected_timecode"],
+                    "tag": tag_name,
+                    "sub_tag": sub_tag.get("name")
+                })
+
+    # 重複を削除
+    seen = set()
+    unique_timecodes = []
+    for item in timecodes_to_extract:
+        tc = item["timecode"]
+        if tc not in seen:
+            seen.add(tc)
+            unique_timecodes.append(item)
+    return unique_timecodes
+
+
+def tag_frame_filename(item: dict) -> str:
+    """タグ情報からサムネイルのファイル名を作る (例: 表現_00-31.jpg)."""
+
+    # タイムコードをファイル名に使える形式に変換 (例: 00:31 -> 00-31)
+    tc_safe = item["timecode"].replace(":", "-")
+    if item["sub_tag"]:
+        filename = f"{item['tag']}_{item['sub_tag']}_{tc_safe}.jpg"
+    else:
+        filename = f"{item['tag']}_{tc_safe}.jpg"
+    # 安全なファイル名に変換（スペースや特殊文字を置換）
+    return filename.replace(" ", "_").replace("/", "_")
+
+
+def build_frames_info(items: Sequence[dict]) -> dict:
+    """tag_frames_info.json の内容を作る."""
+
+    return {
+        "frames": [
+            {
+                "timecode": item["timecode"],
+                "tag": item["tag"],
+                "sub_tag": item["sub_tag"],
+                "filename": tag_frame_filename(item),
+            }
+            for item in items
+        ]
+    }
+
+
+def parse_timecode(timecode: str) -> Optional[float]:
+    """SS / MM:SS / HH:MM:SS(.mmm) を秒に変換する (解釈できなければ None)."""
+
+    try:
+        seconds = 0.0
+        for part in timecode.strip().split(":"):
+            seconds = seconds * 60 + float(part)
+    except ValueError:
+        return None
+    return seconds if seconds >= 0 else None
+
+
+def _select_expression(seconds: Sequence[float]) -> str:
+    # 各時刻をまたいだ最初のフレームだけを選ぶ (先頭フレームは prev_t が NAN)
+    return "+".join(f"gte(t,{value:.3f})*(isnan(prev_t)+lt(prev_t,{value:.3f}))" for value in seconds)
+
+
+async def extract_frames_batch(
+    video_path: Path,
+    targets: Sequence[Tuple[float, Path]],
+    *,
+    executor: Optional[MediaExecutor] = None,
+) -> List[Path]:
+    """(秒, 出力先) の一覧を 1 回の ffmpeg デコードでまとめて JPEG に書き出す.
+
+    同じ時刻を指す出力先にはコピーを置く。書き出せた出力先のリストを返す。
+    タイムアウトはデコードする区間の長さに応じて延ばし、それでも時間切れになった場合は
+    1 枚ずつ抽出し直す。ffmpeg の失敗は MediaJobError として送出する。
+    """
+
+    if not targets:
+        return []
+    executor = executor or get_media_executor()
+
+    outputs_by_second: Dict[float, List[Path]] = {}
+    for seconds, output_path in targets:
+        outputs_by_second.setdefault(round(seconds, 3), []).append(output_path)
+    ordered_seconds = sorted(outputs_by_second)
+
+    output_dir = Path(next(iter(outputs_by_second.values()))[0]).parent
+    output_dir.mkdir(parents=True, exist_ok=True)
+    work_dir = Path(tempfile.mkdtemp(prefix=".batch-", dir=output_dir))
+    decoded_seconds = ordered_seconds[-1] - ordered_seconds[0] + SEEK_MARGIN_SECONDS
+    timeout = (
+        executor.ffmpeg_timeout
+        + TIMEOUT_PER_FRAME_SECONDS * len(ordered_seconds)
+        + TIMEOUT_PER_DECODED_SECOND * decoded_seconds
+    )
+    try:
+        try:
+            await executor.run_ffmpeg(
+                [
+                    "-hide_banner",
+                    "-loglevel", "error",
+                    "-ss", f"{max(0.0, ordered_seconds[0] - SEEK_MARGIN_SECONDS):.3f}",
+                    "-copyts",
+                    "-i", str(video_path),
+                    "-vf", f"select='{_select_expression(ordered_seconds)}'",
+                    "-vsync", "0",
+                    "-frames:v", str(len(ordered_seconds)),
+                    "-q:v", "2",
+                    "-y",
+                    str(work_dir / "%04d.jpg"),
+                ],
+                timeout=timeout,
+            )
+        except MediaJobTimeout:
+            # 1 枚の遅れで全部を失わないよう、個別のタイムアウトで 1 枚ずつ抽出し直す
+            return await _extract_frames_individually(video_path, outputs_by_second, executor)
+
+        frames = sorted(work_dir.glob("*.jpg"))
+        if len(frames) != len(ordered_seconds):
+            # 動画末尾を超えた時刻や、同じフレームに収まる近接した時刻があると枚数が合わない。
+            # その場合は対応が取れないので 1 枚ずつ抽出し直す
+            return await _extract_frames_individually(video_path, outputs_by_second, executor)
+
+        written: List[Path] = []
+        for frame_path, seconds in zip(frames, ordered_seconds):
+            first, *copies = outputs_by_second[seconds]
+            os.replace(frame_path, first)
+            written.append(first)
+            for copy_path in copies:
+                shutil.copyfile(first, copy_path)
+                written.append(copy_path)
+        return written
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+async def _extract_frames_individually(
+    video_path: Path,
+    outputs_by_second: Dict[float, List[Path]],
+    executor: MediaExecutor,
+) -> List[Path]:
+    written: List[Path] = []
+    for seconds, (first, *copies) in outputs_by_second.items():
+        try:
+            await executor.run_ffmpeg(
+                [
+                    "-hide_banner",
+                    "-loglevel", "error",
+                    "-ss", f"{seconds:.3f}",
+                    "-i", str(video_path),
+                    "-vframes", "1",
+                    "-q:v", "2",
+                    "-y",
+                    str(first),
+                ]
+            )
+        except MediaJobError:
+            continue
+        if not first.exists():
+            continue
+        written.append(first)
+        for copy_path in copies:
+            shutil.copyfile(first, copy_path)
+            written.append(copy_path)
+    return written
+
+
+async def extract_tag_frames(
+    video_path: Path,
+    frames_dir: Path,
+    items: Sequence[dict],
+    *,
+    executor: Optional[MediaExecutor] = None,
+) -> Tuple[List[dict], List[dict]]:
+    """collect_tag_timecodes の結果をまとめて frames_dir に書き出し、(成功, 失敗) に分けて返す.
+
+    ffmpeg 自体が失敗した場合は MediaJobError を送出する。
+    """
+
+    frames_dir.mkdir(parents=True, exist_ok=True)
+    targets = []
+    failed = []
+    for item in items:
+        seconds = parse_timecode(item["timecode"])
+        if seconds is None:
+            failed.append(item)
+            continue
+        targets.append((seconds, frames_dir / tag_frame_filename(item), item))
+
+    written = set(
+        await extract_frames_batch(
+            video_path,
+            [(seconds, output_path) for seconds, output_path, _ in targets],
+            executor=executor,
+        )
+    )
+    extracted = []
+    for _, output_path, item in targets:
+        (extracted if output_path in written else failed).append(item)
+    return extracted, failed
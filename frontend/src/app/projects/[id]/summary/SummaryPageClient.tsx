@@ -8,7 +8,9 @@ import clsx from "clsx";
 
 import {
   API_BASE_URL,
+  applyStatusDelta,
   fetchAnalysisStatus,
+  subscribeAnalysisStatus,
   fetchProjectReport,
   fetchAnnotationAnalysis,
   fetchTagFramesInfo,
@@ -59,13 +61,39 @@ function SummaryPageClient({ params }: SummaryPageClientProps) {
   const [videoDuration, setVideoDuration] = useState<number | null>(null);
   const videoRef = useRef<HTMLVideoElement>(null);
 
-  const { data, error, isLoading } = useSWR(
+  // ストリーム接続中はポーリングを止め、切断されたらポーリングに戻す
+  const [isStreaming, setIsStreaming] = useState(false);
+  const { data, error, isLoading, mutate } = useSWR(
     ["analysis-status", id],
     () => fetchAnalysisStatus(id),
     {
-      refreshInterval: POLL_INTERVAL_MS,
+      refreshInterval: isStreaming ? 0 : POLL_INTERVAL_MS,
     },
   );
+  useEffect(() => {
+    if (typeof EventSource === "undefined") {
+      return;
+    }
+    const unsubscribe = subscribeAnalysisStatus(id, {
+      onSnapshot: (status) => {
+        setIsStreaming(true);
+        mutate(status, { revalidate: false });
+      },
+      onDelta: (delta) => {
+        mutate((current) => (current ? applyStatusDelta(current, delta) : current), {
+          revalidate: false,
+        });
+      },
+      onClose: () => {
+        setIsStreaming(false);
+        mutate();
+      },
+    });
+    return () => {
+      unsubscribe();
+      setIsStreaming(false);
+    };
+  }, [id, mutate]);
   useEffect(() => {
     if (data) {
       console.log("[SummaryPage] analysis status payload", data);
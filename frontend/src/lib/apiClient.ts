@@ -10,6 +10,7 @@ export const API_PATH = {
   PROJECT_MEDIA: (id: string) => `/projects/${id}/media`,
   ANALYZE: (id: string) => `/projects/${id}/analyze`,
   STATUS: (id: string) => `/projects/${id}/analysis-status`,
+  EVENTS: (id: string) => `/projects/${id}/events`,
   REPORT: (id: string) => `/projects/${id}/report`,
   ANNOTATIONS: (id: string) => `/projects/${id}/annotations`,
   TAG_FRAMES_INFO: (id: string) => `/projects/${id}/tag-frames-info`,
@@ -88,6 +89,19 @@ export interface ProjectStatusResponse {
   process_flow?: ProcessFlowState;
 }
 
+export interface ProjectStatusDelta {
+  status?: string;
+  analysis_progress?: number;
+  analysis_started_at?: string | null;
+  analysis_completed_at?: string | null;
+  analysis_duration_seconds?: number | null;
+  current_iteration?: number;
+  total_iterations?: number;
+  steps?: AnalysisStep[];
+  logs?: { offset: number; lines: string[] };
+  process_flow_nodes?: { key: string; status: ProcessFlowNode["status"] }[];
+}
+
 export interface RiskRelatedSubTag {
   name: string;
   grade?: string;
@@ -276,6 +290,65 @@ export async function fetchAnalysisStatus(
   return apiFetch<ProjectStatusResponse>(API_PATH.STATUS(projectId));
 }
 
+/**
+ * 進捗ストリームで受け取った差分を直前の状態に適用する.
+ */
+export function applyStatusDelta(
+  current: ProjectStatusResponse,
+  delta: ProjectStatusDelta
+): ProjectStatusResponse {
+  const { steps, logs, process_flow_nodes, ...fields } = delta;
+  const next: ProjectStatusResponse = { ...current, ...(fields as Partial<ProjectStatusResponse>) };
+
+  if (steps) {
+    const updated = new Map(steps.map((step) => [step.name, step]));
+    next.steps = current.steps.map((step) => updated.get(step.name) ?? step);
+  }
+  if (logs) {
+    next.logs = [...current.logs.slice(0, logs.offset), ...logs.lines];
+  }
+  if (current.process_flow) {
+    const statuses = new Map((process_flow_nodes ?? []).map((node) => [node.key, node.status]));
+    next.process_flow = {
+      ...current.process_flow,
+      nodes: current.process_flow.nodes.map((node) =>
+        statuses.has(node.key) ? { ...node, status: statuses.get(node.key)! } : node
+      ),
+      current_iteration: next.current_iteration ?? current.process_flow.current_iteration,
+      total_iterations: next.total_iterations ?? current.process_flow.total_iterations,
+    };
+  }
+  return next;
+}
+
+/**
+ * Server-Sent Events で進捗を購読する。戻り値の関数で購読を解除する.
+ */
+export function subscribeAnalysisStatus(
+  projectId: string,
+  handlers: {
+    onSnapshot: (status: ProjectStatusResponse) => void;
+    onDelta: (delta: ProjectStatusDelta) => void;
+    onClose: () => void;
+  }
+): () => void {
+  const source = new EventSource(`${API_BASE_URL}${API_PATH.EVENTS(projectId)}`);
+  const close = () => {
+    source.close();
+    handlers.onClose();
+  };
+  source.addEventListener("snapshot", (event) => {
+    handlers.onSnapshot(JSON.parse((event as MessageEvent).data));
+  });
+  source.addEventListener("delta", (event) => {
+    handlers.onDelta(JSON.parse((event as MessageEvent).data));
+  });
+  source.addEventListener("end", close);
+  source.addEventListener("deleted", close);
+  source.onerror = close;
+  return () => source.close();
+}
+
 export async function fetchProjectReport(
   projectId: string
 ): Promise<ProjectReportResponse> {
@@ -0,0 +1,112 @@
+"""Benchmark /analysis-status polling latency against project count and report size."""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+if sys.version_info < (3, 11):
+    raise SystemExit("Python 3.11 以上で実行してください (datetime.UTC を使用するため)。")
+
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from backend.schemas.project_schema import build_status_response
+from backend.store import PROJECT_STEPS, ProjectStore, SQLiteProjectStore
+
+
+def _build_report(report_kb: int) -> dict:
+    # 最終レポートは iterations ごとにセグメント・タグの入れ子 dict を大量に持つため、それを模す
+    segments_per_iteration = max(1, report_kb * 1024 // 3 // 160)
+    return {
+        "summary": "benchmark",
+        "iterations": [
+            {
+                "iteration": iteration + 1,
+                "segments": [
+                    {
+                        "timecode": f"00:{index % 60:02d}",
+                        "text": f"字幕テキスト {index}",
+                        "tags": [{"name": "表現", "grade": "C", "score": index % 5}],
+                    }
+                    for index in range(segments_per_iteration)
+                ],
+            }
+            for iteration in range(3)
+        ],
+    }
+
+
+async def _populate(store: ProjectStore, workspace: Path, projects: int, report_kb: int) -> str:
+    report = _build_report(report_kb)
+    # アーカイブ複製はベンチマーク対象外
+    store._archive_project = _skip_archive  # type: ignore[method-assign]
+    for index in range(projects):
+        project_id = f"bench-{index:05d}"
+        await store.create_project(
+            project_id=project_id,
+            company_name="bench",
+            product_name="bench",
+            title=project_id,
+            video_path=workspace / f"{project_id}.mp4",
+            file_name=f"{project_id}.mp4",
+            workspace_dir=workspace,
+            model="gemini-2.5-flash",
+            media_type="video",
+        )
+        await store.mark_pipeline_started(project_id)
+        for step in PROJECT_STEPS:
+            await store.mark_step_running(project_id, step)
+            await store.update_status(project_id, step, "preview", {"text": "x" * 1024})
+        await store.mark_pipeline_completed(project_id, report)
+    return f"bench-{projects - 1:05d}"
+
+
+async def _skip_archive(project) -> None:  # noqa: ANN001
+    return None
+
+
+async def _measure(store: ProjectStore, project_id: str, polls: int) -> tuple[float, float]:
+    samples = []
+    for _ in range(polls):
+        started = time.perf_counter()
+        project = await store.get_project(project_id)
+        build_status_response(project)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--projects", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--report-kb", type=int, nargs="+", default=[16, 512, 4096])
+    parser.add_argument("--polls", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'backend':<8} {'projects':>8} {'report_kb':>9} {'p50_ms':>8} {'p95_ms':>8}")
+    for backend in ("memory", "sqlite"):
+        for projects in args.projects:
+            for report_kb in args.report_kb:
+                with tempfile.TemporaryDirectory() as tmp:
+                    workspace = Path(tmp)
+                    if backend == "memory":
+                        store: ProjectStore = ProjectStore()
+                    else:
+                        store = SQLiteProjectStore(workspace / "projects.db")
+                    project_id = await _populate(store, workspace, projects, report_kb)
+                    p50, p95 = await _measure(store, project_id, args.polls)
+                    if isinstance(store, SQLiteProjectStore):
+                        store.close()
+                print(f"{backend:<8} {projects:>8} {report_kb:>9} {p50:>8.3f} {p95:>8.3f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())